@@ -19,9 +19,11 @@ export default function App() {
   const [error, setError] = useState(null);
   const [blobCache, setBlobCache] = useState({});
   const [selectedIsin, setSelectedIsin] = useState(null);
-  const [skip, setSkip] = useState(0);
+  const [cursor, setCursor] = useState(null);
+  const [nextCursor, setNextCursor] = useState(null);
   const [hasMore, setHasMore] = useState(true);
   const [sortMethod, setSortMethod] = useState('popularity');
+  const [searchResults, setSearchResults] = useState([]);
 
   const securityCache = useRef({});
   const limit = 100;
@@ -29,29 +31,34 @@ export default function App() {
 
   const observer = useRef();
   const lastListItemRef = useCallback(node => {
-    if (loading || search) return;
+    if (loading || search.trim()) return;
     if (observer.current) observer.current.disconnect();
     observer.current = new IntersectionObserver(entries => {
-      if (entries[0].isIntersecting && hasMore) {
-        setSkip(prev => prev + limit);
+      if (entries[0].isIntersecting && hasMore && nextCursor) {
+        setCursor(nextCursor);
       }
     });
     if (node) observer.current.observe(node);
-  }, [loading, hasMore, search]);
+  }, [loading, hasMore, search, nextCursor]);
 
   useEffect(() => {
     setLoading(true);
     setList([]);
-    setSkip(0);
+    setCursor(null);
+    setNextCursor(null);
     setHasMore(true);
-  }, [sortMethod, search]);
+  }, [sortMethod]);
 
   useEffect(() => {
     setLoading(true);
-    const params = new URLSearchParams({ skip, limit });
-    if (!search) params.set('sort', sortMethod);
+    const params = new URLSearchParams({ limit, sort: sortMethod });
+    if (cursor) params.set('cursor', cursor);
     fetch(`${backend}/securities?${params.toString()}`)
-      .then(r => { if (!r.ok) throw new Error(); return r.json(); })
+      .then(r => {
+        if (!r.ok) throw new Error();
+        setNextCursor(r.headers.get('X-Next-Cursor'));
+        return r.json();
+      })
       .then(newItems => {
         setList(prev => {
           const existing = new Set(prev.map(i => i.isin));
@@ -61,12 +68,46 @@ export default function App() {
       })
       .catch(console.error)
       .finally(() => setLoading(false));
-  }, [skip, sortMethod, search, backend]);
+  }, [cursor, sortMethod, backend]);
+
+  // Server-side search over the whole catalog, debounced while typing
+  useEffect(() => {
+    const q = search.trim();
+    if (!q) {
+      setSearchResults([]);
+      return;
+    }
+    const controller = new AbortController();
+    const timer = setTimeout(() => {
+      const params = new URLSearchParams({ q, limit: 50 });
+      fetch(`${backend}/securities/search?${params.toString()}`, { signal: controller.signal })
+        .then(r => { if (!r.ok) throw new Error(); return r.json(); })
+        .then(setSearchResults)
+        .catch(() => {});
+    }, 250);
+    return () => {
+      clearTimeout(timer);
+      controller.abort();
+    };
+  }, [search, backend]);
 
   useEffect(() => {
     document.title = 'Bond Explorer';
   }, []);
 
+  // Detail without the raw price list, plus a chart-sized series, in parallel
+  const fetchSecurity = async isin => {
+    const [detailRes, pricesRes] = await Promise.all([
+      fetch(`${backend}/securities/${isin}?include=documents,summary,fund_holdings`),
+      fetch(`${backend}/securities/${isin}/prices?max_points=500&layout=columns`),
+    ]);
+    if (!detailRes.ok) throw new Error('Not found');
+    const data = await detailRes.json();
+    // one array per field: { date: [...], close: [...], ... }
+    data.price_history = pricesRes.ok ? await pricesRes.json() : { date: [], close: [] };
+    return data;
+  };
+
   const loadSecurity = async (isin, idx) => {
     setError(null);
     setSelectedDoc(null);
@@ -77,9 +118,7 @@ export default function App() {
     } else {
       setLoading(true);
       try {
-        const r = await fetch(`${backend}/securities/${isin}`);
-        if (!r.ok) throw new Error('Not found');
-        const data = await r.json();
+        const data = await fetchSecurity(isin);
         securityCache.current[isin] = data;
         setSecurity(data);
       } catch (e) {
@@ -91,9 +130,8 @@ export default function App() {
 
     const next = list[idx + 1];
     if (next && !securityCache.current[next.isin]) {
-      fetch(`${backend}/securities/${next.isin}`)
-        .then(r2 => r2.ok && r2.json())
-        .then(d2 => { if (d2) securityCache.current[next.isin] = d2; })
+      fetchSecurity(next.isin)
+        .then(d2 => { securityCache.current[next.isin] = d2; })
         .catch(() => {});
     }
   };
@@ -114,11 +152,7 @@ export default function App() {
     }
   };
 
-  const filtered = list.filter(
-    s =>
-      s.isin.includes(search.toUpperCase()) ||
-      s.name.toLowerCase().includes(search.toLowerCase())
-  );
+  const filtered = search.trim() ? searchResults : list;
 
   return (
     <ThemeProvider theme={darkTheme}>
@@ -133,7 +167,7 @@ export default function App() {
           selectedIsin={selectedIsin}
           loadSecurity={loadSecurity}
           loading={loading}
-          skip={skip}
+          cursor={cursor}
           lastListItemRef={lastListItemRef}
           sortMethod={sortMethod}
           setSortMethod={setSortMethod}
@@ -10,14 +10,14 @@ Chart.register(annotationPlugin);
 
 export default function ChartCard({ security }) {
   const hasHistory =
-    Array.isArray(security.price_history) && security.price_history.length > 0;
+    Array.isArray(security.price_history?.date) && security.price_history.date.length > 0;
 
   let chartData = null;
   let chartOptions = null;
 
   if (hasHistory) {
-    const labels = security.price_history.map((p) => p.date);
-    const dataPoints = security.price_history.map((p) => p.close);
+    const labels = security.price_history.date;
+    const dataPoints = security.price_history.close;
 
     chartData = {
       labels,
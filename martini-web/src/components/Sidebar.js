@@ -23,12 +23,12 @@ export default function Sidebar({
   selectedIsin,
   loadSecurity,
   loading,
-  skip,
+  cursor,
   lastListItemRef,
   sortMethod,
   setSortMethod
 }) {
-  const displayList = search ? filtered : list;
+  const displayList = search.trim() ? filtered : list;
 
   const [anchorEl, setAnchorEl] = useState(null);
   const open = Boolean(anchorEl);
@@ -105,6 +105,12 @@ export default function Sidebar({
         >
           New Issue
         </MenuItem>
+        <MenuItem
+          onClick={() => handleSortSelect('maturity')}
+          selected={sortMethod === 'maturity'}
+        >
+          Maturity
+        </MenuItem>
       </Menu>
 
       <Box
@@ -120,7 +126,7 @@ export default function Sidebar({
             <Box
               key={s.isin}
               sx={{ position: 'relative' }}
-              ref={!search && idx === list.length - 1 ? lastListItemRef : null}
+              ref={!search.trim() && idx === list.length - 1 ? lastListItemRef : null}
             >
               <ListItemButton
                 selected={selectedIsin === s.isin}
@@ -142,7 +148,7 @@ export default function Sidebar({
               )}
             </Box>
           ))}
-          {loading && !search && skip > 0 && <LinearProgress />}
+          {loading && !search.trim() && cursor && <LinearProgress />}
         </List>
       </Box>
     </Box>
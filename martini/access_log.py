@@ -0,0 +1,141 @@
+# martini/access_log.py
+
+import asyncio
+import datetime
+import ipaddress
+import os
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from .models import AccessLog
+from .utils.logging_helper import logger
+
+# Flush when this many events are queued…
+BATCH_SIZE = int(os.getenv("ACCESS_LOG_BATCH_SIZE", "500"))
+# …or when the oldest queued event is this many seconds old.
+FLUSH_INTERVAL = float(os.getenv("ACCESS_LOG_FLUSH_SECONDS", "2"))
+# Upper bound on buffered events; beyond it new events are dropped.
+MAX_PENDING = int(os.getenv("ACCESS_LOG_MAX_PENDING", "50000"))
+
+
+class AccessLogWriter:
+    """
+    Buffered, asynchronous sink for :class:`AccessLog` rows.
+
+    Request handlers call :meth:`record`, which never waits on the database.
+    A background task drains the queue and writes each batch with a single
+    multi-row INSERT. When the database falls behind, the queue fills up to
+    ``max_pending`` events and further events are dropped (and counted)
+    instead of growing memory without bound.
+    """
+
+    def __init__(
+        self,
+        engine: AsyncEngine,
+        batch_size: int = BATCH_SIZE,
+        flush_interval: float = FLUSH_INTERVAL,
+        max_pending: int = MAX_PENDING,
+    ):
+        self.engine = engine
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_pending)
+        self._task: Optional[asyncio.Task] = None
+        self.written = 0
+        self.dropped = 0
+
+    def record(
+        self,
+        security_id: int,
+        client_host: Optional[str],
+        user_agent: str,
+        accessed_at: Optional[datetime.datetime] = None,
+    ) -> None:
+        """Queue one access event; returns immediately."""
+        try:
+            client_ip = ipaddress.ip_address(client_host) if client_host else None
+        except ValueError:
+            client_ip = None
+        event = {
+            "security_id": security_id,
+            "accessed_at": accessed_at or datetime.datetime.now(datetime.timezone.utc),
+            "client_ip": client_ip,
+            "user_agent": user_agent,
+        }
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            if self.dropped % 1000 == 1:
+                logger.warning(f"Access log buffer full, {self.dropped} events dropped so far")
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the background task and flush everything still queued."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        while not self._queue.empty():
+            await self._write(self._take(self.batch_size))
+        logger.info(f"Access log writer stopped ({self.written} written, {self.dropped} dropped).")
+
+    def _take(self, n: int) -> List[Dict[str, Any]]:
+        batch = []
+        while len(batch) < n and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch: List[Dict[str, Any]] = []
+            try:
+                # block until there is something to write, then give the
+                # batch until the deadline to fill up
+                batch.append(await self._queue.get())
+                deadline = loop.time() + self.flush_interval
+                while len(batch) < self.batch_size:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+                    batch.extend(self._take(self.batch_size - len(batch)))
+            except asyncio.CancelledError:
+                self._requeue(batch)
+                raise
+            await self._write(batch)
+
+    def _requeue(self, batch: List[Dict[str, Any]]) -> None:
+        """Put events back for the final flush in stop()."""
+        for event in batch:
+            try:
+                self._queue.put_nowait(event)
+            except asyncio.QueueFull:
+                self.dropped += 1
+
+    async def _write(self, batch: List[Dict[str, Any]]) -> None:
+        if not batch:
+            return
+        try:
+            async with self.engine.begin() as conn:
+                await conn.execute(insert(AccessLog).values(batch))
+            self.written += len(batch)
+        except asyncio.CancelledError:
+            self._requeue(batch)
+            raise
+        except Exception as e:
+            self.dropped += len(batch)
+            logger.error(f"Failed to write {len(batch)} access log events: {e}")
@@ -0,0 +1,279 @@
+# martini/access_rollup.py
+#
+# Upkeep of the access log: access_logs is partitioned by month (UTC), with
+# a DEFAULT partition catching events outside the monthly ones, a rollup
+# recounts raw events into per-security daily counts in access_daily, and
+# raw partitions past the retention period are dropped once final. Run by the API every ACCESS_ROLLUP_SECONDS, or once with
+#   python -m martini.access_rollup
+
+import asyncio
+import datetime
+import os
+import re
+import time
+from typing import List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from .utils.logging_helper import logger
+
+# Seconds between scheduled runs; 0 disables the background job.
+ROLLUP_INTERVAL = float(os.getenv("ACCESS_ROLLUP_SECONDS", "300"))
+# Raw events are kept this long; daily counts are kept forever.
+RETENTION_DAYS = int(os.getenv("ACCESS_LOG_RETENTION_DAYS", "90"))
+# Days (UTC, before today) recounted on every run, so events the buffered
+# writer inserts late still reach access_daily
+RECOUNT_DAYS = int(os.getenv("ACCESS_ROLLUP_RECOUNT_DAYS", "2"))
+# Monthly partitions created ahead of time
+MONTHS_AHEAD = 2
+
+_ROLLUP_LOCK_KEY = 0x61636365  # "acce"
+
+PARTITION_NAME = re.compile(r"^access_logs_(\d{4})_(\d{2})$")
+DEFAULT_PARTITION = "access_logs_default"
+
+
+def _month_start(day: datetime.date) -> datetime.date:
+    return day.replace(day=1)
+
+
+def _next_month(month: datetime.date) -> datetime.date:
+    return (month + datetime.timedelta(days=32)).replace(day=1)
+
+
+def _midnight(day: datetime.date) -> datetime.datetime:
+    return datetime.datetime.combine(day, datetime.time(), datetime.timezone.utc)
+
+
+def partition_name(month: datetime.date) -> str:
+    return f"access_logs_{month.year:04d}_{month.month:02d}"
+
+
+async def _partitions(conn: AsyncConnection) -> List[datetime.date]:
+    """First days of the months that have a partition, oldest first."""
+    names = (await conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = to_regclass('access_logs')"
+    ))).scalars().all()
+    months = []
+    for name in names:
+        match = PARTITION_NAME.match(name)
+        if match:
+            months.append(datetime.date(int(match.group(1)), int(match.group(2)), 1))
+    return sorted(months)
+
+
+async def ensure_partitions(
+    conn: AsyncConnection,
+    first: Optional[datetime.date] = None,
+    months_ahead: int = MONTHS_AHEAD,
+) -> List[str]:
+    """
+    Create the DEFAULT partition and the monthly partitions from *first*'s
+    month (default: this month) to *months_ahead* months from now. Events
+    the DEFAULT partition caught for a new month are moved into it.
+    Returns the names of the monthly partitions created.
+    """
+    await conn.execute(text(f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF access_logs DEFAULT"))
+    today = datetime.datetime.now(datetime.timezone.utc).date()
+    month = _month_start(first or today)
+    last = _month_start(today)
+    for _ in range(months_ahead):
+        last = _next_month(last)
+    existing = set(await _partitions(conn))
+    created = []
+    while month <= last:
+        if month not in existing:
+            name = partition_name(month)
+            bounds = {"start": _midnight(month), "end": _midnight(_next_month(month))}
+            # a new partition may not overlap rows already in the default one
+            stray = (await conn.execute(text(
+                f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} "
+                "WHERE accessed_at >= :start AND accessed_at < :end)"
+            ), bounds)).scalar()
+            if stray:
+                await conn.execute(text("CREATE TEMP TABLE access_logs_stray (LIKE access_logs) ON COMMIT DROP"))
+                await conn.execute(text(
+                    f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} "
+                    "WHERE accessed_at >= :start AND accessed_at < :end RETURNING *) "
+                    "INSERT INTO access_logs_stray SELECT * FROM moved"
+                ), bounds)
+            await conn.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF access_logs "
+                f"FOR VALUES FROM ('{month.isoformat()} 00:00+00') TO ('{_next_month(month).isoformat()} 00:00+00')"
+            ))
+            if stray:
+                await conn.execute(text("INSERT INTO access_logs SELECT * FROM access_logs_stray"))
+                await conn.execute(text("DROP TABLE access_logs_stray"))
+            created.append(name)
+        month = _next_month(month)
+    return created
+
+
+async def convert_legacy_access_logs(conn: AsyncConnection) -> bool:
+    """
+    Move a plain (pre-partitioning) access_logs table out of the way so the
+    partitioned one can be created; :func:`migrate_legacy_rows` then copies
+    its rows over. Returns True when there was one.
+    """
+    relkind = (await conn.execute(text(
+        "SELECT relkind::text FROM pg_class WHERE oid = to_regclass('access_logs')"
+    ))).scalar_one_or_none()
+    if relkind != "r":
+        return False
+    logger.info("Converting access_logs to a partitioned table.")
+    for ddl in (
+        "ALTER TABLE access_logs RENAME TO access_logs_legacy",
+        "ALTER INDEX IF EXISTS access_logs_pkey RENAME TO access_logs_legacy_pkey",
+        "ALTER INDEX IF EXISTS ix_access_logs_id RENAME TO ix_access_logs_legacy_id",
+        "ALTER SEQUENCE IF EXISTS access_logs_id_seq RENAME TO access_logs_legacy_id_seq",
+    ):
+        await conn.execute(text(ddl))
+    return True
+
+
+async def migrate_legacy_rows(conn: AsyncConnection, retention_days: int = RETENTION_DAYS) -> None:
+    """Roll up all legacy rows, keep the recent ones as raw events, drop the old table."""
+    await conn.execute(text(
+        "INSERT INTO access_daily (security_id, day, views) "
+        "SELECT security_id, (accessed_at AT TIME ZONE 'UTC')::date, count(*)::integer "
+        "FROM access_logs_legacy GROUP BY 1, 2 "
+        "ON CONFLICT (security_id, day) DO UPDATE SET views = access_daily.views + EXCLUDED.views"
+    ))
+    cutoff = _month_start(
+        datetime.datetime.now(datetime.timezone.utc).date() - datetime.timedelta(days=retention_days)
+    )
+    await ensure_partitions(conn, first=cutoff)
+    await conn.execute(text(
+        "INSERT INTO access_logs (id, security_id, accessed_at, client_ip, user_agent) "
+        "SELECT id, security_id, accessed_at, client_ip, user_agent FROM access_logs_legacy "
+        "WHERE accessed_at >= :cutoff"
+    ), {"cutoff": _midnight(cutoff)})
+    await conn.execute(text(
+        "SELECT setval(pg_get_serial_sequence('access_logs', 'id'), "
+        "GREATEST((SELECT max(id) FROM access_logs_legacy), 1))"
+    ))
+    # the popularity view still counts the legacy table; ensure_popularity_view
+    # recreates it on access_daily
+    await conn.execute(text("DROP MATERIALIZED VIEW IF EXISTS security_popularity"))
+    await conn.execute(text("DROP TABLE access_logs_legacy"))
+    # days before today are final; today is recounted from the copied rows
+    await conn.execute(text(
+        "INSERT INTO access_rollup_state (id, rolled_until) VALUES (1, :until) "
+        "ON CONFLICT (id) DO UPDATE SET rolled_until = EXCLUDED.rolled_until"
+    ), {"until": _midnight(datetime.datetime.now(datetime.timezone.utc).date())})
+
+
+async def rollup(conn: AsyncConnection, recount_days: int = RECOUNT_DAYS) -> int:
+    """
+    Recount access_daily from the raw events of every day that is not
+    final yet: the last *recount_days* days and today, or from further back
+    when the job has not run for a while (everything on the first run).
+
+    Counts are replaced rather than added to, so an event the buffered
+    writer inserted late (a backlog, a slow commit, a skewed clock) is
+    picked up by any later run while its day is in the window, and a run
+    repeated or rolled back changes nothing. Returns the events counted.
+    """
+    final_until = (await conn.execute(text(
+        "SELECT rolled_until FROM access_rollup_state WHERE id = 1"
+    ))).scalar_one_or_none()
+    today = datetime.datetime.now(datetime.timezone.utc).date()
+    since = _midnight(today - datetime.timedelta(days=recount_days))
+    if final_until is not None:
+        since = min(since, final_until)
+    window = "" if final_until is None else "WHERE accessed_at >= :since"
+    events = (await conn.execute(text(
+        "WITH counts AS ("
+        "  SELECT security_id, (accessed_at AT TIME ZONE 'UTC')::date AS day, count(*)::integer AS views "
+        f"  FROM access_logs {window} GROUP BY 1, 2"
+        "), merged AS ("
+        "  INSERT INTO access_daily (security_id, day, views) SELECT * FROM counts "
+        "  ON CONFLICT (security_id, day) DO UPDATE SET views = EXCLUDED.views"
+        ") SELECT COALESCE(sum(views), 0) FROM counts"
+    ), {"since": since})).scalar()
+    # days before the window will not be recounted
+    await conn.execute(text(
+        "INSERT INTO access_rollup_state (id, rolled_until) VALUES (1, :until) "
+        "ON CONFLICT (id) DO UPDATE SET rolled_until = EXCLUDED.rolled_until"
+    ), {"until": _midnight(today - datetime.timedelta(days=recount_days))})
+    return events
+
+
+async def drop_expired_partitions(conn: AsyncConnection, retention_days: int = RETENTION_DAYS) -> List[str]:
+    """
+    Drop raw partitions whose whole month is older than the retention
+    period and final in access_daily, and the same stray events from the
+    DEFAULT partition.
+    """
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cutoff = (now - datetime.timedelta(days=retention_days)).date()
+    rolled_until = (await conn.execute(text(
+        "SELECT rolled_until FROM access_rollup_state WHERE id = 1"
+    ))).scalar_one_or_none()
+    if rolled_until is None:
+        return []
+    dropped, dropped_until = [], None
+    for month in await _partitions(conn):
+        end = _next_month(month)
+        if end <= cutoff and end <= rolled_until.date():
+            name = partition_name(month)
+            await conn.execute(text(f"DROP TABLE {name}"))
+            dropped.append(name)
+            dropped_until = end
+    if dropped_until is not None:
+        await conn.execute(text(
+            f"DELETE FROM {DEFAULT_PARTITION} WHERE accessed_at < :end"
+        ), {"end": _midnight(dropped_until)})
+    return dropped
+
+
+async def maintain_access_logs(engine: AsyncEngine, retention_days: int = RETENTION_DAYS) -> Optional[dict]:
+    """
+    Create upcoming partitions, roll up new events and drop expired
+    partitions, in one transaction.
+
+    Returns:
+        Optional[dict]: What was done, or None when another worker was
+        already at it.
+    """
+    started = time.perf_counter()
+    async with engine.begin() as conn:
+        locked = (await conn.execute(
+            text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": _ROLLUP_LOCK_KEY}
+        )).scalar()
+        if not locked:
+            logger.debug("Access log rollup already running elsewhere, skipping.")
+            return None
+        created = await ensure_partitions(conn)
+        events = await rollup(conn)
+        dropped = await drop_expired_partitions(conn, retention_days)
+    logger.info(
+        f"Access log rollup: {events} events in {time.perf_counter() - started:.2f}s, "
+        f"partitions created {created or 'none'}, dropped {dropped or 'none'}"
+    )
+    return {"rolled_up": events, "created": created, "dropped": dropped}
+
+
+async def run_access_maintenance(engine: AsyncEngine, interval: float = ROLLUP_INTERVAL) -> None:
+    """Run :func:`maintain_access_logs` every *interval* seconds until cancelled."""
+    while True:
+        try:
+            await maintain_access_logs(engine)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Access log rollup failed: {e}")
+        await asyncio.sleep(interval)
+
+
+async def _main() -> None:
+    from .db import engine
+
+    await maintain_access_logs(engine)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
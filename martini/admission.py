@@ -0,0 +1,207 @@
+# martini/admission.py
+
+import asyncio
+import collections
+import math
+import os
+import re
+import time
+from typing import Dict, List, Optional, Tuple
+
+from .metrics import ADMISSION_REJECTED, ADMISSION_WAIT, pool_wait_average
+from .serialization import dumps
+from .utils.logging_helper import logger
+
+# lane=concurrency:queue, comma-separated; a lane left out is not limited
+ADMISSION_LIMITS = os.getenv("ADMISSION_LIMITS", "documents=16:64,export=4:0,detail=32:128")
+# Longest a request waits in a lane's queue before it gets a 503
+ADMISSION_QUEUE_SECONDS = float(os.getenv("ADMISSION_QUEUE_SECONDS", "5"))
+# Above this average pool checkout wait, database-bound lanes stop queueing
+ADMISSION_MAX_POOL_WAIT = float(os.getenv("ADMISSION_MAX_POOL_WAIT_SECONDS", "0.25"))
+
+# Which requests go to which lane. Everything else (landing page, lists,
+# identifier search, metrics, admin) is never held back.
+LANE_ROUTES: List[Tuple[str, "re.Pattern[str]"]] = [
+    ("documents", re.compile(r"^/documents/[^/]+/proxy$")),
+    ("export", re.compile(r"^/export/")),
+    ("detail", re.compile(
+        r"^/securities/(?!search$)[^/]+(/(prices|analytics|holdings|summary|documents|batch))?$"
+    )),
+    ("detail", re.compile(r"^/search/documents$")),
+]
+
+# Lanes whose requests mostly wait on the database pool
+DATABASE_LANES = frozenset({"detail", "export"})
+
+_RETRY_AFTER_MAX = 30
+
+
+def parse_limits(spec: str) -> Dict[str, Tuple[int, int]]:
+    """``"documents=16:64,export=4:0"`` → {lane: (concurrency, queue)}."""
+    limits = {}
+    for item in spec.split(","):
+        if not item.strip():
+            continue
+        try:
+            name, _, sizes = item.partition("=")
+            concurrency, _, queue = sizes.partition(":")
+            limits[name.strip()] = (int(concurrency), int(queue or 0))
+        except ValueError:
+            raise ValueError(f"Invalid ADMISSION_LIMITS entry {item!r}; expected lane=concurrency:queue")
+    return limits
+
+
+class Lane:
+    """
+    At most *concurrency* requests at once, and at most *queue* more
+    waiting in FIFO order for a slot. A finished request hands its slot
+    straight to the next waiter.
+    """
+
+    def __init__(self, name: str, concurrency: int, queue: int):
+        self.name = name
+        self.concurrency = concurrency
+        self.queue = queue
+        self.active = 0
+        self._waiters: collections.deque = collections.deque()
+        # moving average of how long a request holds its slot
+        self.service_time = 0.05
+        self.admitted = 0
+        self.rejected = 0
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self, timeout: float, allow_queue: bool = True) -> Optional[str]:
+        """None once a slot is held, otherwise why the request is rejected."""
+        if self.active < self.concurrency and not self._waiters:
+            self.active += 1
+            return None
+        if not allow_queue:
+            return "pool_congested"
+        if len(self._waiters) >= self.queue:
+            return "queue_full"
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(waiter, timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                # the slot was handed over just as we gave up
+                self.release()
+            else:
+                try:
+                    self._waiters.remove(waiter)
+                except ValueError:
+                    pass
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            return "timeout"
+        ADMISSION_WAIT.labels(self.name).observe(time.perf_counter() - start)
+        return None
+
+    def release(self) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)  # slot passes on, active unchanged
+                return
+        self.active -= 1
+
+    def observe(self, seconds: float) -> None:
+        self.service_time += 0.1 * (seconds - self.service_time)
+
+    def retry_after(self) -> int:
+        """Seconds until the current queue has likely drained."""
+        backlog = (self.queued + 1) * self.service_time / max(self.concurrency, 1)
+        return max(1, min(_RETRY_AFTER_MAX, math.ceil(backlog)))
+
+    def stats(self) -> dict:
+        return {
+            "concurrency": self.concurrency,
+            "queue": self.queue,
+            "active": self.active,
+            "queued": self.queued,
+            "service_time": round(self.service_time, 4),
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+        }
+
+
+def build_lanes(spec: str = ADMISSION_LIMITS) -> Dict[str, Lane]:
+    return {name: Lane(name, concurrency, queue) for name, (concurrency, queue) in parse_limits(spec).items()}
+
+
+def admission_stats(lanes: Dict[str, Lane]) -> dict:
+    return {
+        "pool_wait_average": round(pool_wait_average(), 4),
+        "lanes": {name: lane.stats() for name, lane in lanes.items()},
+    }
+
+
+class AdmissionMiddleware:
+    """
+    Pure ASGI middleware limiting how many requests of each expensive kind
+    (document downloads, exports, security details) run at once, so a
+    burst of one kind cannot take every pool connection and event loop
+    turn from the others.
+
+    A request over its lane's limit waits in a bounded queue for up to
+    ADMISSION_QUEUE_SECONDS. When the queue is full, the wait runs out, or
+    the database pool is already congested (average checkout wait above
+    ADMISSION_MAX_POOL_WAIT_SECONDS) for a database-bound lane, it gets a
+    503 at once with a Retry-After estimated from the queue depth.
+    """
+
+    def __init__(self, app, lanes: Optional[Dict[str, Lane]] = None,
+                 queue_timeout: float = ADMISSION_QUEUE_SECONDS,
+                 max_pool_wait: float = ADMISSION_MAX_POOL_WAIT):
+        self.app = app
+        self.lanes = build_lanes() if lanes is None else lanes
+        self.queue_timeout = queue_timeout
+        self.max_pool_wait = max_pool_wait
+
+    def lane_for(self, path: str) -> Optional[Lane]:
+        for name, pattern in LANE_ROUTES:
+            if pattern.match(path):
+                return self.lanes.get(name)
+        return None
+
+    async def __call__(self, scope, receive, send):
+        lane = self.lane_for(scope["path"]) if scope["type"] == "http" else None
+        if lane is None:
+            return await self.app(scope, receive, send)
+
+        congested = lane.name in DATABASE_LANES and pool_wait_average() > self.max_pool_wait
+        reason = await lane.acquire(self.queue_timeout, allow_queue=not congested)
+        if reason is not None:
+            lane.rejected += 1
+            ADMISSION_REJECTED.labels(lane.name, reason).inc()
+            if lane.rejected % 100 == 1:
+                logger.warning(f"Admission control rejecting {lane.name} requests ({reason}), {lane.rejected} so far")
+            return await self._reject(send, lane.retry_after())
+
+        lane.admitted += 1
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            lane.release()
+            lane.observe(time.perf_counter() - start)
+
+    @staticmethod
+    async def _reject(send, retry_after: int) -> None:
+        body = dumps({"detail": "Server busy, retry later"})
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(retry_after).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
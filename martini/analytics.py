@@ -0,0 +1,106 @@
+# martini/analytics.py
+
+from typing import Dict, Optional
+
+import numpy as np
+
+TRADING_DAYS = 252
+
+def _finite(value) -> Optional[float]:
+    if value is None or not np.isfinite(value):
+        return None
+    return float(value)
+
+
+def price_analytics(
+    sec_ids: np.ndarray,
+    dates: np.ndarray,
+    close: np.ndarray,
+    high: np.ndarray,
+    low: np.ndarray,
+    volume: np.ndarray,
+    window: int = 20,
+) -> Dict[int, dict]:
+    """
+    Return, volatility, drawdown and VWAP figures for one or many securities.
+
+    The inputs are parallel arrays of daily bars sorted by (security id,
+    date), e.g. straight from one ``ORDER BY security_id, date`` query.
+    Returns and sums are vectorized over all securities at once (segment
+    reductions with ``reduceat``); only the running-peak drawdown and the
+    rolling window are taken per security. ``volume`` may hold NaN where
+    it is unknown.
+
+    Returns:
+        Dict[int, dict]: Figures by security id. Returns are simple for
+        ``total_return`` and log for volatility, which is annualised with
+        252 trading days; ``rolling_volatility`` covers the last *window*
+        returns only. ``max_drawdown`` is the worst fall from a running
+        peak of the close, as a negative fraction.
+    """
+    n = len(close)
+    if n == 0:
+        return {}
+    sec_ids = np.asarray(sec_ids, dtype=np.int64)
+    close = np.asarray(close, dtype=np.float64)
+
+    # segment boundaries of each security
+    starts = np.flatnonzero(np.r_[True, sec_ids[1:] != sec_ids[:-1]])
+    ends = np.r_[starts[1:], n]
+
+    # log returns; the first bar of a security has none
+    log_close = np.log(np.where(close > 0, close, np.nan))
+    returns = np.r_[np.nan, np.diff(log_close)]
+    returns[starts] = np.nan
+    valid = np.isfinite(returns)
+    r = np.where(valid, returns, 0.0)
+    count = np.add.reduceat(valid.astype(np.int64), starts)
+    mean = np.add.reduceat(r, starts) / np.maximum(count, 1)
+    sq = np.add.reduceat(r * r, starts)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        variance = (sq - count * mean * mean) / (count - 1)
+    volatility = np.sqrt(np.maximum(variance, 0.0)) * np.sqrt(TRADING_DAYS)
+    volatility[count < 2] = np.nan
+
+    # VWAP on the typical price, over bars with a known volume
+    volume = np.asarray(volume, dtype=np.float64)
+    typical = (np.asarray(high, dtype=np.float64) + np.asarray(low, dtype=np.float64) + close) / 3
+    has_volume = np.isfinite(volume) & (volume > 0)
+    pv = np.add.reduceat(np.where(has_volume, typical * volume, 0.0), starts)
+    vol_sum = np.add.reduceat(np.where(has_volume, volume, 0.0), starts)
+
+    results = {}
+    for g, (start, end) in enumerate(zip(starts, ends)):
+        first_date, last_date = dates[start], dates[end - 1]
+        first, last = close[start], close[end - 1]
+        total = last / first - 1 if first > 0 else np.nan
+        years = (last_date - first_date).days / 365.25
+        annualised = (1 + total) ** (1 / years) - 1 if years > 0 and total > -1 else np.nan
+
+        tail = returns[max(start + 1, end - window):end]
+        tail = tail[np.isfinite(tail)]
+        rolling = tail.std(ddof=1) * np.sqrt(TRADING_DAYS) if len(tail) >= 2 else np.nan
+
+        # fall from the running peak of the close
+        prices = close[start:end]
+        drawdown = prices / np.maximum.accumulate(prices) - 1
+        trough = int(np.argmin(drawdown))
+        max_drawdown = drawdown[trough]
+        peak = int(np.argmax(prices[:trough + 1]))
+
+        results[int(sec_ids[start])] = {
+            "observations": int(end - start),
+            "first_date": first_date,
+            "last_date": last_date,
+            "last_close": _finite(last),
+            "total_return": _finite(total),
+            "annualized_return": _finite(annualised),
+            "volatility": _finite(volatility[g]),
+            "rolling_volatility": _finite(rolling),
+            "window": window,
+            "max_drawdown": _finite(max_drawdown),
+            "drawdown_peak_date": dates[start + peak] if max_drawdown < 0 else None,
+            "drawdown_trough_date": dates[start + trough] if max_drawdown < 0 else None,
+            "vwap": _finite(pv[g] / vol_sum[g]) if vol_sum[g] > 0 else None,
+        }
+    return results
@@ -0,0 +1,26 @@
+# martini/auth.py
+
+import hmac
+import os
+from typing import Optional
+
+from fastapi import Header, HTTPException
+
+# Shared secret for operational endpoints (/admin/...). When unset, those
+# endpoints are disabled altogether.
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+
+def is_admin_token(token: Optional[str]) -> bool:
+    """Constant-time check of *token* against ADMIN_TOKEN."""
+    if not ADMIN_TOKEN or not token:
+        return False
+    return hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode())
+
+
+async def require_admin(x_admin_token: Optional[str] = Header(None)) -> None:
+    """FastAPI dependency guarding admin-only routes."""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not is_admin_token(x_admin_token):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
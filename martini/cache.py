@@ -0,0 +1,98 @@
+# martini/cache.py
+
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, Optional, Set, Tuple
+
+
+class TTLCache:
+    """
+    In-process LRU cache whose entries also expire after ``ttl`` seconds.
+
+    Entries can carry tags (e.g. an ISIN and a security id) so that every
+    entry derived from one security can be dropped with a single
+    :meth:`invalidate` call. ``version`` increases on every invalidation;
+    a caller that computed a value from the database can pass the version it
+    saw beforehand to :meth:`set`, and the value is discarded if an
+    invalidation happened in the meantime. ``invalidated_at`` is the
+    monotonic time of the latest invalidation.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.version = 0
+        self.invalidated_at = float("-inf")
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, Tuple[float, Any, Tuple]]" = OrderedDict()
+        self._tags: Dict[Hashable, Set[Hashable]] = {}
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        item = self._data.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+        expires, value, _ = item
+        if expires <= time.monotonic():
+            self._remove(key)
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(
+        self,
+        key: Hashable,
+        value: Any,
+        tags: Iterable[Hashable] = (),
+        version: Optional[int] = None,
+    ) -> None:
+        if self.maxsize <= 0:
+            return
+        if version is not None and version != self.version:
+            return  # invalidated while the value was being computed
+        if key in self._data:
+            self._remove(key)
+        tags = tuple(tags)
+        self._data[key] = (time.monotonic() + self.ttl, value, tags)
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(key)
+        while len(self._data) > self.maxsize:
+            self._remove(next(iter(self._data)))
+
+    def invalidate(self, *tags: Hashable) -> None:
+        """Drop every entry carrying any of *tags*."""
+        self.version += 1
+        self.invalidated_at = time.monotonic()
+        for tag in tags:
+            for key in list(self._tags.get(tag, ())):
+                self._remove(key)
+
+    def clear(self) -> None:
+        self.version += 1
+        self.invalidated_at = time.monotonic()
+        self._data.clear()
+        self._tags.clear()
+
+    def _remove(self, key: Hashable) -> None:
+        _, _, tags = self._data.pop(key)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
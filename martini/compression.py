@@ -0,0 +1,121 @@
+# martini/compression.py
+
+import gzip
+import os
+import zlib
+from typing import Mapping, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+
+# Responses smaller than this are sent as is (0 disables compression)
+GZIP_MIN_BYTES = int(os.getenv("GZIP_MIN_BYTES", "8192"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+
+# Only text-like payloads; PDFs are already compressed and served with ranges
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/csv")
+
+
+def accepts_gzip(headers: Mapping[str, str]) -> bool:
+    for coding in headers.get("accept-encoding", "").split(","):
+        name, _, params = coding.partition(";")
+        if name.strip().lower() == "gzip":
+            _, _, q = params.partition("=")
+            try:
+                return float(q) > 0 if q else True
+            except ValueError:
+                return True
+    return False
+
+
+def gzip_etag(etag: str) -> str:
+    """Entity tag of the gzip-encoded variant: ``"abc"`` → ``"abc-gz"``."""
+    if etag.endswith('"'):
+        return etag[:-1] + '-gz"'
+    return etag
+
+
+def gzip_body(body: bytes, min_size: int = GZIP_MIN_BYTES) -> Optional[bytes]:
+    """Compressed *body*, or None when it is too small to bother."""
+    if min_size <= 0 or len(body) < min_size:
+        return None
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+class _GZipResponder:
+    def __init__(self, send, min_size: int, level: int):
+        self._send = send
+        self.min_size = min_size
+        self.level = level
+        self.start = None
+        self.compressor = None
+        self.passthrough = False
+
+    def _compressible(self, headers: Headers, first_body: bytes, more_body: bool) -> bool:
+        if self.start["status"] != 200 or "content-encoding" in headers:
+            return False
+        media_type = headers.get("content-type", "").split(";")[0].strip()
+        if media_type not in COMPRESSIBLE_TYPES:
+            return False
+        length = headers.get("content-length")
+        if length is not None and int(length) < self.min_size:
+            return False
+        return more_body or len(first_body) >= self.min_size
+
+    async def send(self, message) -> None:
+        kind = message["type"]
+        if kind == "http.response.start":
+            self.start = message  # held back until the first body chunk
+            return
+        if kind != "http.response.body" or self.passthrough:
+            await self._send(message)
+            return
+
+        body, more_body = message.get("body", b""), message.get("more_body", False)
+        if self.compressor is None:
+            headers = MutableHeaders(scope=self.start)
+            if not self._compressible(headers, body, more_body):
+                self.passthrough = True
+                await self._send(self.start)
+                await self._send(message)
+                return
+            self.compressor = zlib.compressobj(self.level, zlib.DEFLATED, 31)  # gzip container
+            headers["Content-Encoding"] = "gzip"
+            headers.add_vary_header("Accept-Encoding")
+            if "etag" in headers:
+                headers["ETag"] = gzip_etag(headers["etag"])
+            if more_body:
+                del headers["content-length"]
+            else:
+                data = self.compressor.compress(body) + self.compressor.flush()
+                headers["Content-Length"] = str(len(data))
+                await self._send(self.start)
+                await self._send({"type": "http.response.body", "body": data})
+                return
+            await self._send(self.start)
+
+        # streamed bodies: flush each chunk so clients get rows as they come
+        data = self.compressor.compress(body)
+        data += self.compressor.flush(zlib.Z_SYNC_FLUSH if more_body else zlib.Z_FINISH)
+        await self._send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+
+class GZipMiddleware:
+    """
+    Pure ASGI middleware gzipping JSON, NDJSON and CSV responses of at
+    least GZIP_MIN_BYTES for clients that accept it, including streamed
+    exports (flushed chunk by chunk). Responses that already carry a
+    Content-Encoding (e.g. the pre-compressed security detail) are left
+    alone; an ETag gets the ``-gz`` suffix of the encoded variant.
+    """
+
+    def __init__(self, app, min_size: int = GZIP_MIN_BYTES, level: int = GZIP_LEVEL):
+        self.app = app
+        self.min_size = min_size
+        self.level = level
+
+    async def __call__(self, scope, receive, send):
+        if (scope["type"] != "http" or self.min_size <= 0 or scope["method"] == "HEAD"
+                or not accepts_gzip(Headers(scope=scope))):
+            return await self.app(scope, receive, send)
+        responder = _GZipResponder(send, self.min_size, self.level)
+        await self.app(scope, receive, responder.send)
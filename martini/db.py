@@ -1,38 +1,52 @@
 # martini/db.py
 
 import os
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine, AsyncSession
 from sqlalchemy.orm import sessionmaker, declarative_base
 
+from .metrics import InstrumentedQueuePool
+
 # Read database URL from environment
 DATABASE_URL = os.getenv("POSTGRES_CONNECTION")
 if not DATABASE_URL:
     raise RuntimeError("POSTGRES_CONNECTION is not set in environment variables")
 
-# Swap in the asyncpg protocol if needed
-if DATABASE_URL.startswith("postgresql://"):
-    ASYNC_DATABASE_URL = DATABASE_URL.replace(
-        "postgresql://", "postgresql+asyncpg://", 1
+def to_async_url(url: str) -> str:
+    """Swap in the asyncpg protocol if needed."""
+    if url.startswith("postgresql://"):
+        return url.replace("postgresql://", "postgresql+asyncpg://", 1)
+    return url  # assume user already provided async URL
+
+def make_engine(url: str) -> AsyncEngine:
+    return create_async_engine(
+        to_async_url(url),
+        echo=False,
+        future=True,
+        pool_pre_ping=True,
+        poolclass=InstrumentedQueuePool,  # times pool checkouts for /metrics
+    )
+
+def make_sessionmaker(bind: AsyncEngine, **options) -> sessionmaker:
+    return sessionmaker(
+        bind=bind,
+        class_=AsyncSession,
+        expire_on_commit=False,
+        autoflush=False,
+        autocommit=False,
+        **options,
     )
-else:
-    ASYNC_DATABASE_URL = DATABASE_URL  # assume user already provided async URL
 
-# Async engine
-engine = create_async_engine(
-    ASYNC_DATABASE_URL,
-    echo=False,
-    future=True,
-    pool_pre_ping=True,
-)
+ASYNC_DATABASE_URL = to_async_url(DATABASE_URL)
+
+# Async engine (primary: all writes, and reads that must be fresh)
+engine = make_engine(DATABASE_URL)
 
 # Async session factory
-AsyncSessionLocal = sessionmaker(
-    bind=engine,
-    class_=AsyncSession,
-    expire_on_commit=False,
-    autoflush=False,
-    autocommit=False,
-)
+AsyncSessionLocal = make_sessionmaker(engine)
+
+# Optional read replicas, comma-separated DSNs
+REPLICA_URLS = [u.strip() for u in os.getenv("REPLICA_CONNECTIONS", "").split(",") if u.strip()]
+replica_engines = [make_engine(url) for url in REPLICA_URLS]
 
 # Base class for ORM models
 Base = declarative_base()
\ No newline at end of file
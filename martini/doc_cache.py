@@ -0,0 +1,236 @@
+# martini/doc_cache.py
+
+import asyncio
+import hashlib
+import os
+import tempfile
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+from .metrics import instrument_fetch
+from .storage import ObjectStat
+from .utils.logging_helper import logger
+
+# Cache directory; the cache is disabled when unset.
+DOC_CACHE_DIR = os.getenv("DOC_CACHE_DIR")
+# Total byte budget of cached documents
+DOC_CACHE_MAX_BYTES = int(os.getenv("DOC_CACHE_MAX_BYTES", str(2 * 1024**3)))
+# Objects larger than this are always streamed from storage
+DOC_CACHE_MAX_OBJECT_BYTES = int(os.getenv("DOC_CACHE_MAX_OBJECT_BYTES", str(256 * 1024**2)))
+# How long object metadata (size, generation, etag) is trusted without asking storage again
+DOC_CACHE_STAT_TTL = float(os.getenv("DOC_CACHE_STAT_TTL", "60"))
+
+_TMP_PREFIX = ".tmp-"
+
+
+class DocumentCache:
+    """
+    Size-bounded LRU cache of document blobs on local disk.
+
+    Entries are keyed by object name plus generation, so a re-uploaded object
+    never serves stale bytes. Files are written to a temporary name and
+    renamed into place, so readers never see partial content. Object
+    metadata is memoised for ``stat_ttl`` seconds, which lets hot documents
+    be served without any call to storage.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        max_bytes: int = DOC_CACHE_MAX_BYTES,
+        max_object_bytes: int = DOC_CACHE_MAX_OBJECT_BYTES,
+        stat_ttl: float = DOC_CACHE_STAT_TTL,
+    ):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.max_object_bytes = max_object_bytes
+        self.stat_ttl = stat_ttl
+
+        self._entries: "OrderedDict[str, int]" = OrderedDict()   # key -> size, LRU first
+        self._bytes = 0
+        self._stats: Dict[str, Tuple[float, ObjectStat]] = {}
+        self._fills: Dict[str, asyncio.Task] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._load_existing()
+
+    def _load_existing(self) -> None:
+        """Re-index files left by a previous process, oldest first."""
+        files = []
+        for path in self.root.iterdir():
+            if path.name.startswith(_TMP_PREFIX):
+                path.unlink(missing_ok=True)
+                continue
+            st = path.stat()
+            files.append((st.st_mtime, path.name, st.st_size))
+        for _, key, size in sorted(files):
+            self._entries[key] = size
+            self._bytes += size
+        self._evict()
+        logger.info(f"Document cache at {self.root}: {len(self._entries)} files, {self._bytes} bytes")
+
+    @staticmethod
+    def key_for(info: ObjectStat) -> str:
+        return hashlib.sha256(f"{info.name}#{info.generation}".encode()).hexdigest()
+
+    async def stat(self, storage, name: str) -> ObjectStat:
+        """``storage.stat(name)``, memoised for stat_ttl seconds."""
+        now = time.monotonic()
+        cached = self._stats.get(name)
+        if cached and cached[0] > now:
+            return cached[1]
+        info = await storage.stat(name)
+        self._stats[name] = (now + self.stat_ttl, info)
+        if len(self._stats) > 10 * max(len(self._entries), 1000):
+            self._stats = {k: v for k, v in self._stats.items() if v[0] > now}
+        return info
+
+    def forget(self, name: str) -> None:
+        """Drop memoised metadata, e.g. after a read found the object replaced."""
+        self._stats.pop(name, None)
+
+    def cacheable(self, info: ObjectStat) -> bool:
+        return info.size <= min(self.max_object_bytes, self.max_bytes)
+
+    def get_path(self, storage, info: ObjectStat) -> Optional[Path]:
+        """
+        Local path holding the object's bytes, or None when it is not cached
+        (yet). A miss starts filling the cache in the background and leaves
+        the request to stream its range from storage, so the first viewer
+        of a large document is not held up by the whole download.
+
+        The fill belongs to the cache, not to the request that missed: a
+        client disconnecting does not abort it, and concurrent misses for
+        the same object share it.
+        """
+        if not self.cacheable(info):
+            return None
+        key = self.key_for(info)
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self.root / key
+
+        self.misses += 1
+        if key not in self._fills:
+            task = asyncio.create_task(self._fill(storage, info, key))
+            self._fills[key] = task
+            task.add_done_callback(lambda t, key=key: self._filled(key, info.name, t))
+        return None
+
+    def _filled(self, key: str, name: str, task: asyncio.Task) -> None:
+        del self._fills[key]
+        if not task.cancelled() and task.exception() is not None:
+            if isinstance(task.exception(), FileNotFoundError):
+                self.forget(name)
+            logger.warning(f"Document cache fill failed: {task.exception()}")
+
+    async def stop(self) -> None:
+        """Cancel fills still running (their partial files are removed)."""
+        tasks = list(self._fills.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _fill(self, storage, info: ObjectStat, key: str) -> Path:
+        fd, tmp_name = tempfile.mkstemp(prefix=_TMP_PREFIX, dir=self.root)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                chunks = instrument_fetch(
+                    storage.open_range(info.name, 0, info.size - 1, info.generation), storage.kind
+                )
+                written = 0
+                async for chunk in chunks:
+                    await asyncio.to_thread(f.write, chunk)
+                    written += len(chunk)
+            # a truncated download (or one that outlived the object) must not
+            # become a valid cache entry
+            if written != info.size:
+                raise IOError(f"Fetched {written} of {info.size} bytes of {info.name}")
+            final = self.root / key
+            os.replace(tmp_name, final)
+        except BaseException:
+            Path(tmp_name).unlink(missing_ok=True)
+            raise
+
+        self._entries[key] = info.size
+        self._bytes += info.size
+        self._evict()
+        return final
+
+    def _evict(self) -> None:
+        while self._bytes > self.max_bytes and self._entries:
+            key, size = self._entries.popitem(last=False)
+            self._bytes -= size
+            self.evictions += 1
+            # open file handles (responses in flight) keep working after unlink
+            (self.root / key).unlink(missing_ok=True)
+
+    def stats(self) -> dict:
+        return {
+            "files": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class FileRangeResponse(Response):
+    """
+    Send bytes start..end of an already open file.
+
+    Uses the ASGI ``http.response.zerocopysend`` extension (sendfile) when
+    the server offers it, and falls back to positional reads in a worker
+    thread otherwise.
+    """
+
+    chunk_size = 1024 * 1024
+
+    def __init__(self, file, start: int, end: int, status_code: int, headers: dict, media_type: str):
+        super().__init__(status_code=status_code, headers=headers, media_type=media_type)
+        self.file = file
+        self.start = start
+        self.end = end
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            await send({
+                "type": "http.response.start",
+                "status": self.status_code,
+                "headers": self.raw_headers,
+            })
+            count = self.end - self.start + 1
+            if scope.get("method") == "HEAD" or count <= 0:
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+            elif "http.response.zerocopysend" in scope.get("extensions", {}):
+                await send({
+                    "type": "http.response.zerocopysend",
+                    "file": self.file,
+                    "offset": self.start,
+                    "count": count,
+                    "more_body": False,
+                })
+            else:
+                fd = self.file.fileno()
+                offset = self.start
+                while count > 0:
+                    chunk = await asyncio.to_thread(os.pread, fd, min(self.chunk_size, count), offset)
+                    if not chunk:
+                        break
+                    offset += len(chunk)
+                    count -= len(chunk)
+                    await send({"type": "http.response.body", "body": chunk, "more_body": count > 0})
+                if count > 0:
+                    await send({"type": "http.response.body", "body": b"", "more_body": False})
+        finally:
+            self.file.close()
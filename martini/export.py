@@ -0,0 +1,144 @@
+# martini/export.py
+
+import csv
+import datetime
+import decimal
+import io
+import os
+from typing import AsyncIterable, AsyncIterator, List, Sequence, Tuple
+
+from .serialization import dumps
+
+# Rows fetched from the server-side cursor (and encoded) at a time
+EXPORT_BATCH_ROWS = int(os.getenv("EXPORT_BATCH_ROWS", "5000"))
+
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+EXPORT_FORMATS = "^(" + "|".join(EXPORT_MEDIA_TYPES) + ")$"
+
+# (column name, kind); kind is one of "int", "float", "str", "date"
+Columns = Sequence[Tuple[str, str]]
+
+
+def arrow_available() -> bool:
+    """pyarrow is optional; only the parquet and arrow formats need it."""
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+async def _ndjson(columns: Columns, batches: AsyncIterable[list]) -> AsyncIterator[bytes]:
+    names = [name for name, _ in columns]
+    async for rows in batches:
+        yield b"".join(dumps(dict(zip(names, row))) + b"\n" for row in rows)
+
+
+def _csv_value(value):
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    return value
+
+
+async def _csv(columns: Columns, batches: AsyncIterable[list]) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow([name for name, _ in columns])
+    async for rows in batches:
+        writer.writerows([_csv_value(v) for v in row] for row in rows)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():  # header only: no rows at all
+        yield buffer.getvalue().encode()
+
+
+class _ChunkSink(io.RawIOBase):
+    """
+    Write-only file object handing back what was written so far. ``tell``
+    keeps counting across drains: the Parquet writer records column chunk
+    offsets with it.
+    """
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _arrow_schema(columns: Columns):
+    import pyarrow as pa
+
+    types = {"int": pa.int64(), "float": pa.float64(), "str": pa.string(), "date": pa.date32()}
+    return pa.schema([(name, types[kind]) for name, kind in columns])
+
+
+def _arrow_batch(schema, columns: Columns, rows: list):
+    import pyarrow as pa
+
+    arrays = []
+    for i, (name, kind) in enumerate(columns):
+        values = [row[i] for row in rows]
+        if kind == "float":
+            values = [None if v is None else float(v) for v in values]
+        arrays.append(pa.array(values, type=schema.field(name).type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+async def _arrow(columns: Columns, batches: AsyncIterable[list], parquet: bool) -> AsyncIterator[bytes]:
+    import pyarrow as pa
+
+    schema = _arrow_schema(columns)
+    sink = _ChunkSink()
+    if parquet:
+        import pyarrow.parquet as pq
+        writer = pq.ParquetWriter(pa.PythonFile(sink, mode="w"), schema, compression="zstd")
+    else:
+        writer = pa.ipc.new_stream(pa.PythonFile(sink, mode="w"), schema)
+    try:
+        async for rows in batches:
+            # one row group / record batch per cursor batch
+            writer.write_batch(_arrow_batch(schema, columns, rows))
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def encode_rows(fmt: str, columns: Columns, batches: AsyncIterable[list]) -> AsyncIterator[bytes]:
+    """
+    Encode batches of rows (tuples in *columns* order) as *fmt*, yielding
+    bytes as each batch is done so memory use is bounded by one batch.
+    """
+    if fmt == "ndjson":
+        return _ndjson(columns, batches)
+    if fmt == "csv":
+        return _csv(columns, batches)
+    if fmt in ("parquet", "arrow"):
+        return _arrow(columns, batches, parquet=fmt == "parquet")
+    raise ValueError(f"Unknown export format: {fmt}")
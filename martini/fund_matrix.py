@@ -0,0 +1,202 @@
+# martini/fund_matrix.py
+
+import asyncio
+import datetime
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from .models import Fund, FundHolding
+from .utils.logging_helper import logger
+
+
+@dataclass(frozen=True)
+class FundInfo:
+    id: int
+    fund_name: str
+    report_date: Optional[datetime.date]
+
+
+class HoldingsMatrix:
+    """
+    Immutable fund × security weight matrix in CSR form.
+
+    Row *r* (fund ``fund_ids[r]``) holds securities
+    ``security_ids[indices[indptr[r]:indptr[r + 1]]]`` with weights
+    ``data[...]`` (pct_of_portfolio; NULL counts as 0, duplicate rows of a
+    fund and security are summed). Within a row the entries are sorted by
+    weight, largest first, so pages of a fund's holdings are plain slices.
+    """
+
+    def __init__(self, funds: List[FundInfo], fund_col, sec_col, weights):
+        self.funds = sorted(funds, key=lambda f: f.id)
+        self.fund_ids = np.array([f.id for f in self.funds], dtype=np.int64)
+        self._row_of: Dict[int, int] = {f.id: i for i, f in enumerate(self.funds)}
+        n_funds = len(self.funds)
+
+        fund_col = np.asarray(fund_col, dtype=np.int64)
+        sec_col = np.asarray(sec_col, dtype=np.int64)
+        weights = np.nan_to_num(np.asarray(weights, dtype=np.float64))
+
+        # keep holdings of known funds only, mapped to row numbers
+        known = np.isin(fund_col, self.fund_ids)
+        rows = np.searchsorted(self.fund_ids, fund_col[known])
+        sec_col, weights = sec_col[known], weights[known]
+
+        self.security_ids, cols = np.unique(sec_col, return_inverse=True)
+
+        # a fund listing the same security more than once holds their sum
+        pairs, entry = np.unique(rows * len(self.security_ids) + cols, return_inverse=True)
+        weights = np.bincount(entry.ravel(), weights=weights, minlength=len(pairs)).astype(np.float64)
+        rows, cols = np.divmod(pairs, max(len(self.security_ids), 1))
+
+        # sort by row, then weight descending
+        order = np.lexsort((-weights, rows))
+        self.indices = cols[order].astype(np.int64)
+        self.data = weights[order]
+        counts = np.bincount(rows, minlength=n_funds)
+        self.indptr = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+        self._entry_row = np.repeat(np.arange(n_funds), counts)
+
+        # L2-normalised rows for cosine similarity
+        norms = np.sqrt(np.bincount(self._entry_row, weights=self.data ** 2, minlength=n_funds))
+        entry_norm = norms[self._entry_row]
+        self._unit = np.divide(self.data, entry_norm, out=np.zeros_like(self.data), where=entry_norm > 0)
+
+    @property
+    def nnz(self) -> int:
+        return len(self.data)
+
+    def row(self, fund_id: int) -> int:
+        """Row number of *fund_id*; KeyError when unknown."""
+        return self._row_of[fund_id]
+
+    def holdings_count(self, row: int) -> int:
+        return int(self.indptr[row + 1] - self.indptr[row])
+
+    def holdings(self, row: int, skip: int = 0, limit: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """(security ids, weights) of a fund, largest weight first."""
+        start = self.indptr[row] + skip
+        stop = self.indptr[row + 1] if limit is None else min(start + limit, self.indptr[row + 1])
+        return self.security_ids[self.indices[start:stop]], self.data[start:stop]
+
+    def overlap(self, row_a: int, row_b: int) -> dict:
+        """
+        Securities held by both funds. ``overlap_weight`` is the sum over
+        common securities of the smaller of the two weights, i.e. the share
+        of the portfolios that is identical.
+        """
+        a = slice(self.indptr[row_a], self.indptr[row_a + 1])
+        b = slice(self.indptr[row_b], self.indptr[row_b + 1])
+        cols, ia, ib = np.intersect1d(
+            self.indices[a], self.indices[b], assume_unique=True, return_indices=True
+        )
+        wa, wb = self.data[a][ia], self.data[b][ib]
+        common = np.minimum(wa, wb)
+        order = np.argsort(-common, kind="stable")
+        return {
+            "security_ids": self.security_ids[cols[order]],
+            "weights_a": wa[order],
+            "weights_b": wb[order],
+            "overlap_weight": float(common.sum()),
+        }
+
+    def similar(self, row: int, limit: int) -> List[Tuple[int, float, int]]:
+        """
+        Funds most similar to *row* by cosine similarity of their weight
+        vectors, as (row, similarity, common holdings). One pass over the
+        non-zeros: scatter the fund into a dense vector, then reduce every
+        row against it.
+        """
+        n_funds = len(self.funds)
+        if self.nnz == 0 or n_funds < 2:
+            return []
+        own = slice(self.indptr[row], self.indptr[row + 1])
+        dense = np.zeros(len(self.security_ids))
+        dense[self.indices[own]] = self._unit[own]
+        held = np.zeros(len(self.security_ids), dtype=bool)
+        held[self.indices[own]] = True
+
+        scores = np.bincount(self._entry_row, weights=self._unit * dense[self.indices], minlength=n_funds)
+        common = np.bincount(self._entry_row, weights=held[self.indices], minlength=n_funds).astype(np.int64)
+        scores[row] = -np.inf
+
+        k = min(limit, n_funds - 1)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(int(r), float(scores[r]), int(common[r])) for r in top if common[r] > 0]
+
+
+class FundMatrixStore:
+    """
+    Holds the current :class:`HoldingsMatrix` and rebuilds it from Postgres
+    on demand. Refreshes are coalesced: requests arriving while one runs
+    trigger at most one more build. Readers keep using the previous matrix
+    until the new one is swapped in.
+    """
+
+    def __init__(self, engine: AsyncEngine):
+        self.engine = engine
+        self.matrix: Optional[HoldingsMatrix] = None
+        self.built_at: Optional[datetime.datetime] = None
+        self._task: Optional[asyncio.Task] = None
+        self._again = False
+
+    async def get(self) -> HoldingsMatrix:
+        """The current matrix, waiting for the first build if needed."""
+        if self.matrix is None:
+            self.request_refresh()
+            # shielded: a client going away must not cancel the build
+            await asyncio.shield(self._task)
+            if self.matrix is None:
+                raise RuntimeError("Fund holdings matrix is not available")
+        return self.matrix
+
+    def request_refresh(self) -> None:
+        """Schedule a rebuild (from a notification handler or an admin call)."""
+        if self._task is not None and not self._task.done():
+            self._again = True
+            return
+        self._task = asyncio.get_running_loop().create_task(self._refresh_loop())
+
+    async def refresh(self) -> HoldingsMatrix:
+        """Rebuild now and return the new matrix."""
+        async with self.engine.connect() as conn:
+            funds = (await conn.execute(
+                select(Fund.id, Fund.fund_name, Fund.report_date).order_by(Fund.id)
+            )).all()
+            holdings = (await conn.execute(
+                select(FundHolding.fund_id, FundHolding.security_id, FundHolding.pct_of_portfolio)
+            )).all()
+
+        infos = [FundInfo(*row) for row in funds]
+        if holdings:
+            fund_col, sec_col, weights = zip(*holdings)
+            weights = [float(w) if w is not None else 0.0 for w in weights]
+        else:
+            fund_col, sec_col, weights = (), (), ()
+        matrix = await asyncio.to_thread(HoldingsMatrix, infos, fund_col, sec_col, weights)
+
+        self.matrix = matrix
+        self.built_at = datetime.datetime.now(datetime.timezone.utc)
+        logger.info(f"Fund holdings matrix built: {len(infos)} funds, {matrix.nnz} holdings.")
+        return matrix
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            self._again = False
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error(f"Fund holdings matrix refresh failed: {e}")
+            if not self._again:
+                return
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
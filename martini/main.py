@@ -1,30 +1,35 @@
 # martini/main.py
 
+import asyncio
 import datetime
 import os
-import ipaddress
-from contextlib import asynccontextmanager
-from pathlib import Path
-from typing import AsyncGenerator, List
+import time
+from dataclasses import dataclass
+from contextlib import AsyncExitStack, asynccontextmanager
+from collections import defaultdict
+from typing import AsyncGenerator, Dict, List, Optional, Union
 
-import uvicorn
+import numpy as np
+import orjson
 from fastapi import Depends, FastAPI, HTTPException, Request, Response, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, StreamingResponse
 
-from sqlalchemy import MetaData, Table, Column, Integer, String, select, desc
+from sqlalchemy import (
+    MetaData, Table, Column, Integer, String, Text, Date, Float,
+    select, desc, func, or_, and_, case, text, tuple_, cast, literal, literal_column,
+)
+from sqlalchemy.dialects.postgresql import REGCONFIG, aggregate_order_by, array_agg
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select as orm_select
-from sqlalchemy.orm import selectinload
-
-from google.cloud import storage
-from google.oauth2 import service_account
 
-from .db import AsyncSessionLocal, Base, engine
+from .db import AsyncSessionLocal, engine, replica_engines
 from .models import (
     Document,
+    DocumentPage,
+    SEARCH_CONFIG,
     Security,
     PriceHistory,
-    AccessLog,
     Fund,
     FundHolding,
     SecuritySummary,
@@ -32,50 +37,207 @@ from .models import (
 from .schemas import (
     DocumentCreate,
     DocumentSchema,
+    DocumentSearchHitSchema,
+    FundHoldingSchema,
+    FundOverlapSchema,
+    FundSchema,
+    FundSecurityHoldingSchema,
+    PriceAnalyticsBatchRequest,
+    PriceAnalyticsBatchResponse,
+    PriceAnalyticsSchema,
+    PriceColumnsSchema,
+    SimilarFundSchema,
+    PriceHistorySchema,
     SecuritySchema,
-    SecurityListItemSchema
+    SecurityBatchRequest,
+    SecurityBatchResponse,
+    SecurityListItemSchema,
+    SummarySchema,
+)
+from .access_log import AccessLogWriter
+from .admission import AdmissionMiddleware, admission_stats, build_lanes
+from .access_rollup import ROLLUP_INTERVAL as ACCESS_ROLLUP_INTERVAL, maintain_access_logs, run_access_maintenance
+from .analytics import price_analytics
+from .auth import require_admin
+from .cache import TTLCache
+from .compression import GZipMiddleware, accepts_gzip, gzip_body, gzip_etag
+from .metrics import MetricsMiddleware, instrument_engine, instrument_fetch, metrics_response, slow_queries
+from .fund_matrix import FundMatrixStore, HoldingsMatrix
+from .export import EXPORT_BATCH_ROWS, EXPORT_FORMATS, EXPORT_MEDIA_TYPES, arrow_available, encode_rows
+from .doc_cache import DOC_CACHE_DIR, DocumentCache, FileRangeResponse
+from .profiling import PROFILE_DIR, PROFILE_NAME, ProfilingMiddleware, list_profiles
+from .replicas import REPLICA_MAX_LAG_SECONDS, ReplicaRouter, pin_to_primary, wants_primary
+from .pagination import InvalidCursor, decode_cursor, encode_cursor
+from .migrate import migrate
+from .notify import FUNDS_CHANGED, SECURITY_CHANGED, ChangeListener
+from .serialization import FastJSONResponse, dumps, rows_as_dicts
+from .storage import get_storage, object_name
+from .timeseries import lttb_indices, to_columns
+from .popularity import (
+    REFRESH_INTERVAL as POPULARITY_REFRESH_INTERVAL,
+    refresh_popularity,
+    run_popularity_refresher,
 )
 from .utils.logging_helper import logger
+from .utils.range_helper import (
+    RangeNotSatisfiable,
+    http_date,
+    strong_etag,
+    if_range_allows,
+    is_not_modified,
+    parse_byte_range,
+)
+
+
+# ----- Initialize document storage (GCS bucket or local directory) -----
+doc_storage = get_storage()
+# optional on-disk cache in front of it
+doc_cache = DocumentCache(DOC_CACHE_DIR) if DOC_CACHE_DIR else None
+
+# ----- Buffered access logging -----
+access_log_writer = AccessLogWriter(engine)
+
+# ----- Read replicas -----
+# Read-only endpoints use get_read_db, which picks a healthy replica
+replica_router = ReplicaRouter(AsyncSessionLocal, replica_engines)
+
+# ----- Security detail query -----
+# "orm": header plus one query per included part; "json": the whole payload
+# built by Postgres in a single statement (json_build_object / json_agg)
+DETAIL_QUERY_MODE = os.getenv("DETAIL_QUERY_MODE", "orm")
+if DETAIL_QUERY_MODE not in ("orm", "json"):
+    raise ValueError(f"DETAIL_QUERY_MODE must be 'orm' or 'json', got {DETAIL_QUERY_MODE!r}")
+
+# ----- Security detail cache -----
+# Serialized detail payloads by (isin, parts, proxy base URL)
+detail_cache = TTLCache(
+    maxsize=int(os.getenv("DETAIL_CACHE_SIZE", "1000")),
+    ttl=float(os.getenv("DETAIL_CACHE_TTL", "300")),
+)
+
+# Price analytics by (security id, window)
+analytics_cache = TTLCache(
+    maxsize=int(os.getenv("ANALYTICS_CACHE_SIZE", "5000")),
+    ttl=float(os.getenv("ANALYTICS_CACHE_TTL", "3600")),
+)
+
+def _on_security_changed(payload: str) -> None:
+    for cache in (detail_cache, analytics_cache):
+        if payload == "*":
+            cache.clear()
+        else:
+            cache.invalidate(("id", int(payload)))
+
+def _may_cache(db: AsyncSession, cache: TTLCache) -> bool:
+    """
+    False for results read from a replica shortly after an invalidation:
+    it may not have replayed the write behind it yet.
+    """
+    return (db.info.get("replica") is None
+            or time.monotonic() - cache.invalidated_at > REPLICA_MAX_LAG_SECONDS)
 
+# Cross-process invalidation: triggers on the detail tables NOTIFY the security id
+change_listener = ChangeListener(engine.url)
+change_listener.subscribe(SECURITY_CHANGED, _on_security_changed)
 
-# ----- Initialize GCS client -----
-gcs_client = storage.Client()
-BUCKET_NAME = "dry-martini-docs"
+# ----- Fund × security holdings matrix -----
+# Built in the background at startup, rebuilt when the fund loaders NOTIFY
+fund_matrix = FundMatrixStore(engine)
+change_listener.subscribe(FUNDS_CHANGED, lambda _payload: fund_matrix.request_refresh())
 
 # ----- Database initialization -----
-async def init_models():
-    logger.debug("Initializing database tables…")
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
-    logger.debug("Database tables initialized.")
+# "dev": create/upgrade the schema at startup. "production": schema changes
+# are a separate deploy step (python -m martini.migrate), workers only warm
+# their connection pool.
+STARTUP_MODE = os.getenv("STARTUP_MODE", "dev")
+if STARTUP_MODE not in ("dev", "production"):
+    raise RuntimeError(f"STARTUP_MODE must be 'dev' or 'production', got {STARTUP_MODE!r}")
+# Connections opened before serving; defaults to the pool size in production
+DB_POOL_WARM = int(os.getenv("DB_POOL_WARM", "-1"))
+
+async def warm_pool(count: int) -> None:
+    """Open *count* pooled connections up front so first requests don't pay for them."""
+    # all held at once, otherwise the pool would hand out the same one again
+    async with AsyncExitStack() as stack:
+        conns = await asyncio.gather(
+            *(stack.enter_async_context(engine.connect()) for _ in range(count))
+        )
+        await asyncio.gather(*(conn.execute(text("SELECT 1")) for conn in conns))
 
 # ----- Lifespan handler ──
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    logger.info("Starting up the application.")
-    await init_models()
+    logger.info(f"Starting up the application ({STARTUP_MODE} mode).")
+    if STARTUP_MODE == "dev":
+        await migrate(engine)
+    warm = DB_POOL_WARM
+    if warm < 0:
+        warm = engine.sync_engine.pool.size() if STARTUP_MODE == "production" else 0
+    if warm:
+        await warm_pool(warm)
+    await replica_router.start()
     logger.info("Database initialized, ready to serve requests.")
+
+    access_log_writer.start()
+    change_listener.start()
+    fund_matrix.request_refresh()
+    background = []
+    if ACCESS_ROLLUP_INTERVAL > 0:
+        background.append(asyncio.create_task(run_access_maintenance(engine)))
+    if POPULARITY_REFRESH_INTERVAL > 0:
+        background.append(asyncio.create_task(run_popularity_refresher(engine)))
+
     yield
+
     logger.info("Shutting down the application.")
+    for task in background:
+        task.cancel()
+    await asyncio.gather(*background, return_exceptions=True)
+    await fund_matrix.stop()
+    await replica_router.stop()
+    await change_listener.stop()
+    await access_log_writer.stop()
+    if doc_cache is not None:
+        await doc_cache.stop()
 
 app = FastAPI(lifespan=lifespan)
+# inside CORS, so 503s from admission control still carry its headers
+admission_lanes = build_lanes()
+app.add_middleware(AdmissionMiddleware, lanes=admission_lanes)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Total-Count", "Accept-Ranges", "Content-Range", "ETag", "Retry-After"],
 )
+app.add_middleware(GZipMiddleware)
+app.add_middleware(ProfilingMiddleware)
+# outermost, so the latency covers every other middleware too
+app.add_middleware(MetricsMiddleware)
+instrument_engine(engine)
+for replica in replica_router.replicas:
+    instrument_engine(replica.engine, replica.name)
 
 async def get_db() -> AsyncGenerator[AsyncSession, None]:
+    """Session on the primary, for writes."""
     async with AsyncSessionLocal() as session:
         yield session
 
+async def get_read_db(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    """Session for read-only endpoints: a healthy replica, else the primary."""
+    session = await replica_router.read_session(prefer_primary=wants_primary(request))
+    try:
+        yield session
+    finally:
+        await session.close()
+
 @app.get("/", response_model=dict)
 def root():
     return {"message": "Welcome to the Securities API"}
 
-# ── Manually declare the security_popularity view ──
+# ── Manually declare the security_popularity materialized view ──
 metadata = MetaData()
 security_popularity = Table(
     "security_popularity",
@@ -89,132 +251,789 @@ security_popularity = Table(
     Column("popularity", Integer),
 )
 
+def _keyset_after(sort: str, sort_key, id_col, key, last_id: int):
+    """WHERE clause selecting the rows that come after (key, last_id) in *sort* order."""
+    if sort == "popularity":
+        # descending key, ascending id: the redundant `<=` bound lets the
+        # planner start the index scan right at the cursor
+        return and_(sort_key <= key, or_(sort_key < key, id_col > last_id))
+    if sort == "issue_date":
+        # newest first, undated issues last
+        if key is None:
+            return and_(sort_key.is_(None), id_col > last_id)
+        return or_(
+            sort_key < key,
+            and_(sort_key == key, id_col > last_id),
+            sort_key.is_(None),
+        )
+    if sort == "maturity":
+        # soonest first, undated bonds last
+        if key is None:
+            return and_(sort_key.is_(None), id_col > last_id)
+        return or_(tuple_(sort_key, id_col) > tuple_(key, last_id), sort_key.is_(None))
+    return tuple_(sort_key, id_col) > tuple_(key, last_id)
+
+def _catalog_filters(
+    currency: Optional[str] = None,
+    maturity_from: Optional[datetime.date] = None,
+    maturity_to: Optional[datetime.date] = None,
+    issued_from: Optional[datetime.date] = None,
+    issued_to: Optional[datetime.date] = None,
+    min_volume: Optional[float] = None,
+    max_volume: Optional[float] = None,
+) -> list:
+    """WHERE clauses on Security for the /securities filters (bounds inclusive)."""
+    clauses = []
+    if currency is not None:
+        codes = list(dict.fromkeys(c.strip().upper() for c in currency.split(",") if c.strip()))
+        if not codes or not all(len(c) == 3 and c.isalpha() for c in codes):
+            raise HTTPException(status_code=422, detail="currency takes ISO 4217 codes, e.g. USD or USD,EUR")
+        clauses.append(Security.issue_currency == codes[0] if len(codes) == 1 else Security.issue_currency.in_(codes))
+    if maturity_from is not None:
+        clauses.append(Security.maturity >= maturity_from)
+    if maturity_to is not None:
+        clauses.append(Security.maturity <= maturity_to)
+    if issued_from is not None:
+        clauses.append(Security.issue_date >= issued_from)
+    if issued_to is not None:
+        clauses.append(Security.issue_date <= issued_to)
+    if min_volume is not None:
+        clauses.append(Security.issue_volume >= min_volume)
+    if max_volume is not None:
+        clauses.append(Security.issue_volume <= max_volume)
+    return clauses
+
+def _securities_list_query(sort: str, filters: list):
+    """
+    The /securities listing in *sort* order, narrowed by *filters* (from
+    :func:`_catalog_filters`).
+
+    Returns:
+        (stmt, sort_key, id_col) – the select, plus the columns a cursor
+        continues from.
+    """
+    if sort == "popularity":
+        id_col = security_popularity.c.id
+        sort_key = security_popularity.c.popularity
+        stmt = (
+            select(
+                id_col,
+                security_popularity.c.name,
+                security_popularity.c.isin,
+                sort_key.label("sort_key"),
+            )
+            .where(security_popularity.c.isin.is_not(None))
+            .order_by(desc(sort_key), id_col)
+        )
+        if filters:
+            # the ranking only carries id, name and isin
+            stmt = stmt.join(Security, Security.id == id_col).where(*filters)
+        return stmt, sort_key, id_col
+
+    id_col = Security.id
+    sort_key = {
+        "isin": Security.isin,
+        "name": Security.name,
+        "issue_date": Security.issue_date,
+        "maturity": Security.maturity,
+    }[sort]
+    stmt = (
+        select(Security.id, Security.name, Security.isin, sort_key.label("sort_key"))
+        .where(Security.isin.is_not(None), *filters)
+    )
+    if sort == "issue_date":
+        stmt = stmt.order_by(sort_key.desc().nulls_last(), id_col)
+    else:
+        stmt = stmt.order_by(sort_key, id_col)
+    return stmt, sort_key, id_col
+
 @app.get("/securities", response_model=List[SecurityListItemSchema])
 async def list_securities(
-    skip: int = 0,
-    limit: int = 100,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000, description="Page size (at most 1000; use /export for bulk)"),
     sort: str = Query(
         "popularity",
-        description="Sort field: popularity (default), isin, name, or issue_date",
-        regex="^(popularity|isin|name|issue_date)$"
+        description="Sort field: popularity (default), isin, name, issue_date or maturity",
+        regex="^(popularity|isin|name|issue_date|maturity)$"
+    ),
+    cursor: Optional[str] = Query(
+        None,
+        description="Opaque cursor from the X-Next-Cursor header of the previous page; "
+                    "takes precedence over skip",
     ),
-    db: AsyncSession = Depends(get_db)
+    currency: Optional[str] = Query(None, description="Issue currency, or several comma-separated, e.g. USD,EUR"),
+    maturity_from: Optional[datetime.date] = Query(None, description="Earliest maturity (inclusive)"),
+    maturity_to: Optional[datetime.date] = Query(None, description="Latest maturity (inclusive)"),
+    issued_from: Optional[datetime.date] = Query(None, description="First issue date (inclusive)"),
+    issued_to: Optional[datetime.date] = Query(None, description="Last issue date (inclusive)"),
+    min_volume: Optional[float] = Query(None, ge=0, description="Smallest issue volume"),
+    max_volume: Optional[float] = Query(None, ge=0, description="Largest issue volume"),
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
     List securities ordered by the given sort field, omitting null ISINs.
-    Newest issues (by issue_date) come first when sort=issue_date.
+    Newest issues (by issue_date) come first when sort=issue_date, the
+    soonest maturities when sort=maturity. The filters combine with AND; a
+    security with the filtered field unset never matches.
+
+    When a page is full the ``X-Next-Cursor`` header carries the cursor of
+    the next page; pass the same filters with it. Cursor pages cost the same
+    at any depth; ``skip`` is kept for compatibility but gets slower the
+    deeper it goes.
     """
+    filters = _catalog_filters(
+        currency, maturity_from, maturity_to, issued_from, issued_to, min_volume, max_volume
+    )
+    stmt, sort_key, id_col = _securities_list_query(sort, filters)
+
+    if cursor:
+        try:
+            key, last_id = decode_cursor(cursor, sort)
+        except InvalidCursor as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        stmt = stmt.where(_keyset_after(sort, sort_key, id_col, key, last_id))
+    elif skip:
+        stmt = stmt.offset(skip)
+
+    stmt = stmt.limit(limit)
+    result = await db.execute(stmt)
+    rows = result.all()
+
+    headers = {}
+    if rows and len(rows) == limit:
+        last = rows[-1]
+        headers["X-Next-Cursor"] = encode_cursor(sort, last.sort_key, last.id)
+
+    return FastJSONResponse(
+        [{"isin": row.isin, "name": row.name} for row in rows],
+        headers=headers,
+    )
+
+def _like_prefix(term: str) -> str:
+    """Escape LIKE wildcards in *term* and turn it into a prefix pattern."""
+    escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"{escaped}%"
+
+@app.get("/securities/search", response_model=List[SecurityListItemSchema])
+async def search_securities(
+    q: str = Query(
+        ...,
+        min_length=1,
+        max_length=100,
+        description="ISIN, CUSIP or SEDOL prefix, or part of the security name",
+    ),
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Search the whole catalog by identifier prefix or (fuzzy) name.
+
+    Exact identifier matches rank first, then identifier prefixes, then names
+    by trigram similarity; popularity breaks ties.
+    """
+    term = q.strip()
+    if not term:
+        raise HTTPException(status_code=422, detail="Query must not be blank")
+    ident = term.upper()
+    prefix = _like_prefix(ident)
+
+    exact_match = or_(
+        Security.isin == ident,
+        Security.cusip == ident,
+        Security.sedol == ident,
+    )
+    prefix_match = or_(
+        Security.isin.like(prefix),
+        Security.cusip.like(prefix),
+        Security.sedol.like(prefix),
+    )
+    conditions = [prefix_match]
+    # trigrams are meaningless below three characters, so short queries only
+    # hit the identifier prefix indexes
+    if len(term) >= 3:
+        conditions.append(Security.name.op("%")(term))
+        conditions.append(Security.name.ilike(f"%{_like_prefix(term)}"))
+
+    rank = case(
+        (exact_match, 3.0),
+        (prefix_match, 2.0),
+        else_=func.similarity(Security.name, term),
+    ).label("rank")
+    popularity = func.coalesce(security_popularity.c.popularity, 0).label("popularity")
+
     stmt = (
+        select(Security.id, Security.name, Security.isin, rank, popularity)
+        .outerjoin(security_popularity, security_popularity.c.id == Security.id)
+        .where(Security.isin.is_not(None))
+        .where(or_(*conditions))
+        .order_by(desc("rank"), desc("popularity"), Security.id)
+        .limit(limit)
+    )
+    result = await db.execute(stmt)
+
+    return FastJSONResponse([{"isin": row.isin, "name": row.name} for row in result.all()])
+
+# ----- Security detail and its sub-resources -----
+DETAIL_PARTS = ("documents", "price_history", "summary", "fund_holdings")
+
+def _parse_include(include: Optional[str]) -> frozenset:
+    """Validate a comma-separated ``include`` list; None means every part."""
+    if include is None:
+        return frozenset(DETAIL_PARTS)
+    parts = frozenset(p.strip() for p in include.split(",") if p.strip())
+    unknown = parts - set(DETAIL_PARTS)
+    if unknown:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Unknown include part(s): {', '.join(sorted(unknown))}; "
+                   f"expected any of {', '.join(DETAIL_PARTS)}",
+        )
+    return parts
+
+def _proxy_base(request: Request) -> str:
+    """Base URL for document proxy links — force HTTPS scheme."""
+    raw_base = str(request.base_url).rstrip("/")
+    if raw_base.startswith("http://"):
+        return raw_base.replace("http://", "https://", 1)
+    return raw_base  # already https or custom scheme
+
+async def _security_id(db: AsyncSession, isin: str) -> int:
+    sec_id = (await db.execute(
+        select(Security.id).where(Security.isin == isin)
+    )).scalar_one_or_none()
+    if sec_id is None:
+        raise HTTPException(status_code=404, detail=f"Security with ISIN={isin} not found")
+    return sec_id
+
+# Loaders take a set of security ids and run one query per part,
+# returning the part keyed by security id.
+async def _load_documents(db: AsyncSession, sec_ids: List[int], base: str) -> Dict[int, List[dict]]:
+    result = await db.execute(
+        select(Document.security_id, Document.id, Document.doc_type)
+        .where(Document.security_id.in_(sec_ids))
+        .order_by(Document.security_id, Document.id)
+    )
+    docs = defaultdict(list)
+    for sec_id, doc_id, doc_type in result.all():
+        docs[sec_id].append(
+            {"id": doc_id, "doc_type": doc_type, "url": f"{base}/documents/{doc_id}/proxy"}
+        )
+    return docs
+
+async def _load_price_history(db: AsyncSession, sec_ids: List[int]) -> Dict[int, List[dict]]:
+    ph = PriceHistory
+    result = await db.execute(
         select(
-            security_popularity.c.id,
-            security_popularity.c.name,
-            security_popularity.c.isin,
+            ph.security_id,
+            ph.date,
+            cast(ph.open, Float).label("open"),
+            cast(ph.close, Float).label("close"),
+            cast(ph.high, Float).label("high"),
+            cast(ph.low, Float).label("low"),
+            ph.volume,
+            ph.volume_nominal,
         )
-        .where(security_popularity.c.isin.is_not(None))
+        .where(ph.security_id.in_(sec_ids))
+        .order_by(ph.security_id, ph.date)
     )
+    keys = list(result.keys())[1:]
+    prices = defaultdict(list)
+    for sec_id, *values in result.all():
+        prices[sec_id].append(dict(zip(keys, values)))
+    return prices
 
-    if sort == "popularity":
-        stmt = stmt.order_by(desc(security_popularity.c.popularity))
-    elif sort == "isin":
-        stmt = stmt.order_by(security_popularity.c.isin)
-    elif sort == "name":
-        stmt = stmt.order_by(security_popularity.c.name)
-    else:
-        stmt = (
-            stmt
-            .join(Security, security_popularity.c.id == Security.id)
-            .order_by(desc(Security.issue_date))
+async def _load_summary(db: AsyncSession, sec_ids: List[int]) -> Dict[int, str]:
+    result = await db.execute(
+        select(SecuritySummary.security_id, SecuritySummary.summary)
+        .where(SecuritySummary.security_id.in_(sec_ids))
+    )
+    return dict(result.all())
+
+async def _load_holdings(db: AsyncSession, sec_ids: List[int]) -> Dict[int, List[dict]]:
+    result = await db.execute(
+        select(
+            FundHolding.security_id,
+            Fund.fund_name,
+            cast(FundHolding.pct_of_portfolio, Float).label("pct_of_portfolio"),
         )
+        .join(FundHolding, Fund.id == FundHolding.fund_id)
+        .where(FundHolding.security_id.in_(sec_ids))
+    )
+    holdings = defaultdict(list)
+    for sec_id, fund_name, pct in result.all():
+        holdings[sec_id].append({"fund_name": fund_name, "pct_of_portfolio": pct})
+    return holdings
 
-    stmt = stmt.offset(skip).limit(limit)
-    result = await db.execute(stmt)
-    rows = result.all()
+async def _load_details(
+    db: AsyncSession, secs: List[Security], parts: frozenset, base: str
+) -> Dict[int, dict]:
+    """
+    Detail payloads (plain dicts in SecuritySchema field order) for *secs*,
+    with a constant number of queries however many securities are asked for.
+    """
+    sec_ids = [sec.id for sec in secs]
+    summaries = await _load_summary(db, sec_ids) if "summary" in parts else {}
+    documents = await _load_documents(db, sec_ids, base) if "documents" in parts else {}
+    prices = await _load_price_history(db, sec_ids) if "price_history" in parts else {}
+    holdings = await _load_holdings(db, sec_ids) if "fund_holdings" in parts else {}
 
-    return [
-        SecurityListItemSchema(id=row.id, name=row.name, isin=row.isin)
-        for row in rows
-    ]
+    details = {}
+    for sec in secs:
+        payload = {
+            "id": sec.id,
+            "name": sec.name,
+            "cusip": sec.cusip,
+            "isin": sec.isin,
+            "sedol": sec.sedol,
+            "issuer_id": sec.issuer_id,
+            "issue_date": sec.issue_date,
+            "issue_volume": float(sec.issue_volume) if sec.issue_volume is not None else None,
+            "issue_currency": sec.issue_currency,
+            "maturity": sec.maturity,
+        }
+        if "summary" in parts:
+            payload["summary"] = summaries.get(sec.id)
+        if "documents" in parts:
+            payload["documents"] = documents.get(sec.id, [])
+        if "price_history" in parts:
+            payload["price_history"] = prices.get(sec.id, [])
+        if "fund_holdings" in parts:
+            payload["fund_holdings"] = holdings.get(sec.id, [])
+        details[sec.id] = payload
+    return details
+
+@app.post("/securities/batch", response_model=SecurityBatchResponse)
+async def get_securities_batch(
+    payload: SecurityBatchRequest,
+    request: Request,
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Details of many securities in one round trip, keyed by ISIN. Uses one
+    query per requested part regardless of batch size; unknown ISINs are
+    listed under ``missing`` instead of failing the batch.
+    """
+    parts = _parse_include(",".join(payload.include) if payload.include is not None else None)
+    isins = list(dict.fromkeys(payload.isins))
+
+    result = await db.execute(select(Security).where(Security.isin.in_(isins)))
+    secs = result.scalars().all()
+    details = await _load_details(db, secs, parts, _proxy_base(request))
+
+    client_host = request.client.host if request.client else None
+    user_agent = request.headers.get("user-agent", "")
+    for sec in secs:
+        access_log_writer.record(security_id=sec.id, client_host=client_host, user_agent=user_agent)
+
+    found = {sec.isin: details[sec.id] for sec in secs}
+    return FastJSONResponse({
+        "securities": {isin: found[isin] for isin in isins if isin in found},
+        "missing": [isin for isin in isins if isin not in found],
+    })
+
+# ----- Price history layouts -----
+# Accept header asking for the column layout; "; dates=delta" for delta dates
+COLUMNS_MEDIA_TYPE = "application/vnd.martini.columns+json"
+PRICE_COLUMNS = ("date", "open", "close", "high", "low", "volume", "volume_nominal")
+
+def _price_layout(request: Request, layout: Optional[str], dates: Optional[str]) -> str:
+    """
+    rows (default), columns or columns-delta, from the ``layout`` / ``dates``
+    query parameters or else the Accept header.
+    """
+    accept = request.headers.get("accept", "").replace(" ", "")
+    if layout is None:
+        layout = "columns" if COLUMNS_MEDIA_TYPE in accept else "rows"
+    if layout == "rows":
+        return "rows"
+    if dates is None:
+        dates = "delta" if "dates=delta" in accept else "iso"
+    return "columns-delta" if dates == "delta" else "columns"
+
+def _encode_prices(rows: List[dict], layout: str):
+    if layout == "rows":
+        return rows
+    return to_columns(rows, PRICE_COLUMNS, delta_dates=layout == "columns-delta")
 
-@app.get("/securities/{isin}", response_model=SecuritySchema)
+LAYOUT_QUERY = Query(
+    None, regex="^(rows|columns)$",
+    description="Price history as a list of bars (rows, default) or one array per field (columns)",
+)
+DATES_QUERY = Query(
+    None, regex="^(iso|delta)$",
+    description="With layout=columns: ISO dates (default) or date_start plus day deltas",
+)
+
+@dataclass(frozen=True)
+class CachedDetail:
+    security_id: int
+    body: bytes
+    etag: str
+    # gzip-encoded body, None when too small to be worth it
+    gzipped: Optional[bytes] = None
+
+@app.get(
+    "/securities/{isin}",
+    response_model=SecuritySchema,
+    response_model_exclude_unset=True,
+)
 async def get_security_by_isin(
     isin: str,
     request: Request,
-    db: AsyncSession = Depends(get_db)
+    include: Optional[str] = Query(
+        None,
+        description="Comma-separated parts to include: documents, price_history, "
+                    "summary, fund_holdings (default: all). Omitted parts are "
+                    "left out of the response and not queried.",
+    ),
+    layout: Optional[str] = LAYOUT_QUERY,
+    dates: Optional[str] = DATES_QUERY,
+    db: AsyncSession = Depends(get_read_db)
 ):
-    # 1) Fetch the security (with docs & history) and record access
-    now_utc = datetime.datetime.utcnow().replace(tzinfo=datetime.timezone.utc)
-    sec_q = (
-        select(Security)
-        .where(Security.isin == isin)
-        .options(
-            selectinload(Security.documents),
-            selectinload(Security.price_history),
-            selectinload(Security.summary),
-        )
-    )
-    result = await db.execute(sec_q)
-    sec = result.scalar_one_or_none()
-    if not sec:
-        raise HTTPException(status_code=404, detail=f"Security with ISIN={isin} not found")
+    """
+    Security detail. Serialized payloads are cached in-process and carry a
+    strong ETag; a matching If-None-Match gets a 304. Cache hits (including
+    304s) never touch the database. Large payloads are cached gzipped too
+    and sent that way to clients accepting it (ETag with a ``-gz`` suffix).
+    """
+    parts = _parse_include(include)
+    base = _proxy_base(request)
+    price_layout = _price_layout(request, layout, dates)
+    cache_key = (isin, parts, base, price_layout)
 
-    # record access
-    try:
-        ip_obj = ipaddress.ip_address(request.client.host)
-    except ValueError:
-        ip_obj = None
-    access = AccessLog(
-        security_id=sec.id,
-        accessed_at=now_utc,
-        client_ip=ip_obj,
+    cached = detail_cache.get(cache_key)
+    if cached is None:
+        version = detail_cache.version
+        cached = await _build_security_detail(db, isin, parts, base, layout=price_layout)
+        if _may_cache(db, detail_cache):
+            detail_cache.set(
+                cache_key, cached,
+                tags=(("id", cached.security_id), ("isin", isin)),
+                version=version,
+            )
+
+    # record access (buffered, written in bulk off the request path)
+    access_log_writer.record(
+        security_id=cached.security_id,
+        client_host=request.client.host if request.client else None,
         user_agent=request.headers.get("user-agent", ""),
     )
-    db.add(access)
-    await db.commit()
 
-    # proxy URLs — force HTTPS scheme
-    raw_base = str(request.base_url).rstrip("/")
-    if raw_base.startswith("http://"):
-        base = raw_base.replace("http://", "https://", 1)
+    body, etag = cached.body, cached.etag
+    headers = {"Cache-Control": "no-cache", "Vary": "Accept, Accept-Encoding"}
+    if cached.gzipped is not None and accepts_gzip(request.headers):
+        body, etag = cached.gzipped, gzip_etag(etag)
+        headers["Content-Encoding"] = "gzip"
+    headers["ETag"] = etag
+    if is_not_modified(request.headers, etag, None):
+        headers.pop("Content-Encoding", None)
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+async def _build_security_detail(
+    db: AsyncSession, isin: str, parts: frozenset, base: str, mode: str = DETAIL_QUERY_MODE,
+    layout: str = "rows",
+) -> CachedDetail:
+    if mode == "json":
+        # 1+2) Header and requested parts in a single statement
+        row = (await db.execute(_detail_json_query(isin, parts, base))).one_or_none()
+        if row is None:
+            raise HTTPException(status_code=404, detail=f"Security with ISIN={isin} not found")
+        sec_id, payload = row.id, _restore_floats(orjson.loads(row.payload))
     else:
-        base = raw_base  # already https or custom scheme
+        # 1) Fetch the security header
+        result = await db.execute(select(Security).where(Security.isin == isin))
+        sec = result.scalar_one_or_none()
+        if not sec:
+            raise HTTPException(status_code=404, detail=f"Security with ISIN={isin} not found")
 
-    for doc in sec.documents:
-        doc.url = f"{base}/documents/{doc.id}/proxy"
+        # 2) Only query the requested parts
+        sec_id, payload = sec.id, (await _load_details(db, [sec], parts, base))[sec.id]
 
-    # Fetch fund holdings
-    holdings_q = (
-        select(Fund.fund_name, FundHolding.pct_of_portfolio)
-        .join(FundHolding, Fund.id == FundHolding.fund_id)
-        .where(FundHolding.security_id == sec.id)
-    )
-    holdings_res = await db.execute(holdings_q)
-    holdings = [
-        {"fund_name": fn, "pct_of_portfolio": float(pct)}
-        for fn, pct in holdings_res.all()
-    ]
+    if "price_history" in payload:
+        payload["price_history"] = _encode_prices(payload["price_history"], layout)
+    # re-encoded with orjson in both modes so bodies (and ETags) match byte for byte
+    body = dumps(payload)
+    return CachedDetail(security_id=sec_id, body=body, etag=strong_etag(body), gzipped=gzip_body(body))
 
-    # 2) Pull summary text
-    summary_text = sec.summary.summary if sec.summary else None
-
-    return SecuritySchema(
-        id=sec.id,
-        name=sec.name,
-        cusip=sec.cusip,
-        isin=sec.isin,
-        sedol=sec.sedol,
-        issuer_id=sec.issuer_id,
-        issue_date=sec.issue_date,
-        issue_volume=float(sec.issue_volume) if sec.issue_volume is not None else None,
-        issue_currency=sec.issue_currency,
-        maturity=sec.maturity,
-        summary=summary_text,           # ← include summary here
-        documents=sec.documents,
-        price_history=sec.price_history,
-        fund_holdings=holdings,
+def _as_float(obj: dict, *keys: str) -> None:
+    for key in keys:
+        if obj.get(key) is not None:
+            obj[key] = float(obj[key])
+
+def _restore_floats(payload: dict) -> dict:
+    """
+    Postgres writes integral float8 values without a fraction (1000000, not
+    1000000.0), so they come back from the JSON as ints; turn them back into
+    floats to match the ORM path.
+    """
+    _as_float(payload, "issue_volume")
+    for bar in payload.get("price_history", ()):
+        _as_float(bar, "open", "close", "high", "low")
+    for holding in payload.get("fund_holdings", ()):
+        _as_float(holding, "pct_of_portfolio")
+    return payload
+
+def _json_object(*fields):
+    """json_build_object() over (key, expression) pairs; keys are inlined constants."""
+    args = []
+    for key, expr in fields:
+        args += [literal_column(f"'{key}'"), expr]
+    return func.json_build_object(*args)
+
+def _json_array(expr, order_by=None, where=None, join=None):
+    """Correlated subquery aggregating *expr* into a JSON array ('[]' when empty)."""
+    agg = func.json_agg(aggregate_order_by(expr, order_by) if order_by is not None else expr)
+    stmt = select(func.coalesce(agg, literal_column("'[]'::json")))
+    if join is not None:
+        stmt = stmt.select_from(join)
+    return stmt.where(where).scalar_subquery()
+
+def _detail_json_query(isin: str, parts: frozenset, base: str):
+    """
+    The whole detail payload as one ``json_build_object`` row, with each
+    requested part built by a correlated ``json_agg`` subquery. Key order
+    follows SecuritySchema, as in the ORM path.
+    """
+    s = Security
+    fields = [
+        ("id", s.id),
+        ("name", s.name),
+        ("cusip", s.cusip),
+        ("isin", s.isin),
+        ("sedol", s.sedol),
+        ("issuer_id", s.issuer_id),
+        ("issue_date", s.issue_date),
+        ("issue_volume", cast(s.issue_volume, Float)),
+        ("issue_currency", s.issue_currency),
+        ("maturity", s.maturity),
+    ]
+    if "summary" in parts:
+        fields.append(("summary", (
+            select(SecuritySummary.summary)
+            .where(SecuritySummary.security_id == s.id)
+            .limit(1)
+            .scalar_subquery()
+        )))
+    if "documents" in parts:
+        d = Document
+        url = cast(literal(base), String) + "/documents/" + cast(d.id, String) + "/proxy"
+        fields.append(("documents", _json_array(
+            _json_object(("id", d.id), ("doc_type", d.doc_type), ("url", url)),
+            order_by=d.id,
+            where=d.security_id == s.id,
+        )))
+    if "price_history" in parts:
+        ph = PriceHistory
+        fields.append(("price_history", _json_array(
+            _json_object(
+                ("date", ph.date),
+                ("open", cast(ph.open, Float)),
+                ("close", cast(ph.close, Float)),
+                ("high", cast(ph.high, Float)),
+                ("low", cast(ph.low, Float)),
+                ("volume", ph.volume),
+                ("volume_nominal", ph.volume_nominal),
+            ),
+            order_by=ph.date,
+            where=ph.security_id == s.id,
+        )))
+    if "fund_holdings" in parts:
+        fields.append(("fund_holdings", _json_array(
+            _json_object(
+                ("fund_name", Fund.fund_name),
+                ("pct_of_portfolio", cast(FundHolding.pct_of_portfolio, Float)),
+            ),
+            join=Fund.__table__.join(FundHolding, Fund.id == FundHolding.fund_id),
+            where=FundHolding.security_id == s.id,
+        )))
+    return (
+        select(s.id, cast(_json_object(*fields), Text).label("payload"))
+        .where(s.isin == isin)
     )
 
+@app.get("/securities/{isin}/documents", response_model=List[DocumentSchema])
+async def list_security_documents(isin: str, request: Request, db: AsyncSession = Depends(get_read_db)):
+    sec_id = await _security_id(db, isin)
+    docs = await _load_documents(db, [sec_id], _proxy_base(request))
+    return FastJSONResponse(docs.get(sec_id, []))
+
+@app.get("/securities/{isin}/holdings", response_model=List[FundHoldingSchema])
+async def list_security_holdings(isin: str, db: AsyncSession = Depends(get_read_db)):
+    sec_id = await _security_id(db, isin)
+    holdings = await _load_holdings(db, [sec_id])
+    return FastJSONResponse(holdings.get(sec_id, []))
+
+@app.get("/securities/{isin}/summary", response_model=SummarySchema)
+async def get_security_summary(isin: str, db: AsyncSession = Depends(get_read_db)):
+    sec_id = await _security_id(db, isin)
+    summaries = await _load_summary(db, [sec_id])
+    return SummarySchema(isin=isin, summary=summaries.get(sec_id))
+
+@app.get("/securities/{isin}/prices", response_model=Union[List[PriceHistorySchema], PriceColumnsSchema])
+async def get_price_history(
+    isin: str,
+    request: Request,
+    from_: Optional[datetime.date] = Query(None, alias="from", description="First date (inclusive)"),
+    to: Optional[datetime.date] = Query(None, description="Last date (inclusive)"),
+    interval: str = Query(
+        "day",
+        description="Bar size: day (default), week or month",
+        regex="^(day|week|month)$"
+    ),
+    max_points: Optional[int] = Query(
+        None, ge=3, le=10000,
+        description="Downsample (LTTB on close) to at most this many bars",
+    ),
+    layout: Optional[str] = LAYOUT_QUERY,
+    dates: Optional[str] = DATES_QUERY,
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Price history of a security for a date window, as daily bars or as
+    weekly / monthly OHLC bars aggregated in SQL. Bars are dated by the
+    start of their period.
+
+    ``layout=columns`` (or ``Accept: application/vnd.martini.columns+json``)
+    returns one array per field instead of one object per bar.
+    """
+    price_layout = _price_layout(request, layout, dates)
+    sec_id = await _security_id(db, isin)
+
+    ph = PriceHistory
+    if interval == "day":
+        stmt = select(
+            ph.date,
+            cast(ph.open, Float).label("open"),
+            cast(ph.close, Float).label("close"),
+            cast(ph.high, Float).label("high"),
+            cast(ph.low, Float).label("low"),
+            ph.volume,
+            ph.volume_nominal,
+        )
+        order = ph.date
+    else:
+        bucket = cast(func.date_trunc(interval, ph.date), Date).label("date")
+        stmt = select(
+            bucket,
+            cast(array_agg(aggregate_order_by(ph.open, ph.date.asc()))[1], Float).label("open"),
+            cast(array_agg(aggregate_order_by(ph.close, ph.date.desc()))[1], Float).label("close"),
+            cast(func.max(ph.high), Float).label("high"),
+            cast(func.min(ph.low), Float).label("low"),
+            func.sum(ph.volume).label("volume"),
+            func.sum(ph.volume_nominal).label("volume_nominal"),
+        ).group_by(bucket)
+        order = bucket
+
+    stmt = stmt.where(ph.security_id == sec_id)
+    if from_ is not None:
+        stmt = stmt.where(ph.date >= from_)
+    if to is not None:
+        stmt = stmt.where(ph.date <= to)
+    rows = rows_as_dicts(await db.execute(stmt.order_by(order)))
+
+    if max_points is not None and len(rows) > max_points:
+        x = np.fromiter((r["date"].toordinal() for r in rows), dtype=np.float64, count=len(rows))
+        y = np.fromiter((r["close"] for r in rows), dtype=np.float64, count=len(rows))
+        rows = [rows[i] for i in lttb_indices(x, y, max_points)]
+
+    return FastJSONResponse(_encode_prices(rows, price_layout), headers={"Vary": "Accept"})
+
+async def _price_analytics(db: AsyncSession, sec_ids: List[int], window: int) -> Dict[int, dict]:
+    """
+    Analytics of *sec_ids*: cached ones from analytics_cache, the rest from
+    one price query and one vectorized pass over all of them.
+    """
+    found, todo = {}, []
+    for sec_id in sec_ids:
+        cached = analytics_cache.get((sec_id, window))
+        if cached is None:
+            todo.append(sec_id)
+        else:
+            found[sec_id] = cached
+    if not todo:
+        return found
+
+    version = analytics_cache.version
+    ph = PriceHistory
+    rows = (await db.execute(
+        select(
+            ph.security_id,
+            ph.date,
+            cast(ph.close, Float),
+            cast(ph.high, Float),
+            cast(ph.low, Float),
+            cast(ph.volume, Float),
+        )
+        .where(ph.security_id.in_(todo))
+        .order_by(ph.security_id, ph.date)
+    )).all()
+    if rows:
+        ids, dates, close, high, low, volume = zip(*rows)
+        computed = await asyncio.to_thread(
+            price_analytics,
+            np.array(ids, dtype=np.int64),
+            np.array(dates, dtype=object),
+            np.array(close, dtype=np.float64),
+            np.array(high, dtype=np.float64),
+            np.array(low, dtype=np.float64),
+            np.array([np.nan if v is None else v for v in volume], dtype=np.float64),
+            window,
+        )
+    else:
+        computed = {}
+
+    cacheable = _may_cache(db, analytics_cache)
+    for sec_id in todo:
+        figures = computed.get(sec_id) or _no_prices(window)
+        if cacheable:
+            analytics_cache.set((sec_id, window), figures, tags=(("id", sec_id),), version=version)
+        found[sec_id] = figures
+    return found
+
+def _no_prices(window: int) -> dict:
+    return {"observations": 0, "window": window}
+
+@app.get("/securities/{isin}/analytics", response_model=PriceAnalyticsSchema, response_model_exclude_unset=True)
+async def get_price_analytics(
+    isin: str,
+    window: int = Query(20, ge=2, le=260, description="Trading days for rolling volatility"),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Returns, annualised and rolling volatility, maximum drawdown and VWAP
+    over a security's whole daily price history. Cached per security until
+    its prices change.
+    """
+    sec_id = await _security_id(db, isin)
+    figures = (await _price_analytics(db, [sec_id], window))[sec_id]
+    return FastJSONResponse({"isin": isin, **figures})
+
+@app.post("/securities/analytics/batch", response_model=PriceAnalyticsBatchResponse)
+async def get_price_analytics_batch(
+    payload: PriceAnalyticsBatchRequest,
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Price analytics of many securities, keyed by ISIN, computed together
+    from a single price query; unknown ISINs are listed under ``missing``.
+    """
+    isins = list(dict.fromkeys(payload.isins))
+    result = await db.execute(select(Security.isin, Security.id).where(Security.isin.in_(isins)))
+    ids = dict(result.all())
+    figures = await _price_analytics(db, list(ids.values()), payload.window)
+    return FastJSONResponse({
+        "analytics": {isin: {"isin": isin, **figures[ids[isin]]} for isin in isins if isin in ids},
+        "missing": [isin for isin in isins if isin not in ids],
+    })
+
 @app.post("/securities/{isin}/documents", response_model=DocumentSchema, status_code=201)
-async def add_document_to_security(isin: str, payload: DocumentCreate, db: AsyncSession = Depends(get_db)):
+async def add_document_to_security(
+    isin: str,
+    payload: DocumentCreate,
+    response: Response,
+    db: AsyncSession = Depends(get_db),
+):
     result = await db.execute(orm_select(Security).where(Security.isin == isin))
     sec = result.scalar_one_or_none()
     if not sec:
@@ -223,18 +1042,470 @@ async def add_document_to_security(isin: str, payload: DocumentCreate, db: Async
     db.add(doc)
     await db.commit()
     await db.refresh(doc)
+    detail_cache.invalidate(("id", sec.id))
+    pin_to_primary(response)
     return doc
 
+async def _open_version(name: str, start: int, end: int, generation: str):
+    """Bytes of one object generation; a replaced object drops its memoised stat."""
+    try:
+        async for chunk in doc_storage.open_range(name, start, end, generation):
+            yield chunk
+    except FileNotFoundError:
+        if doc_cache is not None:
+            doc_cache.forget(name)
+        raise
+
 @app.get("/documents/{doc_id}/proxy")
-async def proxy_document(doc_id: int, db: AsyncSession = Depends(get_db)):
+async def proxy_document(doc_id: int, request: Request, db: AsyncSession = Depends(get_read_db)):
+    """
+    Stream a stored document.
+
+    Supports single byte ranges (206 Partial Content) so the PDF viewer can
+    fetch pages lazily, and ETag / Last-Modified validators so revalidation
+    costs a 304 instead of a download.
+    """
     result = await db.execute(orm_select(Document).where(Document.id == doc_id))
     doc = result.scalar_one_or_none()
     if not doc:
         raise HTTPException(status_code=404, detail="Document not found")
-    bucket = gcs_client.bucket(BUCKET_NAME)
-    blob_name = doc.url.split(f"{BUCKET_NAME}/", 1)[-1]
-    data = bucket.blob(blob_name).download_as_bytes()
-    return Response(content=data, media_type="application/pdf")
+
+    name = object_name(doc.url)
+    try:
+        if doc_cache is not None:
+            info = await doc_cache.stat(doc_storage, name)
+        else:
+            info = await doc_storage.stat(name)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Document content not found")
+
+    headers = {"ETag": info.etag, "Accept-Ranges": "bytes"}
+    if info.last_modified is not None:
+        headers["Last-Modified"] = http_date(info.last_modified)
+
+    if is_not_modified(request.headers, info.etag, info.last_modified):
+        return Response(status_code=304, headers=headers)
+
+    byte_range = None
+    if if_range_allows(request.headers, info.etag, info.last_modified):
+        try:
+            byte_range = parse_byte_range(request.headers.get("range"), info.size)
+        except RangeNotSatisfiable:
+            headers["Content-Range"] = f"bytes */{info.size}"
+            return Response(status_code=416, headers=headers)
+
+    if byte_range is None:
+        start, end, status_code = 0, info.size - 1, 200
+    else:
+        (start, end), status_code = byte_range, 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{info.size}"
+    headers["Content-Length"] = str(end - start + 1)
+
+    if doc_cache is not None:
+        path = doc_cache.get_path(doc_storage, info)
+        if path is not None:
+            try:
+                f = await asyncio.to_thread(open, path, "rb")
+            except FileNotFoundError:
+                pass  # evicted in the meantime; stream from storage instead
+            else:
+                return FileRangeResponse(
+                    f, start, end,
+                    status_code=status_code,
+                    headers=headers,
+                    media_type="application/pdf",
+                )
+
+    return StreamingResponse(
+        instrument_fetch(_open_version(name, start, end, info.generation), doc_storage.kind),
+        status_code=status_code,
+        media_type="application/pdf",
+        headers=headers,
+    )
+
+# ----- Document search -----
+# ts_headline options of the page snippets
+SNIPPET_OPTIONS = "MaxFragments=2, MinWords=8, MaxWords=30, FragmentDelimiter=\" … \""
+
+@app.get("/search/documents", response_model=List[DocumentSearchHitSchema])
+async def search_documents(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=200, description="Words, \"quoted phrases\", OR, -excluded"),
+    isin: Optional[str] = Query(None, description="Only documents of this security"),
+    limit: int = Query(20, ge=1, le=100, description="Documents returned"),
+    pages: int = Query(3, ge=1, le=20, description="Best matching pages listed per document"),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Full-text search over the indexed page text of all documents
+    (``python -m scripts.index_documents``). Documents rank by their best
+    page; each lists its best pages with highlighted snippets, so clients
+    can open the PDF at the right page (``#page=N``).
+    """
+    if not q.strip():
+        raise HTTPException(status_code=422, detail="Query must not be blank")
+    query = func.websearch_to_tsquery(literal(SEARCH_CONFIG).cast(REGCONFIG), q)
+    dp = DocumentPage
+
+    hits = (
+        select(dp.document_id, dp.page, func.ts_rank_cd(dp.tsv, query).label("rank"))
+        .where(dp.tsv.op("@@")(query))
+    )
+    if isin is not None:
+        hits = hits.where(dp.document_id.in_(
+            select(Document.id).join(Security, Security.id == Document.security_id).where(Security.isin == isin)
+        ))
+    hits = hits.cte("hits")
+    docs = (
+        select(
+            hits.c.document_id,
+            func.max(hits.c.rank).label("score"),
+            func.count().label("matched_pages"),
+        )
+        .group_by(hits.c.document_id)
+        .order_by(desc("score"), desc("matched_pages"), hits.c.document_id)
+        .limit(limit)
+        .cte("docs")
+    )
+    best = (
+        select(
+            hits.c.document_id,
+            hits.c.page,
+            hits.c.rank,
+            func.row_number().over(
+                partition_by=hits.c.document_id, order_by=(hits.c.rank.desc(), hits.c.page)
+            ).label("n"),
+        )
+        .join(docs, docs.c.document_id == hits.c.document_id)
+        .subquery("best")
+    )
+    # snippets only for the pages returned: ts_headline re-parses the text
+    stmt = (
+        select(
+            docs.c.document_id,
+            docs.c.score,
+            docs.c.matched_pages,
+            Document.doc_type,
+            Security.isin,
+            best.c.page,
+            best.c.rank,
+            func.ts_headline(literal(SEARCH_CONFIG).cast(REGCONFIG), dp.text, query, SNIPPET_OPTIONS).label("snippet"),
+        )
+        .join(best, best.c.document_id == docs.c.document_id)
+        .join(dp, and_(dp.document_id == best.c.document_id, dp.page == best.c.page))
+        .join(Document, Document.id == docs.c.document_id)
+        .join(Security, Security.id == Document.security_id)
+        .where(best.c.n <= pages)
+        .order_by(desc(docs.c.score), desc(docs.c.matched_pages), docs.c.document_id, best.c.n)
+    )
+    result = await db.execute(stmt)
+
+    base = _proxy_base(request)
+    found: Dict[int, dict] = {}
+    for row in result.all():
+        doc = found.get(row.document_id)
+        if doc is None:
+            doc = found[row.document_id] = {
+                "id": row.document_id,
+                "isin": row.isin,
+                "doc_type": row.doc_type,
+                "url": f"{base}/documents/{row.document_id}/proxy",
+                "score": row.score,
+                "matched_pages": row.matched_pages,
+                "pages": [],
+            }
+        doc["pages"].append({"page": row.page, "rank": row.rank, "snippet": row.snippet})
+    return FastJSONResponse(list(found.values()))
+
+# ----- Funds -----
+async def _get_fund_matrix() -> HoldingsMatrix:
+    try:
+        return await fund_matrix.get()
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+def _fund_row(matrix: HoldingsMatrix, fund_id: int) -> int:
+    try:
+        return matrix.row(fund_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Fund {fund_id} not found")
+
+def _fund_item(matrix: HoldingsMatrix, row: int) -> dict:
+    fund = matrix.funds[row]
+    return {
+        "id": fund.id,
+        "fund_name": fund.fund_name,
+        "report_date": fund.report_date,
+        "holdings_count": matrix.holdings_count(row),
+    }
+
+async def _security_labels(db: AsyncSession, sec_ids) -> Dict[int, tuple]:
+    """(isin, name) of each security id, in one query."""
+    result = await db.execute(
+        select(Security.id, Security.isin, Security.name)
+        .where(Security.id.in_([int(i) for i in sec_ids]))
+    )
+    return {sec_id: (isin, name) for sec_id, isin, name in result.all()}
+
+@app.get("/funds", response_model=List[FundSchema])
+async def list_funds(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+):
+    """Funds with their number of holdings; the total is in ``X-Total-Count``."""
+    matrix = await _get_fund_matrix()
+    rows = range(skip, min(skip + limit, len(matrix.funds)))
+    return FastJSONResponse(
+        [_fund_item(matrix, row) for row in rows],
+        headers={"X-Total-Count": str(len(matrix.funds))},
+    )
+
+@app.get("/funds/{fund_id}/holdings", response_model=List[FundSecurityHoldingSchema])
+async def list_fund_holdings(
+    fund_id: int,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """A fund's holdings, largest weight first; the total is in ``X-Total-Count``."""
+    matrix = await _get_fund_matrix()
+    row = _fund_row(matrix, fund_id)
+    sec_ids, weights = matrix.holdings(row, skip, limit)
+    labels = await _security_labels(db, sec_ids) if len(sec_ids) else {}
+    items = []
+    for sec_id, weight in zip(sec_ids.tolist(), weights.tolist()):
+        isin, name = labels.get(sec_id, (None, None))
+        items.append({"security_id": sec_id, "isin": isin, "name": name, "pct_of_portfolio": weight})
+    return FastJSONResponse(items, headers={"X-Total-Count": str(matrix.holdings_count(row))})
+
+@app.get("/funds/{fund_a}/overlap/{fund_b}", response_model=FundOverlapSchema)
+async def get_fund_overlap(
+    fund_a: int,
+    fund_b: int,
+    limit: int = Query(50, ge=0, le=1000, description="Common holdings to list, largest overlap first"),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """Securities held by both funds and the share of the portfolios they have in common."""
+    matrix = await _get_fund_matrix()
+    row_a, row_b = _fund_row(matrix, fund_a), _fund_row(matrix, fund_b)
+    overlap = matrix.overlap(row_a, row_b)
+    sec_ids = overlap["security_ids"][:limit].tolist()
+    labels = await _security_labels(db, sec_ids) if sec_ids else {}
+    holdings = []
+    for sec_id, pct_a, pct_b in zip(sec_ids, overlap["weights_a"].tolist(), overlap["weights_b"].tolist()):
+        isin, name = labels.get(sec_id, (None, None))
+        holdings.append({"security_id": sec_id, "isin": isin, "name": name, "pct_a": pct_a, "pct_b": pct_b})
+    return FastJSONResponse({
+        "fund_a": _fund_item(matrix, row_a),
+        "fund_b": _fund_item(matrix, row_b),
+        "common_holdings": len(overlap["security_ids"]),
+        "overlap_weight": overlap["overlap_weight"],
+        "holdings": holdings,
+    })
+
+@app.get("/funds/{fund_id}/similar", response_model=List[SimilarFundSchema])
+async def list_similar_funds(fund_id: int, limit: int = Query(10, ge=1, le=100)):
+    """Funds whose holdings are most alike, by cosine similarity of the weight vectors."""
+    matrix = await _get_fund_matrix()
+    row = _fund_row(matrix, fund_id)
+    return FastJSONResponse([
+        {**_fund_item(matrix, other), "similarity": score, "common_holdings": common}
+        for other, score, common in matrix.similar(row, limit)
+    ])
+
+# ----- Bulk export -----
+EXPORT_MAX_ISINS = 1000
+
+def _export_filters(isins: Optional[str], currency: Optional[str]) -> list:
+    """WHERE clauses on Security shared by the exports."""
+    clauses = [Security.isin.is_not(None)]
+    if isins is not None:
+        wanted = list(dict.fromkeys(i.strip() for i in isins.split(",") if i.strip()))
+        if len(wanted) > EXPORT_MAX_ISINS:
+            raise HTTPException(status_code=422, detail=f"At most {EXPORT_MAX_ISINS} ISINs per export")
+        clauses.append(Security.isin.in_(wanted))
+    if currency is not None:
+        clauses.append(Security.issue_currency == currency.upper())
+    return clauses
+
+def _export_response(request: Request, fmt: str, name: str, columns, stmt) -> StreamingResponse:
+    """
+    Stream the rows of *stmt* encoded as *fmt*. The session is opened by
+    the body generator, not a dependency, so it lives exactly as long as
+    the stream; rows come from a server-side cursor EXPORT_BATCH_ROWS at a
+    time.
+    """
+    if fmt in ("parquet", "arrow") and not arrow_available():
+        raise HTTPException(status_code=501, detail=f"{fmt} export needs pyarrow installed on the server")
+    prefer_primary = wants_primary(request)
+
+    async def batches():
+        session = await replica_router.read_session(prefer_primary=prefer_primary)
+        try:
+            result = await session.stream(stmt.execution_options(yield_per=EXPORT_BATCH_ROWS))
+            async for rows in result.partitions():
+                yield rows
+        finally:
+            await session.close()
+
+    return StreamingResponse(
+        encode_rows(fmt, columns, batches()),
+        media_type=EXPORT_MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{name}.{fmt}"'},
+    )
+
+@app.get("/export/securities")
+async def export_securities(
+    request: Request,
+    format: str = Query("ndjson", regex=EXPORT_FORMATS, description="ndjson (default), csv, parquet or arrow"),
+    isins: Optional[str] = Query(None, description="Comma-separated ISINs (default all)"),
+    currency: Optional[str] = Query(None, description="Issue currency, e.g. USD"),
+    from_: Optional[datetime.date] = Query(None, alias="from", description="First issue date (inclusive)"),
+    to: Optional[datetime.date] = Query(None, description="Last issue date (inclusive)"),
+):
+    """
+    The security catalog as a stream, ordered by ISIN. Memory use stays
+    flat whatever the size of the export.
+    """
+    stmt = (
+        select(
+            Security.isin,
+            Security.cusip,
+            Security.sedol,
+            Security.name,
+            Security.issue_date,
+            cast(Security.issue_volume, Float),
+            Security.issue_currency,
+            Security.maturity,
+        )
+        .where(*_export_filters(isins, currency))
+        .order_by(Security.isin)
+    )
+    if from_ is not None:
+        stmt = stmt.where(Security.issue_date >= from_)
+    if to is not None:
+        stmt = stmt.where(Security.issue_date <= to)
+    columns = [
+        ("isin", "str"), ("cusip", "str"), ("sedol", "str"), ("name", "str"),
+        ("issue_date", "date"), ("issue_volume", "float"), ("issue_currency", "str"), ("maturity", "date"),
+    ]
+    return _export_response(request, format, "securities", columns, stmt)
+
+@app.get("/export/prices")
+async def export_prices(
+    request: Request,
+    format: str = Query("ndjson", regex=EXPORT_FORMATS, description="ndjson (default), csv, parquet or arrow"),
+    isins: Optional[str] = Query(None, description="Comma-separated ISINs (default all)"),
+    currency: Optional[str] = Query(None, description="Issue currency of the securities, e.g. USD"),
+    from_: Optional[datetime.date] = Query(None, alias="from", description="First date (inclusive)"),
+    to: Optional[datetime.date] = Query(None, description="Last date (inclusive)"),
+):
+    """
+    Daily price history of many securities as a stream, ordered by
+    security and date (the order of the price_history index).
+    """
+    ph = PriceHistory
+    stmt = (
+        select(
+            Security.isin,
+            ph.date,
+            cast(ph.open, Float),
+            cast(ph.high, Float),
+            cast(ph.low, Float),
+            cast(ph.close, Float),
+            ph.volume,
+            ph.volume_nominal,
+        )
+        .join(Security, Security.id == ph.security_id)
+        .where(*_export_filters(isins, currency))
+        .order_by(ph.security_id, ph.date)
+    )
+    if from_ is not None:
+        stmt = stmt.where(ph.date >= from_)
+    if to is not None:
+        stmt = stmt.where(ph.date <= to)
+    columns = [
+        ("isin", "str"), ("date", "date"), ("open", "float"), ("high", "float"),
+        ("low", "float"), ("close", "float"), ("volume", "int"), ("volume_nominal", "int"),
+    ]
+    return _export_response(request, format, "prices", columns, stmt)
+
+# ----- Metrics -----
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus scrape endpoint."""
+    return metrics_response()
+
+# ----- Admin -----
+@app.get("/admin/slow-queries", dependencies=[Depends(require_admin)])
+async def slow_query_samples():
+    """Most recent statements slower than SLOW_QUERY_SECONDS, newest first."""
+    return list(reversed(slow_queries))
+
+@app.get("/admin/detail-cache", dependencies=[Depends(require_admin)])
+async def detail_cache_stats():
+    """Usage and hit/miss counters of the security detail cache."""
+    return detail_cache.stats()
+
+@app.get("/admin/admission", dependencies=[Depends(require_admin)])
+async def admission_control_stats():
+    """Per-lane concurrency, queue depth and rejections of admission control."""
+    return admission_stats(admission_lanes)
+
+@app.get("/admin/replicas", dependencies=[Depends(require_admin)])
+async def replica_stats():
+    """Health, replay lag and traffic of the read replicas."""
+    return replica_router.stats()
+
+@app.get("/admin/analytics-cache", dependencies=[Depends(require_admin)])
+async def analytics_cache_stats():
+    """Usage and hit/miss counters of the price analytics cache."""
+    return analytics_cache.stats()
+
+@app.get("/admin/doc-cache", dependencies=[Depends(require_admin)])
+async def document_cache_stats():
+    """Hit/miss counters and usage of the local document cache."""
+    if doc_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **doc_cache.stats()}
+
+@app.get("/admin/profiles", dependencies=[Depends(require_admin)])
+async def list_request_profiles():
+    """Stored request profiles (see ProfilingMiddleware), newest first."""
+    return await asyncio.to_thread(list_profiles)
+
+@app.get("/admin/profiles/{name}", dependencies=[Depends(require_admin)])
+async def download_request_profile(name: str):
+    """One profile in the folded stack format (flamegraph.pl, speedscope)."""
+    path = PROFILE_DIR / name
+    if not PROFILE_NAME.match(name) or not path.is_file():
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="text/plain", filename=name)
+
+@app.post("/admin/popularity/refresh", dependencies=[Depends(require_admin)])
+async def trigger_popularity_refresh():
+    """Recompute the materialized popularity ranking now."""
+    refreshed = await refresh_popularity(engine)
+    return {"refreshed": refreshed}
+
+@app.post("/admin/access/rollup", dependencies=[Depends(require_admin)])
+async def trigger_access_rollup():
+    """
+    Recount recent raw access events into daily counts, create upcoming
+    monthly partitions and drop expired ones now.
+    """
+    done = await maintain_access_logs(engine)
+    if done is None:
+        return {"skipped": True}
+    return done
+
+@app.post("/admin/funds/refresh", dependencies=[Depends(require_admin)])
+async def trigger_fund_matrix_refresh():
+    """Rebuild the fund holdings matrix now."""
+    matrix = await fund_matrix.refresh()
+    return {"funds": len(matrix.funds), "holdings": matrix.nnz, "built_at": fund_matrix.built_at}
 
 if __name__ == "__main__":
+    import uvicorn
+
     uvicorn.run("martini.main:app", host="::", port=6010, reload=True)
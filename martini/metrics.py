@@ -0,0 +1,248 @@
+# martini/metrics.py
+
+import collections
+import contextvars
+import os
+import time
+from typing import AsyncIterator, Optional
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+from prometheus_client.core import GaugeMetricFamily, REGISTRY
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from starlette.responses import Response
+
+# Statements slower than this are kept as samples for /admin/slow-queries
+SLOW_QUERY_SECONDS = float(os.getenv("SLOW_QUERY_SECONDS", "0.5"))
+SLOW_QUERY_SAMPLES = int(os.getenv("SLOW_QUERY_SAMPLES", "50"))
+
+_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+REQUEST_LATENCY = Histogram(
+    "martini_http_request_duration_seconds",
+    "Time from request start until the response body was sent.",
+    ["method", "route", "status"],
+    buckets=_LATENCY_BUCKETS,
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "martini_http_requests_in_flight",
+    "Requests currently being handled.",
+)
+STATEMENTS_PER_REQUEST = Histogram(
+    "martini_db_statements_per_request",
+    "SQL statements executed while handling one request.",
+    ["route"],
+    buckets=(0, 1, 2, 3, 4, 5, 6, 8, 10, 15, 20, 50),
+)
+STATEMENT_LATENCY = Histogram(
+    "martini_db_statement_duration_seconds",
+    "Execution time of single SQL statements.",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0),
+)
+SLOW_STATEMENTS = Counter(
+    "martini_db_slow_statements_total",
+    f"Statements slower than SLOW_QUERY_SECONDS ({SLOW_QUERY_SECONDS}s).",
+)
+POOL_WAIT = Histogram(
+    "martini_db_pool_wait_seconds",
+    "Time spent waiting for a pooled connection (including opening a new one).",
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0),
+)
+STORAGE_FETCH_BYTES = Counter(
+    "martini_storage_fetch_bytes_total",
+    "Bytes read from document storage.",
+    ["backend"],
+)
+STORAGE_FETCH_LATENCY = Histogram(
+    "martini_storage_fetch_duration_seconds",
+    "Time to read one byte range from document storage.",
+    ["backend"],
+    buckets=_LATENCY_BUCKETS,
+)
+STORAGE_FIRST_BYTE = Histogram(
+    "martini_storage_fetch_first_byte_seconds",
+    "Time until document storage returned the first chunk of a range.",
+    ["backend"],
+    buckets=_LATENCY_BUCKETS,
+)
+
+ADMISSION_REJECTED = Counter(
+    "martini_admission_rejected_total",
+    "Requests turned away with 503 by admission control.",
+    ["lane", "reason"],
+)
+ADMISSION_WAIT = Histogram(
+    "martini_admission_wait_seconds",
+    "Time admitted requests spent queued for a slot.",
+    ["lane"],
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+
+# Exponentially weighted average of pool checkout waits, for admission control
+_POOL_WAIT_WEIGHT = 0.1
+_pool_wait_average = 0.0
+
+# Most recent slow statements, newest last
+slow_queries = collections.deque(maxlen=SLOW_QUERY_SAMPLES)
+
+
+class _RequestStats:
+    __slots__ = ("scope", "statements")
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.statements = 0
+
+
+_current_request: contextvars.ContextVar[Optional[_RequestStats]] = contextvars.ContextVar(
+    "martini_current_request", default=None
+)
+
+
+def _route_name(scope) -> str:
+    # set by FastAPI once routing matched; keeps label cardinality bounded
+    route = scope.get("route")
+    return getattr(route, "path", None) or "<unmatched>"
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware timing each HTTP request (until the last body
+    chunk went out, so streamed documents are covered) and counting the
+    SQL statements it ran.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = _RequestStats(scope)
+        token = _current_request.set(stats)
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            REQUESTS_IN_FLIGHT.dec()
+            _current_request.reset(token)
+            route = _route_name(scope)
+            REQUEST_LATENCY.labels(scope["method"], route, str(status)).observe(elapsed)
+            STATEMENTS_PER_REQUEST.labels(route).observe(stats.statements)
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """The asyncio queue pool, timing how long each checkout waits."""
+
+    def _do_get(self):
+        global _pool_wait_average
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            wait = time.perf_counter() - start
+            POOL_WAIT.observe(wait)
+            _pool_wait_average += _POOL_WAIT_WEIGHT * (wait - _pool_wait_average)
+
+
+def pool_wait_average() -> float:
+    """Recent pool checkout wait in seconds (moving average over all engines)."""
+    return _pool_wait_average
+
+
+class _PoolCollector:
+    """Reads the pool counters at scrape time, so checkouts cost nothing extra."""
+
+    def __init__(self):
+        self.engines = {}
+
+    def collect(self):
+        gauges = {
+            "size": GaugeMetricFamily("martini_db_pool_size", "Configured pool size.", labels=["db"]),
+            "checkedout": GaugeMetricFamily(
+                "martini_db_pool_checked_out", "Connections currently checked out.", labels=["db"]),
+            "checkedin": GaugeMetricFamily(
+                "martini_db_pool_checked_in", "Idle connections in the pool.", labels=["db"]),
+            "overflow": GaugeMetricFamily(
+                "martini_db_pool_overflow", "Connections opened beyond pool_size.", labels=["db"]),
+        }
+        for name, engine in self.engines.items():
+            pool = engine.sync_engine.pool
+            for attr, gauge in gauges.items():
+                fn = getattr(pool, attr, None)
+                if fn is not None:
+                    gauge.add_metric([name], fn())
+        return list(gauges.values())
+
+
+_pool_collector = _PoolCollector()
+REGISTRY.register(_pool_collector)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+    stats = _current_request.get()
+    if stats is not None:
+        stats.statements += 1
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    STATEMENT_LATENCY.observe(elapsed)
+    if elapsed >= SLOW_QUERY_SECONDS:
+        SLOW_STATEMENTS.inc()
+        stats = _current_request.get()
+        slow_queries.append({
+            "at": time.time(),
+            "seconds": round(elapsed, 4),
+            "route": _route_name(stats.scope) if stats is not None else None,
+            "statement": " ".join(statement.split())[:2000],
+        })
+
+
+def _handle_error(context):
+    # the statement failed, so after_cursor_execute won't pop its start time
+    starts = context.connection.info.get("query_start") if context.connection is not None else None
+    if starts:
+        starts.pop()
+
+
+def instrument_engine(engine: AsyncEngine, name: str = "primary") -> None:
+    """Time every statement of *engine* and export its pool counters as *name*."""
+    sync_engine = engine.sync_engine
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(sync_engine, "handle_error", _handle_error)
+    _pool_collector.engines[name] = engine
+
+
+async def instrument_fetch(chunks: AsyncIterator[bytes], backend: str) -> AsyncIterator[bytes]:
+    """Pass a storage range through, recording bytes, time to first byte and total time."""
+    start = time.perf_counter()
+    first = True
+    try:
+        async for chunk in chunks:
+            if first:
+                STORAGE_FIRST_BYTE.labels(backend).observe(time.perf_counter() - start)
+                first = False
+            STORAGE_FETCH_BYTES.labels(backend).inc(len(chunk))
+            yield chunk
+    finally:
+        STORAGE_FETCH_LATENCY.labels(backend).observe(time.perf_counter() - start)
+
+
+def metrics_response() -> Response:
+    """The default registry in the Prometheus text format."""
+    return Response(generate_latest(REGISTRY), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,62 @@
+# martini/migrate.py
+#
+# Schema management, run once per deploy before the API starts:
+#   python -m martini.migrate
+# In STARTUP_MODE=dev (the default) the API also runs it at startup.
+
+import asyncio
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from .access_rollup import convert_legacy_access_logs, ensure_partitions, migrate_legacy_rows
+from .db import Base, engine
+from .notify import ensure_change_triggers
+from .popularity import ensure_popularity_view
+from .utils.logging_helper import logger
+
+from . import models  # noqa: F401  (registers the tables on Base.metadata)
+
+# Arbitrary key for the advisory lock that serialises migrations started by
+# several workers or instances at once (STARTUP_MODE=dev).
+_MIGRATE_LOCK_KEY = 0x6D696772  # "migr"
+
+
+def _create_missing_indexes(sync_conn) -> None:
+    """create_all skips existing tables, so indexes added to a model later are created here."""
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(sync_conn, checkfirst=True)
+
+
+async def migrate(engine: AsyncEngine = engine) -> None:
+    """
+    Create missing tables, indexes, access log partitions, the popularity
+    view and change triggers.
+    """
+    logger.debug("Initializing database tables…")
+    async with engine.begin() as conn:
+        # concurrent DDL fails with "tuple concurrently updated" or "already
+        # exists"; later workers wait here and find everything in place
+        await conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _MIGRATE_LOCK_KEY})
+        # trigram indexes on securities.name need pg_trgm
+        await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        legacy_access_logs = await convert_legacy_access_logs(conn)
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(_create_missing_indexes)
+        if legacy_access_logs:
+            await migrate_legacy_rows(conn)
+        await ensure_partitions(conn)
+        await ensure_popularity_view(conn)
+        await ensure_change_triggers(conn)
+    logger.debug("Database tables initialized.")
+
+
+async def _main() -> None:
+    await migrate()
+    await engine.dispose()
+    logger.info("Database schema is up to date.")
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
@@ -1,7 +1,7 @@
 # martini/models.py
 
-from sqlalchemy import Column, Integer, ForeignKey, DateTime, String, Date, Numeric, Text
-from sqlalchemy.dialects.postgresql import INET
+from sqlalchemy import Column, Computed, Integer, ForeignKey, DateTime, String, Date, Numeric, Text, Index, and_
+from sqlalchemy.dialects.postgresql import INET, TSVECTOR
 from sqlalchemy.orm import relationship
 from .db import Base
 
@@ -20,6 +20,37 @@ class Security(Base):
     issue_currency = Column(String(3), nullable=True)
     maturity       = Column(Date, nullable=True)
 
+    __table_args__ = (
+        # prefix lookups (LIKE 'XS12%') on the identifiers
+        Index("ix_securities_isin_prefix", "isin", postgresql_ops={"isin": "varchar_pattern_ops"}),
+        Index("ix_securities_cusip_prefix", "cusip", postgresql_ops={"cusip": "varchar_pattern_ops"}),
+        Index("ix_securities_sedol_prefix", "sedol", postgresql_ops={"sedol": "varchar_pattern_ops"}),
+        # keyset pagination for the name / issue_date sorts
+        Index("ix_securities_name_id", "name", "id"),
+        Index("ix_securities_issue_date_id", issue_date.desc().nulls_last(), id),
+        # /securities filters; partial on isin like the listing itself.
+        # Currency leads where it is combined with a sort, ranges use their own
+        Index("ix_securities_currency_name_id", "issue_currency", "name", "id",
+              postgresql_where=isin.is_not(None)),
+        Index("ix_securities_currency_isin_id", "issue_currency", "isin", "id",
+              postgresql_where=isin.is_not(None)),
+        Index("ix_securities_currency_issue_date_id", issue_currency, issue_date.desc().nulls_last(), id,
+              postgresql_where=isin.is_not(None)),
+        Index("ix_securities_currency_maturity_id", "issue_currency", "maturity", "id",
+              postgresql_where=isin.is_not(None)),
+        Index("ix_securities_maturity_id", "maturity", "id",
+              postgresql_where=isin.is_not(None)),
+        Index("ix_securities_issue_volume", "issue_volume",
+              postgresql_where=and_(isin.is_not(None), issue_volume.is_not(None))),
+        # fuzzy name search, requires the pg_trgm extension
+        Index(
+            "ix_securities_name_trgm",
+            "name",
+            postgresql_using="gin",
+            postgresql_ops={"name": "gin_trgm_ops"},
+        ),
+    )
+
     documents       = relationship(
         "Document",
         back_populates="security",
@@ -75,6 +106,26 @@ class Document(Base):
 
     security = relationship("Security", back_populates="documents")
 
+# Text search configuration of document_pages.tsv; queries must use the same
+SEARCH_CONFIG = "english"
+
+class DocumentPage(Base):
+    """Extracted text of one page of a document (pages numbered from 1)."""
+    __tablename__ = "document_pages"
+
+    document_id = Column(
+        Integer,
+        ForeignKey("documents.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    page        = Column(Integer, primary_key=True)
+    text        = Column(Text, nullable=False)
+    tsv         = Column(TSVECTOR, Computed(f"to_tsvector('{SEARCH_CONFIG}', text)", persisted=True))
+
+    __table_args__ = (
+        Index("ix_document_pages_tsv", "tsv", postgresql_using="gin"),
+    )
+
 class PriceHistory(Base):
     __tablename__ = "price_history"
 
@@ -95,20 +146,50 @@ class PriceHistory(Base):
     security = relationship("Security", back_populates="price_history")
 
 class AccessLog(Base):
+    """
+    Raw access events, partitioned by month of accessed_at (UTC); see
+    martini/access_rollup.py for the partitions, rollup and retention.
+    """
     __tablename__ = "access_logs"
 
-    id           = Column(Integer, primary_key=True, index=True)
+    id           = Column(Integer, primary_key=True, autoincrement=True, index=True)
     security_id  = Column(
         Integer,
         ForeignKey("securities.id", ondelete="CASCADE"),
         nullable=False
     )
-    accessed_at  = Column(DateTime(timezone=True), nullable=False)
+    # part of the key: a partitioned table's keys must include the partition column
+    accessed_at  = Column(DateTime(timezone=True), primary_key=True)
     client_ip    = Column(INET, nullable=True)
     user_agent   = Column(String, nullable=True)
 
     security = relationship("Security")
 
+    __table_args__ = (
+        # rollups scan recent time ranges of an append-only table
+        Index("ix_access_logs_accessed_at", "accessed_at", postgresql_using="brin"),
+        {"postgresql_partition_by": "RANGE (accessed_at)"},
+    )
+
+class AccessDaily(Base):
+    """Views per security and day (UTC), rolled up from access_logs."""
+    __tablename__ = "access_daily"
+
+    security_id = Column(
+        Integer,
+        ForeignKey("securities.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    day         = Column(Date, primary_key=True)
+    views       = Column(Integer, nullable=False)
+
+class AccessRollupState(Base):
+    """Single row: access_daily is final for days before rolled_until; later days are recounted."""
+    __tablename__ = "access_rollup_state"
+
+    id           = Column(Integer, primary_key=True)
+    rolled_until = Column(DateTime(timezone=True), nullable=False)
+
 class Fund(Base):
     __tablename__ = "funds"
 
@@ -0,0 +1,141 @@
+# martini/notify.py
+
+import asyncio
+from collections import defaultdict
+from typing import Callable, Dict, List
+
+import asyncpg
+from sqlalchemy import text
+from sqlalchemy.engine import URL
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from .utils.logging_helper import logger
+
+# Payload: the id of the security whose detail payload changed
+SECURITY_CHANGED = "security_changed"
+# Sent by the fund loader scripts once a load is committed; no payload
+FUNDS_CHANGED = "funds_changed"
+
+# Tables feeding the security detail payload, with the column holding the security id
+_WATCHED_TABLES = {
+    "securities": "id",
+    "documents": "security_id",
+    "price_history": "security_id",
+    "security_summaries": "security_id",
+    "fund_holdings": "security_id",
+}
+
+# Statement-level, so a bulk load sends one NOTIFY per security it touched
+# rather than one per row. Transition tables only work with single-event
+# triggers, hence one trigger per operation.
+_TRIGGER_EVENTS = {
+    "insert": ("INSERT", "NEW TABLE AS new_rows"),
+    "update": ("UPDATE", "OLD TABLE AS old_rows NEW TABLE AS new_rows"),
+    "delete": ("DELETE", "OLD TABLE AS old_rows"),
+}
+
+CHANGE_TRIGGER_DDL = [
+    f"""
+    CREATE OR REPLACE FUNCTION notify_security_changed() RETURNS trigger AS $$
+    DECLARE
+      changed text;
+    BEGIN
+      -- TG_ARGV[0]: the column holding the security id
+      FOR changed IN EXECUTE format(
+        CASE TG_OP
+          WHEN 'INSERT' THEN 'SELECT DISTINCT %1$I::text FROM new_rows'
+          WHEN 'DELETE' THEN 'SELECT DISTINCT %1$I::text FROM old_rows'
+          ELSE 'SELECT %1$I::text FROM old_rows UNION SELECT %1$I::text FROM new_rows'
+        END, TG_ARGV[0])
+      LOOP
+        PERFORM pg_notify('{SECURITY_CHANGED}', changed);
+      END LOOP;
+      RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+] + [
+    stmt
+    for table, column in _WATCHED_TABLES.items()
+    # the per-row trigger of earlier versions
+    for stmt in [f"DROP TRIGGER IF EXISTS {table}_notify_security_changed ON {table}"] + [
+        stmt
+        for suffix, (event, transition) in _TRIGGER_EVENTS.items()
+        for stmt in (
+            f"DROP TRIGGER IF EXISTS {table}_notify_security_changed_{suffix} ON {table}",
+            f"""
+            CREATE TRIGGER {table}_notify_security_changed_{suffix}
+              AFTER {event} ON {table}
+              REFERENCING {transition}
+              FOR EACH STATEMENT EXECUTE FUNCTION notify_security_changed('{column}')
+            """,
+        )
+    ]
+]
+
+
+async def ensure_change_triggers(conn: AsyncConnection) -> None:
+    """Install the triggers that announce security changes via NOTIFY."""
+    for ddl in CHANGE_TRIGGER_DDL:
+        await conn.execute(text(ddl))
+
+
+class ChangeListener:
+    """
+    Dedicated asyncpg connection LISTENing on Postgres channels, so writes
+    made by other processes (loader scripts, other workers, the indexer
+    function) reach this process. Reconnects with backoff if the connection
+    drops.
+    """
+
+    def __init__(self, url: URL, retry_delay: float = 5.0):
+        # asyncpg wants a plain postgresql:// DSN
+        self.dsn = url.set(drivername="postgresql").render_as_string(hide_password=False)
+        self.retry_delay = retry_delay
+        self._handlers: Dict[str, List[Callable[[str], None]]] = defaultdict(list)
+        self._task = None
+
+    def subscribe(self, channel: str, handler: Callable[[str], None]) -> None:
+        """Call ``handler(payload)`` for every notification on *channel*."""
+        self._handlers[channel].append(handler)
+
+    def _dispatch(self, connection, pid, channel: str, payload: str) -> None:
+        for handler in self._handlers.get(channel, ()):
+            try:
+                handler(payload)
+            except Exception as e:
+                logger.error(f"Handler for {channel} failed on payload {payload!r}: {e}")
+
+    def start(self) -> None:
+        if self._task is None and self._handlers:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            conn = None
+            try:
+                conn = await asyncpg.connect(self.dsn)
+                lost = asyncio.Event()
+                conn.add_termination_listener(lambda _conn: lost.set())
+                for channel in self._handlers:
+                    await conn.add_listener(channel, self._dispatch)
+                logger.info(f"Listening for {', '.join(self._handlers)} notifications.")
+                await lost.wait()
+                logger.warning("Notification connection lost, reconnecting.")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Notification listener failed: {e}")
+            finally:
+                if conn is not None and not conn.is_closed():
+                    await conn.close()
+            # anything may have changed while we were not listening
+            for channel in self._handlers:
+                self._dispatch(None, None, channel, "*")
+            await asyncio.sleep(self.retry_delay)
@@ -0,0 +1,63 @@
+# martini/pagination.py
+
+import base64
+import datetime
+import json
+from typing import Any, Optional, Tuple
+
+
+# sorts whose key is a date, carried as ISO text in the cursor
+DATE_SORTS = ("issue_date", "maturity")
+
+
+class InvalidCursor(ValueError):
+    """Raised when a client sends a cursor we did not issue (or for another sort)."""
+
+
+def encode_cursor(sort: str, key: Any, last_id: int) -> str:
+    """
+    Build an opaque cursor pointing just past the row (*key*, *last_id*)
+    in the given sort order.
+    """
+    if isinstance(key, datetime.date):
+        key = key.isoformat()
+    raw = json.dumps({"s": sort, "k": key, "i": last_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _is_int4(value: Any) -> bool:
+    """A JSON integer (not a bool) that fits the integer columns it is compared with."""
+    return isinstance(value, int) and not isinstance(value, bool) and -2**31 <= value < 2**31
+
+
+def decode_cursor(cursor: str, sort: str) -> Tuple[Optional[Any], int]:
+    """
+    Decode a cursor produced by :func:`encode_cursor` for *sort*.
+
+    Returns:
+        (key, last_id) where key is already converted back to the sort
+        column's Python type (``date`` for issue_date and maturity).
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        cursor_sort, key, last_id = data["s"], data["k"], data["i"]
+    except (ValueError, KeyError, TypeError) as e:
+        raise InvalidCursor("Malformed cursor") from e
+    if not _is_int4(last_id):
+        raise InvalidCursor("Malformed cursor")
+
+    if cursor_sort != sort:
+        raise InvalidCursor(f"Cursor was issued for sort={cursor_sort}, not sort={sort}")
+
+    if sort in DATE_SORTS and key is not None:
+        try:
+            key = datetime.date.fromisoformat(key)
+        except (TypeError, ValueError) as e:
+            raise InvalidCursor("Malformed cursor") from e
+    elif sort == "popularity" and not _is_int4(key):
+        raise InvalidCursor("Malformed cursor")
+    elif sort in ("isin", "name") and (not isinstance(key, str) or "\x00" in key):
+        raise InvalidCursor("Malformed cursor")
+
+    return key, last_id
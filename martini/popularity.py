@@ -0,0 +1,113 @@
+# martini/popularity.py
+
+import asyncio
+import os
+import time
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from .utils.logging_helper import logger
+
+# Seconds between scheduled refreshes; 0 disables the background refresher.
+REFRESH_INTERVAL = float(os.getenv("POPULARITY_REFRESH_SECONDS", "300"))
+
+# Arbitrary key for the advisory lock that keeps concurrent workers from
+# refreshing the view at the same time.
+_REFRESH_LOCK_KEY = 0x6D617274  # "mart"
+
+POPULARITY_VIEW_DDL = [
+    """
+    CREATE MATERIALIZED VIEW IF NOT EXISTS security_popularity AS
+    SELECT
+      s.id,
+      s.name,
+      s.isin,
+      COALESCE(fh.fund_count, 0)   AS fund_count,
+      COALESCE(al.access_count, 0) AS access_count,
+      COALESCE(doc.doc_count, 0)   AS doc_count,
+      (
+        COALESCE(fh.fund_count, 0)
+        + COALESCE(al.access_count, 0)
+        + COALESCE(doc.doc_count, 0)
+      )::integer AS popularity
+    FROM securities s
+    LEFT JOIN (
+      SELECT security_id, COUNT(DISTINCT fund_id) AS fund_count
+      FROM fund_holdings
+      GROUP BY security_id
+    ) fh ON fh.security_id = s.id
+    LEFT JOIN (
+      SELECT security_id, SUM(views) AS access_count
+      FROM access_daily
+      GROUP BY security_id
+    ) al ON al.security_id = s.id
+    LEFT JOIN (
+      SELECT security_id, COUNT(*) AS doc_count
+      FROM documents
+      GROUP BY security_id
+    ) doc ON doc.security_id = s.id
+    """,
+    # required by REFRESH ... CONCURRENTLY
+    "CREATE UNIQUE INDEX IF NOT EXISTS ux_security_popularity_id ON security_popularity (id)",
+    # landing page: ORDER BY popularity DESC, id
+    """
+    CREATE INDEX IF NOT EXISTS ix_security_popularity_rank
+      ON security_popularity (popularity DESC, id)
+      WHERE isin IS NOT NULL
+    """,
+]
+
+
+async def ensure_popularity_view(conn: AsyncConnection) -> None:
+    """
+    Create the materialized ranking, replacing the legacy plain view, or a
+    materialized view still counting raw access_logs, if present.
+    """
+    relkind = (await conn.execute(text(
+        "SELECT relkind::text FROM pg_class WHERE oid = to_regclass('security_popularity')"
+    ))).scalar_one_or_none()
+    if relkind == "v":
+        logger.info("Replacing security_popularity view with a materialized view.")
+        await conn.execute(text("DROP VIEW security_popularity"))
+    elif relkind == "m":
+        definition = (await conn.execute(text(
+            "SELECT pg_get_viewdef('security_popularity'::regclass)"
+        ))).scalar()
+        if "access_daily" not in definition:
+            logger.info("Rebuilding security_popularity on the access_daily rollup.")
+            await conn.execute(text("DROP MATERIALIZED VIEW security_popularity"))
+    for ddl in POPULARITY_VIEW_DDL:
+        await conn.execute(text(ddl))
+
+
+async def refresh_popularity(engine: AsyncEngine) -> bool:
+    """
+    Recompute the popularity ranking without blocking readers.
+
+    Returns:
+        bool: False when another worker was already refreshing.
+    """
+    started = time.perf_counter()
+    async with engine.begin() as conn:
+        locked = (await conn.execute(
+            text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": _REFRESH_LOCK_KEY}
+        )).scalar()
+        if not locked:
+            logger.debug("Popularity refresh already running elsewhere, skipping.")
+            return False
+        await conn.execute(text("REFRESH MATERIALIZED VIEW CONCURRENTLY security_popularity"))
+    logger.info(f"Refreshed security_popularity in {time.perf_counter() - started:.2f}s")
+    return True
+
+
+async def run_popularity_refresher(engine: AsyncEngine, interval: float = REFRESH_INTERVAL) -> None:
+    """Refresh the ranking every *interval* seconds until cancelled."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await refresh_popularity(engine)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Popularity refresh failed: {e}")
@@ -0,0 +1,232 @@
+# martini/profiling.py
+
+import asyncio
+import collections
+import contextvars
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from .auth import is_admin_token
+from .utils.logging_helper import logger
+
+# Fraction of requests profiled without being asked to (0 disables)
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_DIR = Path(os.getenv("PROFILE_DIR", "profiles"))
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL_MS", "5")) / 1000
+# Oldest profiles are deleted beyond this many files
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "200"))
+
+PROFILE_NAME = re.compile(r"^[0-9]{8}T[0-9]{6}-[0-9a-f]{8}\.folded$")
+
+_MAX_DEPTH = 200
+
+_current_session: contextvars.ContextVar[Optional["_Session"]] = contextvars.ContextVar(
+    "martini_profile_session", default=None
+)
+
+
+def _frame_label(code) -> str:
+    return f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})"
+
+
+def _fold(frame) -> str:
+    """Stack of *frame* in the folded format: root first, ``;``-separated."""
+    labels = []
+    while frame is not None and len(labels) < _MAX_DEPTH:
+        labels.append(_frame_label(frame.f_code))
+        frame = frame.f_back
+    labels.reverse()
+    return ";".join(labels)
+
+
+def _running_job(frame) -> bool:
+    """True when an executor thread is running a job rather than waiting for one."""
+    while frame is not None:
+        code = frame.f_code
+        if code.co_name == "run" and code.co_filename.endswith(os.path.join("concurrent", "futures", "thread.py")):
+            return True
+        frame = frame.f_back
+    return False
+
+
+class _Session:
+    """Samples collected for one request."""
+
+    def __init__(self, name: str, task: asyncio.Task, loop_thread: int):
+        self.name = name
+        self.task = task
+        self.loop_thread = loop_thread
+        self.loop = task.get_loop()
+        self.counts: Dict[str, int] = collections.Counter()
+        self.samples = 0
+
+    def _owns(self, task: Optional[asyncio.Task]) -> bool:
+        if task is None:
+            return False
+        if task is self.task:
+            return True
+        # tasks spawned by the request (e.g. streaming a response body)
+        # inherit its context; Task.get_context() needs Python 3.12
+        get_context = getattr(task, "get_context", None)
+        return get_context is not None and get_context().get(_current_session) is self
+
+    def sample(self, frames) -> None:
+        self.samples += 1
+        current = asyncio.current_task(self.loop)
+        if current is None:
+            # the loop is polling for I/O: database, storage, client...
+            self.counts["<waiting on I/O>"] += 1
+        elif self._owns(current):
+            frame = frames.get(self.loop_thread)
+            if frame is not None:
+                self.counts[_fold(frame)] += 1
+        else:
+            self.counts["<other requests>"] += 1
+        # Blocking calls handed to the default executor (GCS client, file
+        # writes). Under concurrency these may belong to other requests.
+        for thread in threading.enumerate():
+            frame = frames.get(thread.ident)
+            if thread.name.startswith("asyncio_") and frame is not None and _running_job(frame):
+                self.counts[f"<worker thread>;{_fold(frame)}"] += 1
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.counts.items())
+
+
+class Sampler:
+    """
+    A single background thread sampling the stacks of every request being
+    profiled via ``sys._current_frames``. It only runs while at least one
+    request is profiled.
+    """
+
+    def __init__(self, interval: float = PROFILE_INTERVAL):
+        self.interval = interval
+        self._sessions = set()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def begin(self, name: str) -> _Session:
+        session = _Session(name, asyncio.current_task(), threading.get_ident())
+        with self._lock:
+            self._sessions.add(session)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="martini-profiler", daemon=True)
+                self._thread.start()
+        self._wakeup.set()
+        return session
+
+    def end(self, session: _Session) -> None:
+        with self._lock:
+            self._sessions.discard(session)
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                sessions = list(self._sessions)
+            if not sessions:
+                self._wakeup.wait()
+                self._wakeup.clear()
+                continue
+            frames = sys._current_frames()
+            for session in sessions:
+                try:
+                    session.sample(frames)
+                except Exception as e:  # never let a bad sample kill the sampler
+                    logger.error(f"Profiler sample failed: {e}")
+            del frames
+            time.sleep(self.interval)
+
+
+def list_profiles(directory: Path = PROFILE_DIR) -> List[dict]:
+    """Stored profiles, newest first."""
+    if not directory.is_dir():
+        return []
+    files = [p for p in directory.iterdir() if PROFILE_NAME.match(p.name)]
+    files.sort(key=lambda p: p.name, reverse=True)
+    result = []
+    for path in files:
+        header = path.with_suffix(".meta")
+        result.append({
+            "name": path.name,
+            "bytes": path.stat().st_size,
+            "request": header.read_text().strip() if header.exists() else None,
+        })
+    return result
+
+
+def _store(directory: Path, session: _Session, request_line: str, elapsed: float) -> None:
+    directory.mkdir(parents=True, exist_ok=True)
+    (directory / session.name).write_text(session.folded())
+    (directory / session.name).with_suffix(".meta").write_text(
+        f"{request_line} {elapsed * 1000:.1f}ms {session.samples} samples\n"
+    )
+    stored = sorted(p for p in directory.iterdir() if PROFILE_NAME.match(p.name))
+    for old in stored[:-PROFILE_KEEP] if PROFILE_KEEP > 0 else []:
+        old.unlink(missing_ok=True)
+        old.with_suffix(".meta").unlink(missing_ok=True)
+
+
+class ProfilingMiddleware:
+    """
+    Pure ASGI middleware profiling opted-in requests: those carrying
+    ``X-Profile: 1`` together with a valid ``X-Admin-Token``, plus a random
+    PROFILE_SAMPLE_RATE share of all requests. Stacks are written to
+    PROFILE_DIR in the folded format read by flamegraph.pl and speedscope,
+    and the file name is returned in the ``X-Profile-Id`` header.
+
+    Requests that are not profiled only pay for a header lookup.
+    """
+
+    def __init__(self, app, sampler: Optional[Sampler] = None,
+                 sample_rate: float = PROFILE_SAMPLE_RATE, directory: Path = PROFILE_DIR):
+        self.app = app
+        self.sampler = sampler or Sampler()
+        self.sample_rate = sample_rate
+        self.directory = directory
+
+    def _wanted(self, scope) -> bool:
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return True
+        profile = token = None
+        for key, value in scope["headers"]:
+            if key == b"x-profile":
+                profile = value
+            elif key == b"x-admin-token":
+                token = value.decode("latin-1")
+        return profile in (b"1", b"true") and is_admin_token(token)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._wanted(scope):
+            return await self.app(scope, receive, send)
+
+        name = f"{time.strftime('%Y%m%dT%H%M%S', time.gmtime())}-{uuid.uuid4().hex[:8]}.folded"
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(b"x-profile-id", name.encode())]
+            await send(message)
+
+        session = self.sampler.begin(name)
+        context_token = _current_session.set(session)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self.sampler.end(session)
+            _current_session.reset(context_token)
+            elapsed = time.perf_counter() - start
+            request_line = scope["method"] + " " + scope["path"]
+            try:
+                await asyncio.to_thread(_store, self.directory, session, request_line, elapsed)
+            except OSError as e:
+                logger.error(f"Could not store profile {name}: {e}")
@@ -0,0 +1,225 @@
+# martini/replicas.py
+
+import asyncio
+import itertools
+import os
+import time
+from dataclasses import dataclass
+from typing import List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import DBAPIError, OperationalError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy.orm import Session, sessionmaker
+from starlette.requests import Request
+from starlette.responses import Response
+
+from .db import make_sessionmaker
+from .utils.logging_helper import logger
+
+# Seconds between replica health checks
+REPLICA_CHECK_SECONDS = float(os.getenv("REPLICA_CHECK_SECONDS", "5"))
+# Replicas further behind than this are not used
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "10"))
+# How long a client reads from the primary after it wrote (0 disables)
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+
+# Cookie set after a write; requests can also ask with the header
+PRIMARY_COOKIE = "martini_primary_until"
+PRIMARY_HEADER = "x-read-primary"
+
+# Replay lag; 0 for a server that is not in recovery (e.g. a second
+# standalone database in local testing)
+_LAG_QUERY = text(
+    "SELECT CASE WHEN pg_is_in_recovery() "
+    "THEN COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) "
+    "ELSE 0 END"
+)
+
+_CONNECTION_ERRORS = (OperationalError, DBAPIError, OSError, asyncio.TimeoutError)
+
+
+@dataclass
+class Replica:
+    name: str
+    engine: AsyncEngine
+    sessions: sessionmaker
+    healthy: bool = False
+    lag: Optional[float] = None
+    error: Optional[str] = None
+    checked_at: Optional[float] = None
+    served: int = 0
+    failures: int = 0
+
+    def mark_down(self, error: Exception) -> None:
+        if self.healthy:
+            logger.warning(f"Read replica {self.name} marked down: {error}")
+        self.healthy = False
+        self.error = str(error)
+        self.failures += 1
+
+
+class ReplicaSyncSession(Session):
+    """
+    Read-only session that connects on first use, not when it is handed
+    out, so requests answered from a cache never take a replica
+    connection. The connection is opened by the router (the session's
+    replica, or the primary when that replica cannot be reached) and the
+    session is bound to it until closed.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        conn = self.info.get("connection")
+        if conn is None:
+            conn = self.info["connection"] = self.info["router"].connect(self.info)
+        return conn
+
+    def close(self) -> None:
+        try:
+            super().close()
+        finally:
+            conn = self.info.pop("connection", None)
+            if conn is not None:
+                conn.close()
+
+
+class ReplicaRouter:
+    """
+    Sends read-only sessions to healthy replicas (round robin) and
+    everything else to the primary.
+
+    A background task checks every replica each REPLICA_CHECK_SECONDS and
+    only uses those reachable and at most REPLICA_MAX_LAG_SECONDS behind.
+    Sessions connect on first use; a replica that fails then is marked
+    down on the spot and the request falls back to the primary.
+    """
+
+    def __init__(self, primary_sessions: sessionmaker, engines: List[AsyncEngine],
+                 check_interval: float = REPLICA_CHECK_SECONDS,
+                 max_lag: float = REPLICA_MAX_LAG_SECONDS):
+        self.primary_sessions = primary_sessions
+        self.replicas = [
+            Replica(name=f"replica-{i}", engine=e,
+                    sessions=make_sessionmaker(e, sync_session_class=ReplicaSyncSession))
+            for i, e in enumerate(engines)
+        ]
+        self.check_interval = check_interval
+        self.max_lag = max_lag
+        self.primary_reads = 0
+        self._next = itertools.count()
+        self._task: Optional[asyncio.Task] = None
+
+    async def check(self, replica: Replica) -> None:
+        try:
+            async with replica.engine.connect() as conn:
+                lag = float((await asyncio.wait_for(conn.execute(_LAG_QUERY), 5)).scalar())
+        except _CONNECTION_ERRORS as e:
+            replica.mark_down(e)
+        else:
+            replica.lag = lag
+            was_healthy, replica.healthy = replica.healthy, lag <= self.max_lag
+            replica.error = None if replica.healthy else f"lag {lag:.1f}s"
+            if replica.healthy != was_healthy:
+                logger.info(f"Read replica {replica.name} {'up' if replica.healthy else 'down'} (lag {lag:.1f}s)")
+        replica.checked_at = time.time()
+
+    async def check_all(self) -> None:
+        await asyncio.gather(*(self.check(r) for r in self.replicas))
+
+    async def start(self) -> None:
+        """First check inline, so traffic is routed from the first request on."""
+        if not self.replicas:
+            return
+        await self.check_all()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        for replica in self.replicas:
+            await replica.engine.dispose()
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.check_interval)
+            await self.check_all()
+
+    def pick(self) -> Optional[Replica]:
+        healthy = [r for r in self.replicas if r.healthy]
+        if not healthy:
+            return None
+        return healthy[next(self._next) % len(healthy)]
+
+    async def read_session(self, prefer_primary: bool = False) -> AsyncSession:
+        """
+        A session for read-only work. ``session.info["replica"]`` names the
+        replica it is bound to, None for the primary.
+        """
+        replica = None if prefer_primary else self.pick()
+        if replica is not None:
+            # no connection yet: ReplicaSyncSession connects on first query
+            session = replica.sessions()
+            session.info.update(replica=replica.name, replica_ref=replica, router=self)
+            replica.served += 1
+            return session
+        self.primary_reads += 1
+        session = self.primary_sessions()
+        session.info["replica"] = None
+        return session
+
+    def connect(self, info: dict) -> Connection:
+        """
+        Open the connection of a :class:`ReplicaSyncSession` (called from its
+        first query): its replica, or the primary after marking the replica
+        down when it cannot be reached.
+        """
+        replica = info["replica_ref"]
+        if info.get("replica") is not None:
+            try:
+                return replica.engine.sync_engine.connect()
+            except _CONNECTION_ERRORS as e:
+                replica.mark_down(e)
+                replica.served -= 1
+                self.primary_reads += 1
+                info["replica"] = None
+        return self.primary_sessions.kw["bind"].sync_engine.connect()
+
+    def stats(self) -> dict:
+        return {
+            "primary_reads": self.primary_reads,
+            "replicas": [
+                {
+                    "name": r.name,
+                    "healthy": r.healthy,
+                    "lag": r.lag,
+                    "error": r.error,
+                    "served": r.served,
+                    "failures": r.failures,
+                    "checked_at": r.checked_at,
+                }
+                for r in self.replicas
+            ],
+        }
+
+
+def wants_primary(request: Request) -> bool:
+    """Read-your-writes: the client wrote recently, or asks for the primary explicitly."""
+    if request.headers.get(PRIMARY_HEADER, "").lower() in ("1", "true"):
+        return True
+    try:
+        return float(request.cookies.get(PRIMARY_COOKIE, "0")) > time.time()
+    except ValueError:
+        return False
+
+
+def pin_to_primary(response: Response) -> None:
+    """After a write: route this client's reads to the primary for a while."""
+    if READ_YOUR_WRITES_SECONDS > 0:
+        until = time.time() + READ_YOUR_WRITES_SECONDS
+        response.set_cookie(
+            PRIMARY_COOKIE, f"{until:.3f}",
+            max_age=int(READ_YOUR_WRITES_SECONDS) + 1, httponly=True, samesite="lax",
+        )
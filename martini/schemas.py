@@ -1,8 +1,8 @@
 # martini/schemas.py
 
 from datetime import date
-from pydantic import BaseModel, ConfigDict
-from typing import List, Optional
+from pydantic import BaseModel, ConfigDict, Field
+from typing import Dict, List, Optional, Union
 
 class DocumentSchema(BaseModel):
     id: int
@@ -22,6 +22,22 @@ class PriceHistorySchema(BaseModel):
 
     model_config = ConfigDict(from_attributes=True)
 
+class PriceColumnsSchema(BaseModel):
+    """
+    Price history as one array per field (``layout=columns``). With
+    ``dates=delta`` the ``date`` array is replaced by ``date_start`` and
+    ``date_delta``: days since the previous bar (0 for the first).
+    """
+    date: Optional[List[date]] = None
+    date_start: Optional[date] = None
+    date_delta: Optional[List[int]] = None
+    open: List[float]
+    close: List[float]
+    high: List[float]
+    low: List[float]
+    volume: List[Optional[int]]
+    volume_nominal: List[Optional[int]]
+
 class FundHoldingSchema(BaseModel):
     fund_name: str
     pct_of_portfolio: float
@@ -45,7 +61,7 @@ class SecuritySchema(BaseModel):
     summary: Optional[str] = None
 
     documents: List[DocumentSchema]         = []
-    price_history: List[PriceHistorySchema] = []
+    price_history: Union[List[PriceHistorySchema], PriceColumnsSchema] = []
     fund_holdings: List[FundHoldingSchema]  = []
 
     model_config = ConfigDict(from_attributes=True)
@@ -61,3 +77,87 @@ class SecurityListItemSchema(BaseModel):
     name: str
 
     model_config = ConfigDict(from_attributes=True)
+
+class SummarySchema(BaseModel):
+    isin: str
+    summary: Optional[str] = None
+
+class SecurityBatchRequest(BaseModel):
+    isins: List[str] = Field(..., min_length=1, max_length=500)
+    # same parts as the detail endpoint's ``include``; None means all
+    include: Optional[List[str]] = None
+
+class SecurityBatchResponse(BaseModel):
+    securities: Dict[str, SecuritySchema]
+    missing: List[str] = []
+
+class FundSchema(BaseModel):
+    id: int
+    fund_name: str
+    report_date: Optional[date] = None
+    holdings_count: int
+
+class FundSecurityHoldingSchema(BaseModel):
+    security_id: int
+    isin: Optional[str]
+    name: Optional[str]
+    pct_of_portfolio: float
+
+class FundOverlapHoldingSchema(BaseModel):
+    security_id: int
+    isin: Optional[str]
+    name: Optional[str]
+    pct_a: float
+    pct_b: float
+
+class FundOverlapSchema(BaseModel):
+    fund_a: FundSchema
+    fund_b: FundSchema
+    common_holdings: int
+    # sum of min(pct_a, pct_b) over the common holdings
+    overlap_weight: float
+    holdings: List[FundOverlapHoldingSchema] = []
+
+class SimilarFundSchema(FundSchema):
+    similarity: float
+    common_holdings: int
+
+class PriceAnalyticsSchema(BaseModel):
+    isin: str
+    observations: int
+    first_date: Optional[date] = None
+    last_date: Optional[date] = None
+    last_close: Optional[float] = None
+    total_return: Optional[float] = None
+    annualized_return: Optional[float] = None
+    # annualised standard deviation of daily log returns
+    volatility: Optional[float] = None
+    rolling_volatility: Optional[float] = None
+    window: int
+    max_drawdown: Optional[float] = None
+    drawdown_peak_date: Optional[date] = None
+    drawdown_trough_date: Optional[date] = None
+    vwap: Optional[float] = None
+
+class PriceAnalyticsBatchRequest(BaseModel):
+    isins: List[str] = Field(..., min_length=1, max_length=500)
+    window: int = Field(20, ge=2, le=260)
+
+class PriceAnalyticsBatchResponse(BaseModel):
+    analytics: Dict[str, PriceAnalyticsSchema]
+    missing: List[str] = []
+
+class DocumentPageHitSchema(BaseModel):
+    page: int
+    rank: float
+    # matching words wrapped in <b>…</b>
+    snippet: str
+
+class DocumentSearchHitSchema(BaseModel):
+    id: int
+    isin: str
+    doc_type: str
+    url: str
+    score: float
+    matched_pages: int
+    pages: List[DocumentPageHitSchema]
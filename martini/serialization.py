@@ -0,0 +1,40 @@
+# martini/serialization.py
+
+import decimal
+from typing import Any, List
+
+import orjson
+from sqlalchemy.engine import Result
+from starlette.responses import Response
+
+
+def _default(obj: Any) -> Any:
+    # Numeric columns that were not cast to float in SQL
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def dumps(obj: Any) -> bytes:
+    """Encode plain dicts / lists / dates straight to JSON bytes with orjson."""
+    return orjson.dumps(obj, default=_default)
+
+
+def rows_as_dicts(result: Result) -> List[dict]:
+    """All rows of a Core result as dicts keyed by the selected labels."""
+    keys = list(result.keys())
+    return [dict(zip(keys, row)) for row in result.all()]
+
+
+class FastJSONResponse(Response):
+    """
+    JSON response encoded with orjson, skipping Pydantic validation and
+    FastAPI's jsonable_encoder. Endpoints returning it keep their
+    ``response_model`` so the OpenAPI schema is unchanged; the payload must
+    already match it.
+    """
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,323 @@
+# martini/storage.py
+
+import abc
+import asyncio
+import datetime
+import hashlib
+import json
+import os
+import tempfile
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import AsyncIterable, AsyncIterator, Dict, Optional
+
+import aiofiles
+
+from .utils.logging_helper import logger
+
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "gcs")
+BUCKET_NAME = os.getenv("DRY_MARTINI_BUCKET", "dry-martini-docs")
+STORAGE_LOCAL_DIR = os.getenv("STORAGE_LOCAL_DIR", "data/docs")
+# Size of each read when streaming an object
+CHUNK_SIZE = int(os.getenv("STORAGE_CHUNK_BYTES", str(1024 * 1024)))
+
+GCS_PUBLIC_URL = "https://storage.googleapis.com"
+
+
+@dataclass(frozen=True)
+class ObjectStat:
+    name: str
+    size: int
+    etag: str                        # quoted, ready for the ETag header
+    last_modified: Optional[datetime.datetime]
+    generation: str
+    metadata: Dict[str, str] = field(default_factory=dict, compare=False)
+
+
+def object_url(name: str, bucket: str = BUCKET_NAME) -> str:
+    """URL recorded in documents.url for object *name* (the GCS public URL, whatever the backend)."""
+    return f"{GCS_PUBLIC_URL}/{bucket}/{name}"
+
+
+def object_name(url: str, bucket: str = BUCKET_NAME) -> str:
+    """Inverse of :func:`object_url`."""
+    return url.split(f"{bucket}/", 1)[-1]
+
+
+async def iter_file(path: Path, chunk_size: int = CHUNK_SIZE) -> AsyncIterator[bytes]:
+    """Read a local file as an async stream of chunks (e.g. for put_stream)."""
+    async with aiofiles.open(path, "rb") as f:
+        while True:
+            chunk = await f.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+
+class StorageBackend(abc.ABC):
+    """
+    Where document blobs live. All methods are coroutines (or async
+    iterators), so request handlers never block the event loop on I/O.
+    """
+
+    kind: str  # STORAGE_BACKEND name, used as a metrics label
+
+    @abc.abstractmethod
+    async def stat(self, name: str) -> ObjectStat:
+        """Object metadata; raises FileNotFoundError when missing."""
+
+    @abc.abstractmethod
+    def open_range(
+        self, name: str, start: int, end: int, generation: Optional[str] = None
+    ) -> AsyncIterator[bytes]:
+        """
+        Yield bytes start..end (inclusive) in chunks. With *generation* (from
+        :meth:`stat`) every chunk comes from that version of the object, and
+        FileNotFoundError is raised when it has been replaced.
+        """
+
+    @abc.abstractmethod
+    async def put_stream(
+        self,
+        name: str,
+        chunks: AsyncIterable[bytes],
+        metadata: Optional[Dict[str, str]] = None,
+        content_type: str = "application/pdf",
+    ) -> ObjectStat:
+        """Store *chunks* under *name*, replacing any existing object."""
+
+    async def exists(self, name: str) -> bool:
+        try:
+            await self.stat(name)
+        except FileNotFoundError:
+            return False
+        return True
+
+
+class GCSStorage(StorageBackend):
+    """
+    Documents in a Google Cloud Storage bucket; blocking client calls run in
+    threads. The client (and its credential discovery) is only built on
+    first use, so importing the app needs no cloud credentials.
+    """
+
+    kind = "gcs"
+
+    def __init__(self, bucket_name: str = BUCKET_NAME, client=None):
+        self.bucket_name = bucket_name
+        self.client = client
+        self._bucket = None
+        self._lock = asyncio.Lock()
+
+    def _connect(self):
+        if self.client is None:
+            from google.cloud import storage
+
+            self.client = storage.Client()
+        return self.client.bucket(self.bucket_name)
+
+    async def _get_bucket(self):
+        if self._bucket is None:
+            async with self._lock:
+                if self._bucket is None:
+                    self._bucket = await asyncio.to_thread(self._connect)
+        return self._bucket
+
+    @staticmethod
+    def _to_stat(name: str, blob) -> ObjectStat:
+        return ObjectStat(
+            name=name,
+            size=blob.size,
+            etag=f'"{blob.etag}"',
+            last_modified=blob.updated,
+            generation=str(blob.generation),
+            metadata=dict(blob.metadata or {}),
+        )
+
+    async def stat(self, name: str) -> ObjectStat:
+        bucket = await self._get_bucket()
+        blob = await asyncio.to_thread(bucket.get_blob, name)
+        if blob is None:
+            raise FileNotFoundError(name)
+        return self._to_stat(name, blob)
+
+    async def exists(self, name: str) -> bool:
+        bucket = await self._get_bucket()
+        return await asyncio.to_thread(bucket.blob(name).exists)
+
+    async def open_range(
+        self, name: str, start: int, end: int, generation: Optional[str] = None
+    ) -> AsyncIterator[bytes]:
+        # each chunk is a separate request; pinning the generation keeps an
+        # upload landing mid-stream from mixing two versions
+        blob = (await self._get_bucket()).blob(
+            name, generation=int(generation) if generation is not None else None
+        )
+        from google.api_core.exceptions import NotFound
+
+        pos = start
+        while pos <= end:
+            stop = min(pos + CHUNK_SIZE, end + 1)
+            try:
+                chunk = await asyncio.to_thread(blob.download_as_bytes, start=pos, end=stop - 1)
+            except NotFound:
+                raise FileNotFoundError(name) from None
+            if not chunk:
+                break
+            pos += len(chunk)
+            yield chunk
+
+    async def put_stream(self, name, chunks, metadata=None, content_type="application/pdf"):
+        blob = (await self._get_bucket()).blob(name)
+        blob.metadata = metadata or None
+        # resumable upload: each chunk is sent as it arrives
+        writer = await asyncio.to_thread(
+            blob.open, "wb", chunk_size=max(CHUNK_SIZE, 256 * 1024), content_type=content_type
+        )
+        try:
+            async for chunk in chunks:
+                await asyncio.to_thread(writer.write, chunk)
+        finally:
+            await asyncio.to_thread(writer.close)
+        await asyncio.to_thread(blob.reload)
+        return self._to_stat(name, blob)
+
+
+class LocalStorage(StorageBackend):
+    """
+    Documents in a local directory laid out by object name, e.g. a local
+    NVMe replica of the bucket. Custom metadata lives in a
+    ``<name>.metadata.json`` sidecar.
+    """
+
+    kind = "local"
+
+    def __init__(self, root: str = STORAGE_LOCAL_DIR):
+        self.root = Path(root).resolve()
+
+    def path_for(self, name: str) -> Path:
+        path = (self.root / name).resolve()
+        if not path.is_relative_to(self.root):
+            raise FileNotFoundError(name)
+        return path
+
+    def _metadata_path(self, path: Path) -> Path:
+        return path.with_name(path.name + ".metadata.json")
+
+    def _stat_sync(self, name: str) -> ObjectStat:
+        path = self.path_for(name)
+        st = os.stat(path)
+        meta_path = self._metadata_path(path)
+        metadata = json.loads(meta_path.read_text()) if meta_path.exists() else {}
+        return ObjectStat(
+            name=name,
+            size=st.st_size,
+            etag=f'"{st.st_size:x}-{st.st_mtime_ns:x}"',
+            last_modified=datetime.datetime.fromtimestamp(st.st_mtime, tz=datetime.timezone.utc),
+            generation=str(st.st_mtime_ns),
+            metadata=metadata,
+        )
+
+    async def stat(self, name: str) -> ObjectStat:
+        return await asyncio.to_thread(self._stat_sync, name)
+
+    async def exists(self, name: str) -> bool:
+        try:
+            path = self.path_for(name)
+        except FileNotFoundError:
+            return False
+        return await asyncio.to_thread(path.is_file)
+
+    async def open_range(
+        self, name: str, start: int, end: int, generation: Optional[str] = None
+    ) -> AsyncIterator[bytes]:
+        async with aiofiles.open(self.path_for(name), "rb") as f:
+            # uploads replace the file by rename, so the open handle keeps
+            # reading the version checked here
+            if generation is not None and str(os.fstat(f.fileno()).st_mtime_ns) != generation:
+                raise FileNotFoundError(name)
+            await f.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = await f.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+
+    async def put_stream(self, name, chunks, metadata=None, content_type="application/pdf"):
+        path = self.path_for(name)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(prefix=".upload-", dir=path.parent)
+        try:
+            async with aiofiles.open(fd, "wb") as f:
+                async for chunk in chunks:
+                    await f.write(chunk)
+            if metadata:
+                self._metadata_path(path).write_text(json.dumps(metadata))
+            # atomic: readers see the old object or the new one, never a mix
+            os.replace(tmp_name, path)
+        except BaseException:
+            Path(tmp_name).unlink(missing_ok=True)
+            raise
+        return await self.stat(name)
+
+
+class MemoryStorage(StorageBackend):
+    """Process-local objects, for benchmarks and offline runs."""
+
+    kind = "memory"
+
+    def __init__(self):
+        self._objects: Dict[str, tuple] = {}   # name -> (data, ObjectStat)
+        self._generation = 0
+
+    async def stat(self, name: str) -> ObjectStat:
+        try:
+            return self._objects[name][1]
+        except KeyError:
+            raise FileNotFoundError(name) from None
+
+    async def exists(self, name: str) -> bool:
+        return name in self._objects
+
+    async def open_range(
+        self, name: str, start: int, end: int, generation: Optional[str] = None
+    ) -> AsyncIterator[bytes]:
+        try:
+            data, info = self._objects[name]
+        except KeyError:
+            raise FileNotFoundError(name) from None
+        if generation is not None and info.generation != generation:
+            raise FileNotFoundError(name)
+        view = memoryview(data)
+        for pos in range(start, end + 1, CHUNK_SIZE):
+            yield bytes(view[pos:min(pos + CHUNK_SIZE, end + 1)])
+
+    async def put_stream(self, name, chunks, metadata=None, content_type="application/pdf"):
+        parts = [chunk async for chunk in chunks]
+        data = b"".join(parts)
+        self._generation += 1
+        info = ObjectStat(
+            name=name,
+            size=len(data),
+            etag=f'"{hashlib.md5(data).hexdigest()}"',
+            last_modified=datetime.datetime.now(datetime.timezone.utc),
+            generation=str(self._generation),
+            metadata=dict(metadata or {}),
+        )
+        self._objects[name] = (data, info)
+        return info
+
+
+def get_storage(backend: str = STORAGE_BACKEND, **kwargs) -> StorageBackend:
+    """Build the document storage selected by STORAGE_BACKEND (gcs, local or memory)."""
+    if backend == "gcs":
+        return GCSStorage(kwargs.get("bucket_name", BUCKET_NAME), client=kwargs.get("client"))
+    if backend == "local":
+        root = kwargs.get("root", STORAGE_LOCAL_DIR)
+        logger.info(f"Serving documents from local directory {root}")
+        return LocalStorage(root)
+    if backend == "memory":
+        return MemoryStorage()
+    raise RuntimeError(f"Unknown STORAGE_BACKEND={backend!r}")
@@ -0,0 +1,73 @@
+# martini/timeseries.py
+
+import datetime
+from typing import List, Sequence
+
+import numpy as np
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets downsampling.
+
+    Picks *n_out* points of the series (x, y) that preserve its visual shape:
+    the first and last points are always kept, and from each of the
+    ``n_out - 2`` buckets in between the point forming the largest triangle
+    with the previously kept point and the average of the next bucket.
+
+    Args:
+        x (np.ndarray): Monotonic x values (e.g. date ordinals).
+        y (np.ndarray): Values to preserve (e.g. close prices).
+        n_out (int): Number of points to keep, at least 3.
+
+    Returns:
+        np.ndarray: Sorted indices of the kept points.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    # bucket boundaries over the interior points 1..n-2
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+
+    kept = np.empty(n_out, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+    prev = 0
+    for i in range(n_out - 2):
+        start, stop = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            nxt_x = x[edges[i + 1]:edges[i + 2]].mean()
+            nxt_y = y[edges[i + 1]:edges[i + 2]].mean()
+        else:
+            nxt_x, nxt_y = x[-1], y[-1]
+        # twice the triangle area; the constant factor doesn't change argmax
+        area = np.abs(
+            (x[prev] - nxt_x) * (y[start:stop] - y[prev])
+            - (x[prev] - x[start:stop]) * (nxt_y - y[prev])
+        )
+        prev = start + int(np.argmax(area))
+        kept[i + 1] = prev
+    return kept
+
+
+def to_columns(rows: List[dict], keys: Sequence[str], delta_dates: bool = False) -> dict:
+    """
+    Turn row dicts into one list per key (a column layout), which spares
+    repeating every key in every row.
+
+    With *delta_dates*, the ``date`` column (dates or ISO strings) becomes
+    ``date_start`` plus ``date_delta``, the days between consecutive rows
+    (0 for the first): mostly 1s and 3s for daily prices.
+    """
+    columns = {key: [row[key] for row in rows] for key in keys}
+    if delta_dates and "date" in columns:
+        ordinals = [
+            (datetime.date.fromisoformat(d) if isinstance(d, str) else d).toordinal()
+            for d in columns.pop("date")
+        ]
+        start = datetime.date.fromordinal(ordinals[0]) if ordinals else None
+        deltas = [b - a for a, b in zip(ordinals, ordinals[1:])]
+        columns = {"date_start": start, "date_delta": [0] + deltas if ordinals else [], **columns}
+    return columns
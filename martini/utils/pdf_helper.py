@@ -5,7 +5,7 @@ import os
 import tempfile
 import warnings
 import asyncio
-from typing import Optional, Container, BinaryIO, cast
+from typing import List, Optional, Container, BinaryIO, cast
 
 warnings.filterwarnings(
     "ignore",
@@ -141,4 +141,50 @@ async def extract_text_from_pdf(pdf_bytes: bytes) -> Optional[str]:
     except Exception as e:
         logger.error(f"Failed to extract text from PDF using patched PyMuPDF: {e}")
 
-    return None
\ No newline at end of file
+    return None
+
+def _extract_pages_pymupdf(pdf_bytes: bytes) -> List[str]:
+    """Text of each page using PyMuPDF (fitz) synchronously."""
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+        return [page.get_text("text") for page in doc]
+
+def _extract_pages_pdfminer(pdf_bytes: bytes, laparams: Optional[LAParams] = None) -> List[str]:
+    """Text of each page using the patched pdfminer page iterator synchronously."""
+    laparams = laparams or LAParams()
+    pages = []
+    with io.BytesIO(pdf_bytes) as fp, io.StringIO() as output_string:
+        rsrcmgr = PDFResourceManager(caching=True)
+        device = TextConverter(rsrcmgr, output_string, codec="utf-8", laparams=laparams)
+        interpreter = PDFPageInterpreter(rsrcmgr, device)
+
+        for page in PDFPage.get_pages(fp, caching=True):
+            interpreter.process_page(page)
+            pages.append(output_string.getvalue())
+            output_string.seek(0)
+            output_string.truncate()
+    return pages
+
+async def extract_pages_from_pdf(pdf_bytes: bytes) -> Optional[List[str]]:
+    """
+    Extract the text of each page of a PDF file asynchronously.
+
+    Args:
+        pdf_bytes (bytes): The raw bytes of the PDF file.
+
+    Returns:
+        Optional[List[str]]: One string per page, in page order (pages
+        without text give empty strings), or None if extraction fails or
+        the document has no text at all (e.g. scanned images).
+    """
+    for extract_func in (_extract_pages_pymupdf, _extract_pages_pdfminer):
+        try:
+            pages = await asyncio.to_thread(extract_func, pdf_bytes)
+        except Exception as e:
+            logger.warning(f"Page extraction with {extract_func.__name__} failed: {e}")
+            continue
+        if any(page.strip() for page in pages):
+            # NUL characters are not allowed in Postgres text
+            return [page.replace("\x00", "") for page in pages]
+        logger.warning(f"No text extracted from PDF pages with {extract_func.__name__}.")
+
+    return None
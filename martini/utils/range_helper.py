@@ -0,0 +1,126 @@
+# range_helper.py
+
+import datetime
+import hashlib
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Mapping, Optional, Tuple
+
+
+class RangeNotSatisfiable(ValueError):
+    """The requested byte range lies outside the representation."""
+
+
+def http_date(dt: datetime.datetime) -> str:
+    """Format *dt* as an IMF-fixdate (e.g. for Last-Modified)."""
+    return formatdate(dt.timestamp(), usegmt=True)
+
+
+def strong_etag(body: bytes) -> str:
+    """Quoted strong entity tag derived from the representation bytes."""
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def _parse_http_date(value: Optional[str]) -> Optional[datetime.datetime]:
+    if not value:
+        return None
+    try:
+        return parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _etag_list(value: str):
+    return [tag.strip() for tag in value.split(",") if tag.strip()]
+
+
+def _weak_equal(a: str, b: str) -> bool:
+    return a.removeprefix("W/") == b.removeprefix("W/")
+
+
+def is_not_modified(
+    headers: Mapping[str, str],
+    etag: str,
+    last_modified: Optional[datetime.datetime],
+) -> bool:
+    """
+    Evaluate If-None-Match / If-Modified-Since for a GET.
+
+    If-None-Match takes precedence; If-Modified-Since is only consulted when
+    the client did not send an entity tag (RFC 9110 §13.2.2).
+    """
+    inm = headers.get("if-none-match")
+    if inm is not None:
+        if inm.strip() == "*":
+            return True
+        return any(_weak_equal(tag, etag) for tag in _etag_list(inm))
+
+    ims = _parse_http_date(headers.get("if-modified-since"))
+    if ims is not None and last_modified is not None:
+        # HTTP dates have one-second resolution
+        return int(last_modified.timestamp()) <= int(ims.timestamp())
+    return False
+
+
+def if_range_allows(
+    headers: Mapping[str, str],
+    etag: str,
+    last_modified: Optional[datetime.datetime],
+) -> bool:
+    """
+    True when a Range request may be honoured, i.e. there is no If-Range
+    or it still matches the current representation (strong comparison).
+    """
+    value = headers.get("if-range")
+    if value is None:
+        return True
+    value = value.strip()
+    if value.startswith('"') or value.startswith("W/"):
+        return not value.startswith("W/") and value == etag
+    since = _parse_http_date(value)
+    if since is None or last_modified is None:
+        return False
+    return int(last_modified.timestamp()) == int(since.timestamp())
+
+
+def parse_byte_range(value: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a ``Range: bytes=...`` header against an object of *size* bytes.
+
+    Only single ranges are served; multi-range or malformed headers return
+    None and the caller falls back to the full body, as RFC 9110 allows.
+
+    Returns:
+        (start, end) inclusive, or None to serve the whole object.
+
+    Raises:
+        RangeNotSatisfiable: the range starts beyond the end of the object,
+        is an empty suffix (``bytes=-0``), or the object is empty.
+    """
+    if not value:
+        return None
+    unit, _, spec = value.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, sep, last = spec.strip().partition("-")
+    if not sep:
+        return None
+    try:
+        if first == "":
+            # suffix range: the last N bytes
+            length = int(last)
+        else:
+            start = int(first)
+            end = int(last) if last != "" else size - 1
+    except ValueError:
+        return None
+    if first == "":
+        if length <= 0 or size == 0:
+            raise RangeNotSatisfiable(value)
+        return max(size - length, 0), size - 1
+    if start < 0:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable(value)
+    if end < start:
+        return None
+    return start, min(end, size - 1)
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# bench_detail_query.py
+#
+# Compare the two ways of loading a security detail payload from Postgres:
+#   orm:  security header, then one query per included part (5 statements)
+#   json: the whole payload built in one statement with json_build_object /
+#         json_agg
+#
+# Runs both modes alternately against the database in POSTGRES_CONNECTION,
+# checks that they produce identical bodies, and reports latency percentiles
+# and statements per call. The detail cache is bypassed.
+#
+# Usage: python -m scripts.bench_detail_query [--isin XS...] [--securities 20]
+#                                             [--repeat 50] [--include ...]
+#                                             [--p99-target-ms 50]
+
+import argparse
+import asyncio
+import time
+
+from sqlalchemy import event, func, select
+
+from martini.db import AsyncSessionLocal, engine
+from martini.main import _build_security_detail, _parse_include
+from martini.models import PriceHistory, Security
+
+MODES = ("orm", "json")
+BASE = "https://example.com"
+
+
+async def pick_isins(n: int):
+    """The *n* securities with the longest price history (the heaviest payloads)."""
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(Security.isin)
+            .join(PriceHistory, PriceHistory.security_id == Security.id)
+            .where(Security.isin.is_not(None))
+            .group_by(Security.isin)
+            .order_by(func.count().desc())
+            .limit(n)
+        )
+        return result.scalars().all()
+
+
+def percentile(values, q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+async def run(args):
+    isins = args.isin or await pick_isins(args.securities)
+    if not isins:
+        raise SystemExit("No securities with price history found.")
+    parts = _parse_include(args.include)
+
+    statements = [0]
+
+    def count(*_):
+        statements[0] += 1
+
+    event.listen(engine.sync_engine, "before_cursor_execute", count)
+
+    timings = {mode: [] for mode in MODES}
+    calls = {mode: 0 for mode in MODES}
+    counted = {mode: 0 for mode in MODES}
+    async with AsyncSessionLocal() as db:
+        # warm-up, and check that both modes agree
+        for isin in isins:
+            bodies = {mode: (await _build_security_detail(db, isin, parts, BASE, mode)).body for mode in MODES}
+            if bodies["orm"] != bodies["json"]:
+                raise SystemExit(f"Payload mismatch for {isin}")
+
+        for _ in range(args.repeat):
+            for isin in isins:
+                for mode in MODES:
+                    statements[0] = 0
+                    t0 = time.perf_counter()
+                    await _build_security_detail(db, isin, parts, BASE, mode)
+                    timings[mode].append(time.perf_counter() - t0)
+                    counted[mode] += statements[0]
+                    calls[mode] += 1
+                await db.rollback()  # don't keep one long transaction open
+
+    print(f"{len(isins)} securities x {args.repeat} runs, include={','.join(sorted(parts))}")
+    for mode in MODES:
+        ms = [t * 1e3 for t in timings[mode]]
+        p99 = percentile(ms, 0.99)
+        verdict = "ok" if p99 <= args.p99_target_ms else "OVER TARGET"
+        print(
+            f"  {mode:4}: {counted[mode] / calls[mode]:.0f} statements/call   "
+            f"p50 {percentile(ms, 0.50):7.2f} ms   p95 {percentile(ms, 0.95):7.2f} ms   "
+            f"p99 {p99:7.2f} ms   max {max(ms):7.2f} ms   [{verdict}]"
+        )
+    await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark detail query modes")
+    parser.add_argument("--isin", action="append", help="ISIN to load (repeatable)")
+    parser.add_argument("--securities", type=int, default=20,
+                        help="number of securities to pick when no --isin is given")
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--include", default=None, help="parts to include (default all)")
+    parser.add_argument("--p99-target-ms", type=float, default=50.0)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
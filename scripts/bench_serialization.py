@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# bench_serialization.py
+#
+# Compare the two ways of turning a security detail into JSON bytes:
+#   pydantic: ORM-style rows (Decimal prices) -> SecuritySchema validation
+#             -> jsonable_encoder -> json.dumps (FastAPI's default path)
+#   fast:     dict rows straight from SQL (prices cast to float) -> orjson
+#
+# Usage: python -m scripts.bench_serialization [--rows 10000] [--repeat 20]
+
+import argparse
+import datetime
+import json
+import statistics
+import time
+from decimal import Decimal
+from types import SimpleNamespace
+
+from fastapi.encoders import jsonable_encoder
+
+from martini.schemas import SecuritySchema
+from martini.serialization import dumps
+
+
+def make_rows(n: int):
+    start = datetime.date(1990, 1, 1)
+    orm_rows, dict_rows = [], []
+    for i in range(n):
+        day = start + datetime.timedelta(days=i)
+        px = Decimal("100") + Decimal(i % 500) / Decimal("1000")
+        values = dict(
+            date=day,
+            open=px,
+            close=px + Decimal("0.125"),
+            high=px + Decimal("0.25"),
+            low=px - Decimal("0.25"),
+            volume=1000 + i,
+            volume_nominal=None,
+        )
+        orm_rows.append(SimpleNamespace(**values))
+        dict_rows.append({k: float(v) if isinstance(v, Decimal) else v for k, v in values.items()})
+    return orm_rows, dict_rows
+
+
+HEADER = dict(
+    id=1,
+    name="Example 4.25% 2045",
+    cusip=None,
+    isin="XS0000000001",
+    sedol=None,
+    issuer_id=None,
+    issue_date=datetime.date(2015, 3, 1),
+    issue_volume=500_000_000.0,
+    issue_currency="EUR",
+    maturity=datetime.date(2045, 3, 1),
+    summary="Senior unsecured notes.",
+)
+
+
+def pydantic_path(orm_rows) -> bytes:
+    payload = SecuritySchema(**HEADER, documents=[], price_history=orm_rows, fund_holdings=[])
+    return json.dumps(jsonable_encoder(payload)).encode()
+
+
+def fast_path(dict_rows) -> bytes:
+    payload = dict(HEADER, documents=[], price_history=dict_rows, fund_holdings=[])
+    return dumps(payload)
+
+
+def bench(fn, arg, repeat: int):
+    fn(arg)  # warm-up
+    timings = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(arg)
+        timings.append(time.perf_counter() - t0)
+    return statistics.median(timings), max(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark detail serialization paths")
+    parser.add_argument("--rows", type=int, default=10_000, help="price history rows")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    orm_rows, dict_rows = make_rows(args.rows)
+    assert json.loads(pydantic_path(orm_rows)) == json.loads(fast_path(dict_rows))
+
+    slow_med, slow_max = bench(pydantic_path, orm_rows, args.repeat)
+    fast_med, fast_max = bench(fast_path, dict_rows, args.repeat)
+    print(f"{args.rows} price rows, {args.repeat} runs")
+    print(f"  pydantic + json : median {slow_med * 1e3:8.2f} ms   max {slow_max * 1e3:8.2f} ms")
+    print(f"  orjson fast path: median {fast_med * 1e3:8.2f} ms   max {fast_max * 1e3:8.2f} ms")
+    print(f"  speed-up        : {slow_med / fast_med:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# bench_startup.py
+#
+# Measure how long a fresh worker takes from process start until it is
+# ready to serve, in each STARTUP_MODE. Every run is a new interpreter, so
+# imports are cold (apart from the OS page cache):
+#   import:  python start -> `import martini.main` done
+#   startup: lifespan startup (schema setup in dev, pool warm-up, ...)
+#   first:   first request (GET /securities?limit=20) after startup
+#   total:   process spawn -> ready, as seen from outside
+#
+# Needs POSTGRES_CONNECTION; production mode expects the schema to exist
+# (python -m martini.migrate).
+#
+# Usage: python -m scripts.bench_startup [--runs 5] [--mode dev --mode production]
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+WORKER = r"""
+import time
+t0 = time.perf_counter()
+import asyncio, json
+import martini.main as m
+t_import = time.perf_counter()
+
+async def run():
+    async with m.app.router.lifespan_context(m.app):
+        t_ready = time.perf_counter()
+        import httpx
+        transport = httpx.ASGITransport(app=m.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            r = await client.get("/securities", params={"limit": 20})
+            r.raise_for_status()
+        t_first = time.perf_counter()
+        print(json.dumps({
+            "import": t_import - t0,
+            "startup": t_ready - t_import,
+            "first": t_first - t_ready,
+        }), flush=True)
+
+asyncio.run(run())
+"""
+
+
+def run_once(mode: str) -> dict:
+    env = dict(os.environ, STARTUP_MODE=mode, POPULARITY_REFRESH_SECONDS="0")
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-c", WORKER],
+        env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+    )
+    line = proc.stdout.readline()
+    total = time.perf_counter() - start
+    _, err = proc.communicate()
+    if proc.returncode != 0 or not line:
+        raise SystemExit(f"{mode} worker failed:\n{err}")
+    timings = json.loads(line)
+    # spawn -> first response, minus the request itself
+    timings["total"] = total - timings["first"]
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark worker import-to-ready time")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--mode", action="append", choices=["dev", "production"])
+    args = parser.parse_args()
+
+    for mode in args.mode or ["dev", "production"]:
+        runs = [run_once(mode) for _ in range(args.runs)]
+        print(f"{mode} ({args.runs} runs, median / max):")
+        for phase in ("import", "startup", "first", "total"):
+            values = [r[phase] * 1e3 for r in runs]
+            print(f"  {phase:8}: {statistics.median(values):8.1f} ms / {max(values):8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# check_query_plans.py
+#
+# EXPLAIN the common /securities filter + sort combinations against the
+# database in POSTGRES_CONNECTION and check that each is driven by an index:
+# no sequential scan of securities and, where an index can deliver the
+# sort order, no full Sort node either (so LIMIT stops after one page).
+#
+# Sequential scans are disabled for the check: on a small or freshly loaded
+# table the planner rightly prefers one, and the question here is whether an
+# index *can* serve the query, not what today's statistics favour. Exits 1
+# when a combination is not index-driven, e.g. after an index was dropped.
+#
+# Usage: python -m scripts.check_query_plans [--verbose]
+
+import argparse
+import asyncio
+import datetime
+import json
+import sys
+
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql
+
+from martini.db import engine
+from martini.main import _catalog_filters, _keyset_after, _securities_list_query
+
+TODAY = datetime.date.today()
+
+# (label, sort, filters, ordered by an index, cursor key)
+CASES = [
+    ("currency by name", "name", {"currency": "USD"}, True, None),
+    ("currency by isin", "isin", {"currency": "USD"}, True, None),
+    ("currency by issue date", "issue_date", {"currency": "USD"}, True, None),
+    ("currency by maturity", "maturity", {"currency": "USD"}, True, None),
+    ("currency by name, next page", "name", {"currency": "USD"}, True, "M"),
+    ("maturity window by maturity", "maturity",
+     {"maturity_from": TODAY, "maturity_to": TODAY + datetime.timedelta(days=5 * 365)}, True, None),
+    ("currency and maturity window by maturity", "maturity",
+     {"currency": "EUR", "maturity_from": TODAY, "maturity_to": TODAY + datetime.timedelta(days=365)}, True, None),
+    ("issue date range by issue date", "issue_date",
+     {"issued_from": TODAY - datetime.timedelta(days=365), "issued_to": TODAY}, True, None),
+    ("minimum volume by name", "name", {"min_volume": 1_000_000_000}, False, None),
+    ("currency by popularity", "popularity", {"currency": "USD"}, False, None),
+    ("maturity window by popularity", "popularity",
+     {"maturity_from": TODAY, "maturity_to": TODAY + datetime.timedelta(days=365)}, False, None),
+]
+
+
+def plan_nodes(node):
+    yield node
+    for child in node.get("Plans", []):
+        yield from plan_nodes(child)
+
+
+def explain_sql(sort: str, filters: dict, cursor_key) -> str:
+    stmt, sort_key, id_col = _securities_list_query(sort, _catalog_filters(**filters))
+    if cursor_key is not None:
+        stmt = stmt.where(_keyset_after(sort, sort_key, id_col, cursor_key, 0))
+    stmt = stmt.limit(100)
+    compiled = stmt.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True})
+    return f"EXPLAIN (FORMAT JSON) {compiled}"
+
+
+def check_plan(plan: dict, ordered: bool):
+    """(problems, indexes used) for one plan."""
+    nodes = list(plan_nodes(plan["Plan"]))
+    problems = []
+    if any(n["Node Type"] == "Seq Scan" and n.get("Relation Name") == "securities" for n in nodes):
+        problems.append("sequential scan of securities")
+    # an Incremental Sort on index-ordered input still stops after one page
+    if ordered and any(n["Node Type"] == "Sort" for n in nodes):
+        problems.append("sorts instead of reading an index in order")
+    indexes = sorted({n["Index Name"] for n in nodes if "Index Name" in n})
+    return problems, indexes
+
+
+async def run(args) -> int:
+    failed = 0
+    async with engine.connect() as conn:
+        await conn.execute(text("SET enable_seqscan = off"))
+        for label, sort, filters, ordered, cursor_key in CASES:
+            raw = (await conn.execute(text(explain_sql(sort, filters, cursor_key)))).scalar()
+            plan = (json.loads(raw) if isinstance(raw, str) else raw)[0]
+            problems, indexes = check_plan(plan, ordered)
+            status = "FAIL" if problems else "ok"
+            print(f"{status:4}  {label}: {', '.join(indexes) or 'no index'}"
+                  + (f" ({'; '.join(problems)})" if problems else ""))
+            if args.verbose:
+                print(json.dumps(plan["Plan"], indent=2))
+            failed += bool(problems)
+    await engine.dispose()
+    print(f"{len(CASES) - failed}/{len(CASES)} query plans index-driven")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check that /securities filters are served by indexes")
+    parser.add_argument("--verbose", action="store_true", help="Print every plan")
+    sys.exit(asyncio.run(run(parser.parse_args())))
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# index_documents.py
+#
+# Extract the text of every page of each document and store it in
+# document_pages, whose tsvector column (GIN-indexed) backs
+# /search/documents. Documents that already have pages are skipped unless
+# --reindex is given; documents without extractable text (scanned images,
+# broken files) are logged and retried on the next run.
+#
+# Run it after uploading documents (python -m martini.migrate creates the
+# table).
+#
+# Usage: python -m scripts.index_documents [--isin XS...] [--reindex]
+#                                          [--concurrency 4]
+
+import argparse
+import asyncio
+
+from sqlalchemy import delete, exists, insert, select
+
+from martini.db import AsyncSessionLocal, engine
+from martini.models import Document, DocumentPage, Security
+from martini.storage import object_name
+from martini.utils.pdf_helper import extract_pages_from_pdf
+from scripts.upload_docs import build_storage
+
+
+async def pending_documents(isins, reindex: bool):
+    stmt = select(Document.id, Document.url).order_by(Document.id)
+    if isins:
+        stmt = stmt.join(Security, Security.id == Document.security_id).where(Security.isin.in_(isins))
+    if not reindex:
+        stmt = stmt.where(~exists().where(DocumentPage.document_id == Document.id))
+    async with AsyncSessionLocal() as db:
+        return (await db.execute(stmt)).all()
+
+
+async def fetch(store, url: str) -> bytes:
+    info = await store.stat(object_name(url))
+    return b"".join([chunk async for chunk in store.open_range(info.name, 0, info.size - 1, info.generation)])
+
+
+async def index_document(store, doc_id: int, url: str) -> int:
+    """Replace the stored pages of one document; returns the number of pages."""
+    pages = await extract_pages_from_pdf(await fetch(store, url))
+    if pages is None:
+        print(f"Document {doc_id}: no text extracted from {url}")
+        return 0
+    async with AsyncSessionLocal() as db, db.begin():
+        await db.execute(delete(DocumentPage).where(DocumentPage.document_id == doc_id))
+        await db.execute(
+            insert(DocumentPage),
+            [{"document_id": doc_id, "page": n, "text": text} for n, text in enumerate(pages, start=1)],
+        )
+    return len(pages)
+
+
+async def run(args):
+    store = build_storage()
+    docs = await pending_documents(args.isin, args.reindex)
+    print(f"{len(docs)} document(s) to index")
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+    indexed = failed = 0
+
+    async def one(doc_id: int, url: str):
+        nonlocal indexed, failed
+        async with semaphore:
+            try:
+                n = await index_document(store, doc_id, url)
+            except Exception as e:
+                print(f"Document {doc_id}: failed ({e})")
+                n = 0
+        if n:
+            indexed += 1
+            print(f"Document {doc_id}: {n} page(s)")
+        else:
+            failed += 1
+
+    await asyncio.gather(*(one(doc_id, url) for doc_id, url in docs))
+    await engine.dispose()
+    print(f"Indexed {indexed} document(s), {failed} without text or failed")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Index document text for /search/documents")
+    parser.add_argument("--isin", action="append", help="Only documents of this ISIN (repeatable)")
+    parser.add_argument("--reindex", action="store_true", help="Re-extract documents already indexed")
+    parser.add_argument("--concurrency", type=int, default=4, help="Documents fetched and extracted at once")
+    asyncio.run(run(parser.parse_args()))
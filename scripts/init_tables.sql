@@ -61,6 +61,54 @@ CREATE UNIQUE INDEX uniq_securities_sedol
   WHERE sedol IS NOT NULL;                                         :contentReference[oaicite:2]{index=2}
 
 
+-- 4.4 Identifier prefix search (LIKE 'XS12%') and fuzzy name search
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX ix_securities_isin_prefix
+  ON public.securities(isin varchar_pattern_ops);
+
+CREATE INDEX ix_securities_cusip_prefix
+  ON public.securities(cusip varchar_pattern_ops);
+
+CREATE INDEX ix_securities_sedol_prefix
+  ON public.securities(sedol varchar_pattern_ops);
+
+CREATE INDEX ix_securities_name_trgm
+  ON public.securities USING gin (name gin_trgm_ops);
+
+-- 4.5 Keyset pagination for the name / issue_date sorts
+CREATE INDEX ix_securities_name_id
+  ON public.securities(name, id);
+
+CREATE INDEX ix_securities_issue_date_id
+  ON public.securities(issue_date DESC NULLS LAST, id);
+
+-- 4.6 /securities filters (currency, maturity, issue date, issue volume)
+CREATE INDEX ix_securities_currency_name_id
+  ON public.securities(issue_currency, name, id)
+  WHERE isin IS NOT NULL;
+
+CREATE INDEX ix_securities_currency_isin_id
+  ON public.securities(issue_currency, isin, id)
+  WHERE isin IS NOT NULL;
+
+CREATE INDEX ix_securities_currency_issue_date_id
+  ON public.securities(issue_currency, issue_date DESC NULLS LAST, id)
+  WHERE isin IS NOT NULL;
+
+CREATE INDEX ix_securities_currency_maturity_id
+  ON public.securities(issue_currency, maturity, id)
+  WHERE isin IS NOT NULL;
+
+CREATE INDEX ix_securities_maturity_id
+  ON public.securities(maturity, id)
+  WHERE isin IS NOT NULL;
+
+CREATE INDEX ix_securities_issue_volume
+  ON public.securities(issue_volume)
+  WHERE isin IS NOT NULL AND issue_volume IS NOT NULL;
+
+
 CREATE TABLE public.price_history (
     id               SERIAL PRIMARY KEY,
     security_id      INTEGER NOT NULL
@@ -81,12 +129,33 @@ CREATE INDEX idx_price_history_security_date
     ON public.price_history(security_id, date);
 
 
+-- Raw access events, partitioned by month; monthly partitions are created
+-- (and expired ones dropped) by python -m martini.access_rollup, the
+-- DEFAULT partition catches events outside them
 CREATE TABLE access_logs (
-  id SERIAL PRIMARY KEY,
-  security_id INTEGER NOT NULL REFERENCES securities(id),
+  id SERIAL,
+  security_id INTEGER NOT NULL REFERENCES securities(id) ON DELETE CASCADE,
   accessed_at TIMESTAMP WITH TIME ZONE NOT NULL,
   client_ip INET,
-  user_agent TEXT
+  user_agent TEXT,
+  PRIMARY KEY (id, accessed_at)
+) PARTITION BY RANGE (accessed_at);
+
+CREATE INDEX ix_access_logs_accessed_at ON access_logs USING brin (accessed_at);
+
+CREATE TABLE access_logs_default PARTITION OF access_logs DEFAULT;
+
+-- Views per security and day (UTC), rolled up from access_logs
+CREATE TABLE access_daily (
+  security_id INTEGER NOT NULL REFERENCES securities(id) ON DELETE CASCADE,
+  day DATE NOT NULL,
+  views INTEGER NOT NULL,
+  PRIMARY KEY (security_id, day)
+);
+
+CREATE TABLE access_rollup_state (
+  id INTEGER PRIMARY KEY,
+  rolled_until TIMESTAMP WITH TIME ZONE NOT NULL
 );
 
 CREATE TABLE security_summaries (
@@ -97,16 +166,11 @@ CREATE TABLE security_summaries (
 );
 
 
--- Create a view that shows each security’s popularity metrics
-CREATE VIEW security_popularity (
-  id,
-  name,
-  isin,
-  fund_count,
-  access_count,
-  doc_count,
-  popularity
-) AS
+-- Materialized popularity ranking. Refreshed concurrently by the API on a
+-- schedule (POPULARITY_REFRESH_SECONDS) or via POST /admin/popularity/refresh.
+DROP VIEW IF EXISTS security_popularity;
+
+CREATE MATERIALIZED VIEW security_popularity AS
 SELECT
   s.id,
   s.name,
@@ -118,7 +182,7 @@ SELECT
     COALESCE(fh.fund_count, 0)
     + COALESCE(al.access_count, 0)
     + COALESCE(doc.doc_count, 0)
-  ) AS popularity
+  )::integer AS popularity
 FROM securities s
 LEFT JOIN (
   SELECT security_id, COUNT(DISTINCT fund_id) AS fund_count
@@ -126,13 +190,21 @@ LEFT JOIN (
   GROUP BY security_id
 ) fh ON fh.security_id = s.id
 LEFT JOIN (
-  SELECT security_id, COUNT(*) AS access_count
-  FROM access_logs
+  SELECT security_id, SUM(views) AS access_count
+  FROM access_daily
   GROUP BY security_id
 ) al ON al.security_id = s.id
 LEFT JOIN (
   SELECT security_id, COUNT(*) AS doc_count
   FROM documents
   GROUP BY security_id
-) doc ON doc.security_id = s.id
-ORDER BY popularity DESC;
\ No newline at end of file
+) doc ON doc.security_id = s.id;
+
+-- Required by REFRESH MATERIALIZED VIEW CONCURRENTLY
+CREATE UNIQUE INDEX ux_security_popularity_id
+  ON security_popularity (id);
+
+-- Landing page: ORDER BY popularity DESC, id
+CREATE INDEX ix_security_popularity_rank
+  ON security_popularity (popularity DESC, id)
+  WHERE isin IS NOT NULL;
@@ -113,6 +113,11 @@ def main():
     for csv_file in glob.glob("data/funds/*.csv"):
         load_csv(conn, csv_file)
 
+    # let running API processes rebuild their fund holdings matrix
+    with conn.cursor() as cur:
+        cur.execute("NOTIFY funds_changed")
+    conn.commit()
+
     conn.close()
 
 if __name__ == "__main__":
@@ -120,6 +120,11 @@ def main():
     ensure_holdings_table(conn)
     for csv_file in glob.glob("data/funds/*.csv"):
         load_csv(conn, csv_file)
+
+    # let running API processes rebuild their fund holdings matrix
+    with conn.cursor() as cur:
+        cur.execute("NOTIFY funds_changed")
+    conn.commit()
     conn.close()
 
 
@@ -1,9 +1,9 @@
+import asyncio
 import os
 from pathlib import Path
 
+import psycopg2
 from dotenv import load_dotenv
-from google.cloud import storage
-from google.oauth2 import service_account
 
 # ── Locate and load your .env.local from the project root ───────────
 ROOT_DIR = Path(__file__).parents[1]
@@ -11,21 +11,55 @@ dotenv_path = ROOT_DIR / ".env.local"
 load_dotenv(dotenv_path=dotenv_path)
 # ─────────────────────────────────────────────────────────────────────
 
-# ── Build a GCS client explicitly from your service-account file ────
-key_path = os.environ.get("GOOGLE_APPLICATION_CREDENTIALS")
-if not key_path or not Path(key_path).exists():
-    raise RuntimeError("Service account JSON not found; "
-                       "check GOOGLE_APPLICATION_CREDENTIALS in .env.local")
+from martini.storage import STORAGE_BACKEND, get_storage, iter_file, object_url
 
-creds = service_account.Credentials.from_service_account_file(key_path)
-client = storage.Client(credentials=creds, project=creds.project_id)
-bucket = client.bucket("dry-martini-docs")
-# ─────────────────────────────────────────────────────────────────────
 
-def upload_and_mark(local_path: Path, isin: str, doc_type: str):
+def build_storage():
+    """
+    The configured document storage. For GCS, build the client explicitly
+    from the service-account file.
     """
-    Uploads the file by prefixing the ISIN to the filename, bumps on collision,
-    and uses explicit service-account credentials.
+    if STORAGE_BACKEND != "gcs":
+        return get_storage()
+
+    from google.cloud import storage
+    from google.oauth2 import service_account
+
+    key_path = os.environ.get("GOOGLE_APPLICATION_CREDENTIALS")
+    if not key_path or not Path(key_path).exists():
+        raise RuntimeError("Service account JSON not found; "
+                           "check GOOGLE_APPLICATION_CREDENTIALS in .env.local")
+
+    creds = service_account.Credentials.from_service_account_file(key_path)
+    client = storage.Client(credentials=creds, project=creds.project_id)
+    return get_storage("gcs", client=client)
+
+
+def register_document(url: str, isin: str, doc_type: str):
+    """
+    Insert the documents row directly. Only needed off GCS: bucket uploads
+    are registered by the security-doc-indexer function.
+    """
+    dsn = os.getenv("POSTGRES_CONNECTION")
+    if not dsn:
+        raise RuntimeError("POSTGRES_CONNECTION is required to register documents")
+    with psycopg2.connect(dsn) as conn, conn.cursor() as cur:
+        cur.execute(
+            """
+            INSERT INTO documents (security_id, doc_type, url)
+            SELECT id, %s, %s
+              FROM securities
+             WHERE isin = %s
+            """,
+            (doc_type, url, isin),
+        )
+        if not cur.rowcount:
+            print(f"No security found for ISIN={isin}; document not registered")
+
+
+async def upload_and_mark(store, local_path: Path, isin: str, doc_type: str):
+    """
+    Uploads the file by prefixing the ISIN to the filename and bumps on collision.
     """
     original_name = local_path.name
     base_stem, ext = local_path.stem, local_path.suffix  # e.g. ("report", ".pdf")
@@ -36,28 +70,31 @@ def upload_and_mark(local_path: Path, isin: str, doc_type: str):
     counter = 1
 
     # 2) If the name exists, bump with _1, _2, ...
-    while bucket.blob(candidate).exists():
+    while await store.exists(candidate):
         candidate = f"{candidate_stem}_{counter}{ext}"
         counter += 1
 
-    # 3) Upload the blob with metadata
-    blob = bucket.blob(candidate)
-    blob.metadata = {
+    # 3) Upload the object with metadata
+    metadata = {
         "isin":              isin,
         "doc_type":          doc_type,
         "original_filename": original_name,
     }
-    blob.upload_from_filename(str(local_path))
+    await store.put_stream(candidate, iter_file(local_path), metadata=metadata)
+
+    url = object_url(candidate)
+    print(f"Uploaded {url} (was {original_name}) "
+          f"to {STORAGE_BACKEND} storage with metadata {metadata}")
 
-    print(f"Uploaded gs://{bucket.name}/{candidate} (was {original_name}) "
-          f"with metadata {blob.metadata}")
+    if STORAGE_BACKEND != "gcs":
+        register_document(url, isin, doc_type)
 
 
 if __name__ == "__main__":
     import sys
 
     if len(sys.argv) != 4:
-        print("Usage: python upload_docs.py <file_path> <isin> <doc_type>")
+        print("Usage: python -m scripts.upload_docs <file_path> <isin> <doc_type>")
         sys.exit(1)
 
     file_path, isin, doc_type = sys.argv[1], sys.argv[2], sys.argv[3]
@@ -67,4 +104,4 @@ if __name__ == "__main__":
         print(f"Error: file not found: {file_path}")
         sys.exit(1)
 
-    upload_and_mark(local_path, isin, doc_type)
+    asyncio.run(upload_and_mark(build_storage(), local_path, isin, doc_type))
@@ -9,6 +9,17 @@ from cloudevents.http import CloudEvent
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+GCS_PUBLIC_URL = "https://storage.googleapis.com"
+
+
+def document_url(bucket: str, name: str) -> str:
+    """
+    URL stored in documents.url for an object. This function is deployed on
+    its own, so it mirrors martini.storage.object_url rather than importing it;
+    keep the two in sync.
+    """
+    return f"{GCS_PUBLIC_URL}/{bucket}/{name}"
+
 
 @functions_framework.cloud_event
 def register_document(cloud_event: CloudEvent) -> None:
@@ -32,7 +43,7 @@ def register_document(cloud_event: CloudEvent) -> None:
         logger.warning("Missing fields in GCS event, skipping insert.")
         return
 
-    url = f"https://storage.googleapis.com/{bucket}/{name}"
+    url = document_url(bucket, name)
 
     # Write into Postgres
     dsn = os.getenv("DB_DSN")
@@ -65,7 +76,7 @@ def register_document_delete(cloud_event: CloudEvent) -> None:
 
     logger.info("Delete event for gs://%s/%s", bucket, name)
 
-    url = f"https://storage.googleapis.com/{bucket}/{name}"
+    url = document_url(bucket, name)
     dsn = os.getenv("DB_DSN")
     if not dsn:
         logger.critical("DB_DSN is not set; cannot delete record")
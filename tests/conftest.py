@@ -0,0 +1,6 @@
+# tests/conftest.py
+
+import os
+
+# martini.db builds its engine at import; nothing here connects to it
+os.environ.setdefault("POSTGRES_CONNECTION", "postgresql+asyncpg://localhost/martini")
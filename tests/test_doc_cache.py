@@ -0,0 +1,65 @@
+# tests/test_doc_cache.py
+
+import asyncio
+
+import pytest
+
+from martini.doc_cache import DocumentCache
+from martini.storage import MemoryStorage
+
+
+class TruncatingStorage(MemoryStorage):
+    """Drops the last byte of every read, like a connection cut short."""
+
+    async def open_range(self, name, start, end, generation=None):
+        async for chunk in super().open_range(name, start, end - 1, generation):
+            yield chunk
+
+
+async def _one_chunk(data: bytes):
+    yield data
+
+
+async def _fill(storage, cache_dir):
+    info = await storage.put_stream("doc.pdf", _one_chunk(b"%PDF-1.7 body"))
+    cache = DocumentCache(str(cache_dir))
+    assert cache.get_path(storage, info) is None
+    await asyncio.gather(*cache._fills.values(), return_exceptions=True)
+    return cache, info
+
+
+def test_miss_fills_the_cache(tmp_path):
+    cache, info = asyncio.run(_fill(MemoryStorage(), tmp_path))
+    path = cache.get_path(MemoryStorage(), info)
+    assert path is not None
+    assert path.read_bytes() == b"%PDF-1.7 body"
+
+
+def test_short_download_is_not_cached(tmp_path):
+    async def fill():
+        storage = TruncatingStorage()
+        info = await storage.put_stream("doc.pdf", _one_chunk(b"%PDF-1.7 body"))
+        cache = DocumentCache(str(tmp_path))
+        with pytest.raises(IOError, match="Fetched 12 of 13 bytes"):
+            await cache._fill(storage, info, cache.key_for(info))
+        return cache
+
+    cache = asyncio.run(fill())
+    assert cache.stats()["files"] == 0
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_replaced_object_is_not_mixed(tmp_path):
+    async def run():
+        storage = MemoryStorage()
+        old = await storage.put_stream("doc.pdf", _one_chunk(b"old"))
+        await storage.put_stream("doc.pdf", _one_chunk(b"new"))
+        cache = DocumentCache(str(tmp_path))
+        cache._stats["doc.pdf"] = (float("inf"), old)
+        assert cache.get_path(storage, old) is None
+        await asyncio.gather(*cache._fills.values(), return_exceptions=True)
+        return cache
+
+    cache = asyncio.run(run())
+    assert cache.stats()["files"] == 0
+    assert "doc.pdf" not in cache._stats
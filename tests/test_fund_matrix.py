@@ -0,0 +1,43 @@
+# tests/test_fund_matrix.py
+
+import numpy as np
+import pytest
+
+from martini.fund_matrix import FundInfo, HoldingsMatrix
+
+
+def _matrix(rows):
+    funds = [FundInfo(1, "Alpha", None), FundInfo(2, "Beta", None)]
+    fund_col, sec_col, weights = zip(*rows)
+    return HoldingsMatrix(funds, fund_col, sec_col, weights)
+
+
+def test_duplicate_holdings_are_summed():
+    m = _matrix([
+        (1, 10, 0.5), (1, 10, 0.25), (1, 11, 1.0),
+        (2, 10, 2.0), (2, 12, 1.0), (2, 12, 1.0),
+    ])
+    assert m.holdings_count(m.row(1)) == 2
+    ids, weights = m.holdings(m.row(2))
+    assert ids.tolist() == [10, 12]
+    assert weights.tolist() == [2.0, 2.0]
+
+    overlap = m.overlap(m.row(1), m.row(2))
+    assert overlap["security_ids"].tolist() == [10]
+    assert overlap["weights_a"].tolist() == [0.75]
+    assert overlap["overlap_weight"] == pytest.approx(0.75)
+
+
+def test_similar_counts_each_security_once():
+    m = _matrix([(1, 10, 1.0), (1, 10, 1.0), (2, 10, 2.0)])
+    [(row, score, common)] = m.similar(m.row(1), limit=5)
+    assert m.fund_ids[row] == 2
+    assert score == pytest.approx(1.0)
+    assert common == 1
+
+
+def test_unknown_funds_and_empty_matrix():
+    m = _matrix([(3, 10, 1.0)])
+    assert m.nnz == 0
+    assert m.holdings_count(m.row(1)) == 0
+    assert np.asarray(m.holdings(m.row(2))[0]).size == 0
@@ -0,0 +1,46 @@
+# tests/test_pagination.py
+
+import base64
+import datetime
+import json
+
+import pytest
+
+from martini.pagination import InvalidCursor, decode_cursor, encode_cursor
+
+
+def _raw(sort, key, last_id) -> str:
+    raw = json.dumps({"s": sort, "k": key, "i": last_id}).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+@pytest.mark.parametrize("sort, key", [
+    ("popularity", 7),
+    ("isin", "XS0000000001"),
+    ("name", "Bond 1"),
+    ("issue_date", datetime.date(2020, 1, 2)),
+    ("issue_date", None),
+    ("maturity", datetime.date(2030, 1, 2)),
+])
+def test_round_trip(sort, key):
+    assert decode_cursor(encode_cursor(sort, key, 42), sort) == (key, 42)
+
+
+@pytest.mark.parametrize("cursor, sort", [
+    ("not-a-cursor", "name"),
+    (_raw("isin", 5, 1), "isin"),
+    (_raw("name", 5, 1), "name"),
+    (_raw("name", None, 1), "name"),
+    (_raw("name", "a\x00b", 1), "name"),
+    (_raw("popularity", True, 1), "popularity"),
+    (_raw("popularity", "7", 1), "popularity"),
+    (_raw("popularity", 2**40, 1), "popularity"),
+    (_raw("issue_date", 20200101, 1), "issue_date"),
+    (_raw("name", "a", True), "name"),
+    (_raw("name", "a", 2**40), "name"),
+    (_raw("name", "a", "1"), "name"),
+    (_raw("name", "a", 1), "isin"),
+])
+def test_malformed_cursor(cursor, sort):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor, sort)
@@ -0,0 +1,33 @@
+# tests/test_range_helper.py
+
+import pytest
+
+from martini.utils.range_helper import RangeNotSatisfiable, parse_byte_range
+
+
+@pytest.mark.parametrize("value, expected", [
+    (None, None),
+    ("bytes=0-99", (0, 99)),
+    ("bytes=100-", (100, 999)),
+    ("bytes=900-5000", (900, 999)),
+    ("bytes=-100", (900, 999)),
+    ("bytes=-5000", (0, 999)),
+    ("bytes=0-1,5-9", None),
+    ("items=0-1", None),
+    ("bytes=abc", None),
+    ("bytes=9-1", None),
+])
+def test_parse_byte_range(value, expected):
+    assert parse_byte_range(value, 1000) == expected
+
+
+@pytest.mark.parametrize("value", ["bytes=1000-", "bytes=-0"])
+def test_unsatisfiable_range(value):
+    with pytest.raises(RangeNotSatisfiable):
+        parse_byte_range(value, 1000)
+
+
+@pytest.mark.parametrize("value", ["bytes=0-", "bytes=-1", "bytes=-0"])
+def test_empty_object_is_never_satisfiable(value):
+    with pytest.raises(RangeNotSatisfiable):
+        parse_byte_range(value, 0)
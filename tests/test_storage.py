@@ -0,0 +1,35 @@
+# tests/test_storage.py
+
+import asyncio
+import os
+
+import pytest
+
+from martini.storage import LocalStorage
+
+
+async def _one_chunk(data: bytes):
+    yield data
+
+
+async def _read(storage, name, generation=None):
+    return b"".join([chunk async for chunk in storage.open_range(name, 0, 2, generation)])
+
+
+def test_local_exists_rejects_traversal(tmp_path):
+    storage = LocalStorage(str(tmp_path / "docs"))
+    (tmp_path / "x").write_bytes(b"secret")
+    assert asyncio.run(storage.exists("../x")) is False
+
+
+def test_local_open_range_pins_generation(tmp_path):
+    async def run():
+        storage = LocalStorage(str(tmp_path))
+        old = await storage.put_stream("doc.pdf", _one_chunk(b"old"))
+        assert await _read(storage, "doc.pdf", old.generation) == b"old"
+        os.utime(tmp_path / "doc.pdf", ns=(0, int(old.generation) + 1))
+        with pytest.raises(FileNotFoundError):
+            await _read(storage, "doc.pdf", old.generation)
+        assert await _read(storage, "doc.pdf") == b"old"
+
+    asyncio.run(run())